@@ -6,11 +6,16 @@ Command-Line Interface for the `python_libratone_zipp` module.
 """
 
 from python_libratone_zipp import LibratoneZipp
+from python_libratone_zipp.discovery import discover, connect_discovered
 
-zipp1 = LibratoneZipp(host='192.168.xx.xx')     # IP of the first Zipp
-zipp2 = LibratoneZipp(host="192.168.xx.yy")     # IP of the second Zipp. Can be left as-is if there's only on device.
-
-speakers = [zipp1, zipp2]
+# Find speakers on the network, or use fixed IP if none answers
+speakers = connect_discovered(discover())
+if not speakers:
+    zipp1 = LibratoneZipp(host='192.168.xx.xx')     # IP of the first Zipp
+    zipp2 = LibratoneZipp(host="192.168.xx.yy")     # IP of the second Zipp. Can be left as-is if there's only on device.
+    speakers = [zipp1, zipp2]
+else:
+    for i, zipp in enumerate(speakers, 1): print(f"{i}: {zipp.name} ({zipp.host})")
 
 while True:
     zipp = speakers[int(input(f"Input the desired speaker from 1 to {len(speakers)}: ")) - 1]
@@ -32,17 +32,14 @@ except Exception:
     pass
 
 
-def wait_for_attr(obj, attr, predicate, timeout=5.0, poll=0.1):
+def wait_for_volume(z, target, timeout=5.0):
+    """Query the volume until it reads `target`: each query returns as soon as the reply arrives."""
     deadline = time.time() + timeout
-    last = getattr(obj, attr, None)
+    last = getattr(z, "volume", None)
     while time.time() < deadline:
-        last = getattr(obj, attr, None)
-        try:
-            if predicate(last):
-                return last
-        except Exception:
-            pass
-        time.sleep(poll)
+        last = z.query("Volume", timeout=max(deadline - time.time(), 0.1))
+        if safe_int(last) == target:
+            return last
     return last
 
 
@@ -112,11 +109,8 @@ def main():
         lambda: z1.volume_set(tgt1),
         lambda: z2.volume_set(tgt2),
     ])
-    # ask both to report back (like HA polling)
-    concurrent_call([z1.volume_get, z2.volume_get])
-
-    v1 = wait_for_attr(z1, "volume", lambda v: safe_int(v) == tgt1, timeout=6.0)
-    v2 = wait_for_attr(z2, "volume", lambda v: safe_int(v) == tgt2, timeout=6.0)
+    v1 = wait_for_volume(z1, tgt1, timeout=6.0)
+    v2 = wait_for_volume(z2, tgt2, timeout=6.0)
     ok1 = safe_int(v1) == tgt1
     ok2 = safe_int(v2) == tgt2
     print(f"[RESULT1] dev1 volume={v1} ok={ok1}; dev2 volume={v2} ok={ok2}")
@@ -139,10 +133,8 @@ def main():
         lambda: z1.volume_set(tgt1b),
         lambda: z2.volume_set(tgt2b),
     ])
-    concurrent_call([z1.volume_get, z2.volume_get])
-
-    v1b = wait_for_attr(z1, "volume", lambda v: safe_int(v) == tgt1b, timeout=6.0)
-    v2b = wait_for_attr(z2, "volume", lambda v: safe_int(v) == tgt2b, timeout=6.0)
+    v1b = wait_for_volume(z1, tgt1b, timeout=6.0)
+    v2b = wait_for_volume(z2, tgt2b, timeout=6.0)
     ok1b = safe_int(v1b) == tgt1b
     ok2b = safe_int(v2b) == tgt2b
     print(f"[RESULT3] dev1 volume={v1b} ok={ok1b}; dev2 volume={v2b} ok={ok2b}")
@@ -159,11 +151,11 @@ def main():
     # Restore original volumes (best effort)
     print("[CLEANUP] Restoring original volumes.")
     if orig_v1 is not None:
-        z1.volume_set(orig_v1); z1.volume_get()
-        wait_for_attr(z1, "volume", lambda v: safe_int(v) == orig_v1, timeout=4.0)
+        z1.volume_set(orig_v1)
+        wait_for_volume(z1, orig_v1, timeout=4.0)
     if orig_v2 is not None:
-        z2.volume_set(orig_v2); z2.volume_get()
-        wait_for_attr(z2, "volume", lambda v: safe_int(v) == orig_v2, timeout=4.0)
+        z2.volume_set(orig_v2)
+        wait_for_volume(z2, orig_v2, timeout=4.0)
 
     print("[CLEANUP] Exiting devices.")
     z1.exit()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+asyncio control library for Libratone speakers like Libratone Zipp.
+License: see LICENSE file
+
+Usage:
+    hub = await async_get_hub()
+    zipp = AsyncLibratoneZipp('192.168.1.x', hub)
+    await zipp.volume_set(30)
+    await zipp.volume_get()
+    ...
+    zipp.exit()
+"""
+
+import asyncio
+import time
+
+from .LibratoneZipp import (
+    LibratoneZipp,
+    _COMMAND_TABLE,
+    _BOOTSTRAP_RATE,
+    _EXIT_TIMEOUT,
+    _KEEPALIVE_CHECK_PERIOD,
+    _LIFECYCLE_POLLED_COMMANDS,
+    _LOGGER,
+    _QUERY_TIMEOUT,
+    _RETRANSMIT_DEADLINE,
+    _RETRANSMIT_DELAY,
+    _UDP_CONTROL_PORT,
+    _bootstrap_paced,
+    STATE_PLAY,
+    STATE_PAUSE,
+    STATE_STOP,
+    STATE_UNKNOWN,
+)
+from .async_hub import AsyncSocketHub
+
+_async_hub_singleton = None
+_async_hub_lock = None          # Created on the running loop by the first async_get_hub()
+
+async def async_get_hub():
+    """Lazy init of the shared AsyncSocketHub on the running loop."""
+    global _async_hub_singleton, _async_hub_lock
+    if _async_hub_singleton is None:
+        if _async_hub_lock is None: _async_hub_lock = asyncio.Lock()
+        async with _async_hub_lock:
+            if _async_hub_singleton is None:
+                hub = AsyncSocketHub()
+                await hub.start()
+                _async_hub_singleton = hub
+    return _async_hub_singleton
+
+async def async_connect_many(hosts, hub=None, rate=_BOOTSTRAP_RATE, **kwargs):
+    """Create an AsyncLibratoneZipp per host, like connect_many(): await `zipp.ready.wait()` for each one."""
+    if hub is None: hub = await async_get_hub()
+    zipps = [AsyncLibratoneZipp(host, hub, **kwargs) for host in hosts]
+    _bootstrap_paced(zipps, hub.timer, rate)
+    return zipps
+
+# Awaitable waiter for one query() answer - resolved from the hub loop
+class _AsyncQueryWaiter:
+    def __init__(self, loop):
+        self.future = loop.create_future()
+
+    def set(self, value):
+        if not self.future.done(): self.future.set_result(value)
+
+class AsyncLibratoneZipp(LibratoneZipp):
+    """Representing a Libratone Zipp device driven by an AsyncSocketHub.
+
+    Same attributes as LibratoneZipp, `ready` being an asyncio.Event; every method sending something to the speaker is a coroutine.
+    """
+
+    _ready_event_class = asyncio.Event
+
+    # host is IP of Zipp, hub is a started AsyncSocketHub (see async_get_hub) - keepalive runs on its scheduler
+    # reliable resends commands until the speaker confirms them, see LibratoneZipp.send_command()
+    # lifecycle_cache is an optional LifecycleCache, see LibratoneZipp._load_lifecycle()
+    def __init__(self, host, hub: AsyncSocketHub, keepalive_interval=_KEEPALIVE_CHECK_PERIOD, reliable=False, lifecycle_cache=None):
+        if hub.loop is None:
+            raise RuntimeError("AsyncSocketHub is not started")
+        super().__init__(host, hub=hub, keepalive_interval=keepalive_interval, reliable=reliable, lifecycle_cache=lifecycle_cache)
+
+    # Stop keepalive and leave the hub - nothing is sent to the speaker, coroutines waiting for an answer return at once
+    # Call it from the hub loop - there is no thread to join, `timeout` is kept for the LibratoneZipp.exit() signature
+    def exit(self, timeout=_EXIT_TIMEOUT):
+        self._closing.set()
+        self._release_waiters()
+        self.outbox.clear()
+        self._hub.scheduler.remove(self)
+        self._reset_state()
+        self._hub.unregister(self)
+        _LOGGER.info("Disconnected from Libratone Zipp.")
+        return True
+
+    async def send_command(self, port, command, commandType=None, data=None, reliable=None):
+        """Send a command packet through the AsyncSocketHub.
+        Returns True on successful send, False on failure.
+        If reliable, returns once the speaker confirmed it, like LibratoneZipp.send_command().
+        """
+        template, payload, crc, waiter = self._prepare_command(command, commandType, data, reliable)
+        if waiter is None: return self._send(port, template, payload, crc)
+        start = time.perf_counter()
+        try:
+            confirmed = self._send(port, template, payload, crc) and await self._retransmit(waiter, _RETRANSMIT_DEADLINE, port, template, payload, crc) and waiter.future.result()
+        finally:
+            self._remove_confirmation(waiter)
+        return self._confirmed(command, confirmed, start)
+
+    def _new_waiter(self): return _AsyncQueryWaiter(self._hub.loop)
+
+    # Resend a packet with the same crc after growing delays until `waiter` is set, see LibratoneZipp._retransmit()
+    async def _retransmit(self, waiter, deadline, port, template, payload, crc):
+        loop = self._hub.loop
+        end = loop.time() + deadline
+        delay = _RETRANSMIT_DELAY
+        while True:
+            remaining = end - loop.time()
+            if remaining <= 0: return False
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), min(delay, remaining))
+                return True
+            except asyncio.TimeoutError:
+                pass
+            if loop.time() >= end: return False
+            self._resend(port, template, payload, crc)
+            delay *= 2
+
+    # Ask a value and wait for its answer: return the parsed value, or None on timeout
+    async def query(self, command, timeout=_QUERY_TIMEOUT, reliable=None):
+        reply_command, waiter, template, crc = self._send_query(command)
+        if waiter is None: return None
+        if self.reliable if reliable is None else reliable:
+            if await self._retransmit(waiter, timeout, _UDP_CONTROL_PORT, template, b'', crc): return waiter.future.result()
+        else:
+            try:
+                return await asyncio.wait_for(waiter.future, timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._remove_waiter(reply_command, waiter)
+        return None
+
+    # Call all *get* functions, except fixed values
+    async def get_all(self):
+        await asyncio.gather(
+            self.currpowermode_get(),
+            self.chargingstatus_get(),
+            self.volume_get(),
+            self.voicing_get(),
+            self.room_get(),
+            self.player_get(),
+            self.signalstrenght_get(),
+            self.mutestatus_get(),
+            self.batterylevel_get(),
+            self.timer_get(),
+            self.playstatus_get(),
+        )
+
+    # Call *get* functions of get_all() only for values not updated recently - never reliable, see LibratoneZipp.get_stale()
+    async def get_stale(self):
+        await asyncio.gather(*(self.get_control_command(command=command, reliable=False) for command in self._stale_commands()))
+
+    # Call all *get* for values that are fixed for the lifecycle - not reliable either
+    async def get_all_fixed_for_lifecycle(self):
+        await asyncio.gather(*(self.get_control_command(command=command, reliable=False) for command in _LIFECYCLE_POLLED_COMMANDS))
+
+    # Called from the hub loop, e.g. by bootstrap() or while processing an answer
+    def _run_gets(self, function):
+        self._hub.loop.create_task(function())
+
+    # Refresh the state of the Zipp
+    async def state_refresh(self):
+        if await self._hub.reachability.async_is_up(self.host):
+            # If the Zipp was not in a "controlled" state, refresh also lifecycle variables
+            if self.state != STATE_PLAY and self.state != STATE_PAUSE and self.state != STATE_STOP and self._lifecycle_needed():
+                await self.get_all_fixed_for_lifecycle()
+            await self.get_stale()
+        else:
+            self._reset_state(STATE_UNKNOWN)
+
+    # Send PlayControl commands
+    async def _playcontrol_set(self, action):
+        if action not in _COMMAND_TABLE['PlayControl']:
+            _LOGGER.warning("Error: %s command not sent.", action)
+            return False
+        return await self.set_control_command(_COMMAND_TABLE['PlayControl']['_set'], _COMMAND_TABLE['PlayControl'][action])
+
+    # Send Player-Favorite command
+    async def favorite_play(self, favourite_id):
+        if int(favourite_id) < 1 or int(favourite_id) > 5:
+            _LOGGER.warning("Error: favorite command must be within 1 and 5.")
+            return False
+        return await self.set_control_command(_COMMAND_TABLE['Player']['_set'], _COMMAND_TABLE['Player']['favorite'][str(favourite_id)])
+
+    # Send a voicingid, either for type="Voicing" or type="Room"
+    async def _voicingid_set(self, voicing_name, type):
+        if type == "Voicing":
+            catalog = self._voicing_catalog
+        elif type == "Room":
+            catalog = self._room_catalog
+        else:
+            _LOGGER.warning("voicingid_set: type must be either 'Voicing' or 'Room'")
+            return False
+
+        if catalog is None:
+            _LOGGER.warning("Error: voicing command not sent.")
+            return False
+        voicing_id = catalog.voicing_id(voicing_name)
+        if voicing_id is None: return True
+        return await self.set_control_command(command=_COMMAND_TABLE[type]['_set'], data=voicing_id)
+
+    # Send Volume command
+    async def volume_set(self, volume):
+        if int(volume) < 0 or int(volume) > 100:
+            _LOGGER.warning("Error: volume command must be within 0 and 100.")
+            return False
+        return await self.set_control_command(_COMMAND_TABLE['Volume']['_set'], str(volume))
+
+    async def group_join(self, link_id: str) -> bool:
+        if not link_id:
+            return False
+        return await self.set_control_command(_COMMAND_TABLE['Group']['_join'], f"LINK {link_id}")
+
+    async def group_leave(self, link_id: str = None) -> bool:
+        lid = link_id or self.group_link_id
+        if not lid:
+            return False
+        return await self.set_control_command(_COMMAND_TABLE['Group']['_leave'], f"LINK {lid}")
@@ -1,4 +1,8 @@
+import itertools
 import random
+import socket
+import struct
+import threading
 
 '''
 This class provide an object to manage, set and create messages that can be sent to a Libratone Zipp device.
@@ -11,6 +15,12 @@ m.set_data("PLAY")                          | Set the data bytes, here to "PLAY"
 m.get_packet()                              | Receive a message ready to be sent
 m.print_packet()                            | Print every property of the Zipp message
 
+v = LibratoneMessage.decode_packet(packet)  | Decode a received packet without copy, see LibratonePacketView
+v.command, v.data                           | Command as int, payload as a memoryview of `packet`
+
+t = LibratoneMessage.get_template(64)       | Cached pre-encoded header for command 64 (set), see PacketTemplate
+t.sendmsg(sock, address, b"20")             | Send header and payload without building the full packet
+
 Message are mainly based upon decompilation of the Android application (com.libratone.luci.LUCIPacket)
 
 Example of a message: 0xaaaa??abcd??abcdabcdxxx
@@ -24,6 +34,94 @@ Example of a message: 0xaaaa??abcd??abcdabcdxxx
     ....................xxx = data
 '''
 
+# remoteID, commandType, command, commandStatus, crc, dataLen - see above
+_HEADER = struct.Struct('>HBHBHH')
+_HEADER_SIZE = _HEADER.size
+_CRC_DATALEN = struct.Struct('>HH')
+_CRC_OFFSET = 6
+
+_REMOTE_ID = 0xaaaa                 # Hardcoded in Android app
+_DEFAULT_COMMAND_TYPE = 2           # 2 by default (set), 1 for get
+
+# Rolling crc from a random start: consecutive packets never share a crc, which helps reply correlation
+_crc_counter = itertools.count(random.randint(0, 65534))
+def next_crc():
+    return next(_crc_counter) % 65535 + 1
+
+# Encode `data` like LibratoneMessage.set_data: int as decimal string, str as ASCII
+def encode_data(data) -> bytes:
+    if data is None: return b''
+    if isinstance(data, int): data = str(data)
+    if isinstance(data, str): return data.encode("ascii")
+    return bytes(data)
+
+_HAS_SENDMSG = hasattr(socket.socket, "sendmsg")
+
+class PacketTemplate:
+    """
+    Pre-encoded header for one (command, commandType).
+    Only crc and dataLen are patched in place for each packet, under a lock since templates are shared.
+    """
+    __slots__ = ('command', 'commandType', '_header', '_lock')
+
+    def __init__(self, command: int, commandType: int = _DEFAULT_COMMAND_TYPE):
+        self.command = command
+        self.commandType = commandType
+        self._header = bytearray(_HEADER.pack(_REMOTE_ID, commandType, command, 0, 0, 0))
+        self._lock = threading.Lock()
+
+    # Return the full packet as bytes, for transports without sendmsg
+    def packet(self, payload: bytes = b'', crc: int = None) -> bytes:
+        with self._lock:
+            _CRC_DATALEN.pack_into(self._header, _CRC_OFFSET, next_crc() if crc is None else crc, len(payload))
+            return bytes(self._header) + payload
+
+    # Send header and payload as two buffers with sendmsg; return the number of bytes sent
+    def sendmsg(self, sock, address, payload: bytes = b'', crc: int = None) -> int:
+        with self._lock:
+            _CRC_DATALEN.pack_into(self._header, _CRC_OFFSET, next_crc() if crc is None else crc, len(payload))
+            if _HAS_SENDMSG:
+                return sock.sendmsg((self._header, payload), (), 0, address)
+            return sock.sendto(bytes(self._header) + payload, address)
+
+_TEMPLATES = {}     # (command, commandType) -> PacketTemplate
+
+def get_template(command: int, commandType: int = None) -> PacketTemplate:
+    """Return the cached PacketTemplate for (command, commandType)."""
+    if commandType is None: commandType = _DEFAULT_COMMAND_TYPE
+    key = (command, commandType)
+    template = _TEMPLATES.get(key)
+    if template is None:
+        template = _TEMPLATES.setdefault(key, PacketTemplate(command, commandType))
+    return template
+
+
+class LibratonePacketView:
+    """
+    Read-only view of a received packet: header fields as int, `data` as a memoryview
+    of the receive buffer (no copy). Use decode_packet() to build it.
+    """
+    __slots__ = ('remoteID', 'commandType', 'command', 'commandStatus', 'crc', 'datalen', 'data')
+
+    def __init__(self, remoteID, commandType, command, commandStatus, crc, datalen, data):
+        self.remoteID = remoteID
+        self.commandType = commandType
+        self.command = command
+        self.commandStatus = commandStatus
+        self.crc = crc
+        self.datalen = datalen
+        self.data = data
+
+# Decode a received packet; raise ValueError if it is shorter than the header or if dataLen does not match the payload
+def decode_packet(packet) -> LibratonePacketView:
+    view = memoryview(packet)
+    if len(view) < _HEADER_SIZE:
+        raise ValueError(f"packet of {len(view)} bytes is shorter than the {_HEADER_SIZE} bytes header")
+    remoteID, commandType, command, commandStatus, crc, datalen = _HEADER.unpack_from(view)
+    if len(view) - _HEADER_SIZE != datalen:
+        raise ValueError(f"dataLen is {datalen} but payload is {len(view) - _HEADER_SIZE} bytes")
+    return LibratonePacketView(remoteID, commandType, command, commandStatus, crc, datalen, view[_HEADER_SIZE:])
+
 class LibratoneMessage:
     def __init__(self, command:int = None, data:str = None, packet:bytearray = None, commandType:int = None, commandStatus:int = None):
         # Initialization with default values
@@ -31,13 +129,14 @@ class LibratoneMessage:
         self.commandType = bytearray([0x02])                        # 2 by default (get), probably 0x01 for fetch
         self.command = bytearray([0x00, 0x00])                      # See _COMMAND_TABLE[*command*][_command]
         self.commandStatus = bytearray([0x00])                      # 0 but can be set with setCommandStatus in Android app
-        self.crc = random.randint(1,65535).to_bytes(2, 'big')       # Hardcoded in Android app
+        self.crc = None                                             # Random, set below unless parsed from `packet`
         self.datalen = bytearray([0x00, 0x00])                      # Lenght of `data`, in byte
         self.data = None                                           # See _COMMAND_TABLE[*command*][data]
 
         if command != None: self.set_command(command)
         if data != None: self.set_data(data)
         if packet != None: self.set_from_packet(packet)
+        else: self.crc = random.randint(1,65535).to_bytes(2, 'big') # Hardcoded in Android app
         if commandType != None: self.set_commandType(commandType)
         if commandStatus != None: self.set_commandStatus(commandStatus)
 
@@ -6,8 +6,10 @@ Control Library for Libratone speakers like Libratone Zipp.
 License: see LICENSE file
 """
 
+import collections
 import logging
 import json
+import operator
 import sys
 import time
 import socket
@@ -15,8 +17,13 @@ import threading
 import re
 
 from . import LibratoneMessage
+from .catalog import interned, parse_catalog, parse_json
 
-from .socket_hub import SocketHub
+from .socket_hub import SocketHub, _UDP_RECEIVE_BUFFER
+from .metrics import get_default_metrics
+from .outbound import Outbox, get_default_timer
+from .workers import get_default_workers
+from .subscriptions import _Subscribers, get_default_notifier
 
 USE_SOCKET_HUB = True  # set to True to use the shared sockets (3333/7778)
 
@@ -33,7 +40,7 @@ def _get_hub():
                 _hub_singleton = SocketHub()
     return _hub_singleton
 
-_GET_LIFECYCLE_VALUES = 1       # 3 seconds wait between asking lifecycle values (like all voicing) and asking current values(like voicing)
+_BOOTSTRAP_RATE = 200           # Devices per second whose first requests are sent by connect_many()
 
 _LOG_ALL_PACKET = False         # Log all packet
 _LOG_UNKNOWN_PACKET = False     # Log unknown packet
@@ -78,6 +85,16 @@ _UDP_NOTIFICATION_RECEIVE_PORT = 3333    # Port to receive notification from the
 
 _UDP_BUFFER_SIZE = 4096                 # 4096 in order to receive Channel data
 _KEEPALIVE_CHECK_PERIOD = 60            # Time in second between each keep-alive check 
+_HOST_UP_TIMEOUT = 1                    # Time in second to wait for the TCP probe of host_up
+_LISTEN_RETRY_DELAY = 1                 # Time in second before binding again a socket in error, doubled up to _KEEPALIVE_CHECK_PERIOD
+_EXIT_TIMEOUT = 2                       # Time in second exit() waits for the threads of a device without hub, e.g. a host_up() probe running
+_QUERY_TIMEOUT = 2                      # Default time in second to wait for an answer in query()
+_QUERY_TRACKED_REQUESTS = 256           # Max number of in-flight get requests remembered per device for reply correlation
+_RETRANSMIT_DELAY = 0.2                 # Time in second before resending an unconfirmed reliable command, doubled after each resend
+_RETRANSMIT_DEADLINE = 3                # Time in second after which an unconfirmed reliable command is given up
+_DUPLICATE_WINDOW = 2                   # Time in second during which an answer to a retransmitted crc, with the command and data of a previous one, is dropped
+_POLL_SLACK = 5                         # Time in second: a value updated less than (its poll interval - this) ago is not polled by get_stale()
+_POLL_INTERVAL_MAX_FACTOR = 4           # A value which never changes is polled at most every keepalive_interval * this
 
 # Define Zipp commands ID
 _COMMAND_TABLE = {
@@ -173,12 +190,195 @@ _COMMAND_TABLE = {
    },
 }
 
+# Public values watched by subscribe()
+_SUBSCRIBABLE_FIELDS = (
+    'version', 'name', 'serialnumber',
+    'volume', 'batterylevel', 'chargingstatus', 'timer', 'signalstrenght', 'devicecolor', 'mutestatus',
+    'state', 'room', 'voicing', 'room_list', 'voicing_list',
+    'isFromChannel', 'play_identity', 'play_preset_available', 'play_subtitle', 'play_title', 'play_token', 'play_type',
+    'group_status', 'group_link_id', 'group_role',
+)
+
+# Values of _SUBSCRIBABLE_FIELDS of a device, as one tuple
+_get_watched_values = operator.attrgetter(*_SUBSCRIBABLE_FIELDS)
+
+class ZippState(collections.namedtuple("ZippState", ('revision',) + _SUBSCRIBABLE_FIELDS)):
+    """
+    Immutable values of _SUBSCRIBABLE_FIELDS of a LibratoneZipp, read at once from `zipp.snapshot`.
+    A new one replaces it, with `revision` + 1, each time a value changes: reading it needs no lock,
+    and its values are always consistent, e.g. never state=PLAYING with the title of the previous track cleared.
+    (`version` is the firmware version of the speaker.)
+    """
+    __slots__ = ()
+
+    def changed_since(self, revision):
+        """Return True if a value changed after the snapshot `revision`."""
+        return self.revision > revision
+
+# _get commands sent by get_all(), and by get_stale() when their value is stale
+_POLLED_COMMANDS = [
+    _COMMAND_TABLE['CurrPowerMode']['_get'],
+    _COMMAND_TABLE['ChargingStatus']['_get'],
+    _COMMAND_TABLE['Volume']['_get'],
+    _COMMAND_TABLE['Voicing']['_get'],
+    _COMMAND_TABLE['Room']['_get'],
+    _COMMAND_TABLE['Player']['_get'],
+    _COMMAND_TABLE['SignalStrength']['_get'],
+    _COMMAND_TABLE['MuteStatus']['_get'],
+    _COMMAND_TABLE['BatteryLevel']['_get'],
+    _COMMAND_TABLE['Timer']['_get'],
+    _COMMAND_TABLE['PlayStatus']['_get'],
+]
+
+# _get commands sent by get_all_fixed_for_lifecycle()
+_LIFECYCLE_POLLED_COMMANDS = [
+    _COMMAND_TABLE['CurrPowerMode']['_get'],
+    _COMMAND_TABLE['Version']['_get'],
+    _COMMAND_TABLE['Name']['_get'],
+    _COMMAND_TABLE['Room']['_getAll'],
+    _COMMAND_TABLE['Voicing']['_getAll'],
+    _COMMAND_TABLE['DeviceColor']['_get'],
+    _COMMAND_TABLE['SerialNumber']['_get'],
+    _COMMAND_TABLE['Channel']['_get'],
+]
+
+# Answers of get_all_fixed_for_lifecycle() saved by a LifecycleCache, see LibratoneZipp._load_lifecycle()
+# Not Channel: its JSON carries the playing state of each favorite, which would rewrite the file on each change
+_LIFECYCLE_COMMANDS = frozenset((
+    _COMMAND_TABLE['Version']['_get'],
+    _COMMAND_TABLE['Name']['_get'],
+    _COMMAND_TABLE['SerialNumber']['_get'],
+    _COMMAND_TABLE['DeviceColor']['_get'],
+    _COMMAND_TABLE['Voicing']['_getAll'],
+    _COMMAND_TABLE['Room']['_getAll'],
+))
+
+# Lifecycle values identifying the firmware and the speaker: cached values are dropped when the speaker answers another one
+_LIFECYCLE_IDENTITY = (_COMMAND_TABLE['Version']['_get'], _COMMAND_TABLE['SerialNumber']['_get'])
+
+# Answers needed before a device is ready, see LibratoneZipp.ready
+_READY_COMMANDS = frozenset((
+    _COMMAND_TABLE['CurrPowerMode']['_get'],
+    _COMMAND_TABLE['PlayStatus']['_get'],
+    _COMMAND_TABLE['Volume']['_get'],
+    _COMMAND_TABLE['Version']['_get'],
+    _COMMAND_TABLE['Name']['_get'],
+    _COMMAND_TABLE['Voicing']['_getAll'],
+    _COMMAND_TABLE['Room']['_getAll'],
+))
+
+# Reply command for _get commands which are not answered with the same command
+_QUERY_REPLY_COMMAND = {
+    _COMMAND_TABLE['BatteryLevel']['_get']: _COMMAND_TABLE['BatteryLevel']['_get2'],
+}
+
+# Values driving `state`: polled every keepalive interval even when they do not change, so that a lost notification
+# leaves the state stale for one interval at most, see _field_updated()
+_STATE_COMMANDS = frozenset((_COMMAND_TABLE['CurrPowerMode']['_get'], _COMMAND_TABLE['PlayStatus']['_get']))
+
+# Reply commands whose updates are recorded by _field_updated(): the values polled by get_stale(), and the version for _lifecycle_needed()
+_FIELD_STATS_COMMANDS = frozenset([_QUERY_REPLY_COMMAND.get(c, c) for c in _POLLED_COMMANDS] + [_COMMAND_TABLE['Version']['_get']])
+
+# Fields of the Player JSON, each stored in the attribute of the same name
+_PLAYER_FIELDS = ('isFromChannel', 'play_identity', 'play_preset_available', 'play_subtitle', 'play_title', 'play_token', 'play_type')
+
+# Parsed Player JSON and the values of _PLAYER_FIELDS, see _player_parse()
+def _parse_player(raw):
+    player = json.loads(raw)
+    return player, tuple(player.get(field, '') for field in _PLAYER_FIELDS)
+
+# Set commands confirmed by a notification: set command -> (notified command, True if it carries the data set, False for any data)
+# Commands missing here and in _PAYLOAD_CONFIRMATION (NEXT, PREV, timers...) are never resent, as applying them twice is not harmless
+_SET_CONFIRMATION = {
+    _COMMAND_TABLE['Volume']['_set']: (_COMMAND_TABLE['Volume']['_get'], True),
+    _COMMAND_TABLE['Name']['_set']: (_COMMAND_TABLE['Name']['_get'], True),
+    _COMMAND_TABLE['Voicing']['_set']: (_COMMAND_TABLE['Voicing']['_get'], True),
+    _COMMAND_TABLE['Room']['_set']: (_COMMAND_TABLE['Room']['_get'], True),
+    _COMMAND_TABLE['Player']['_set']: (_COMMAND_TABLE['Player']['_get'], False),
+    _COMMAND_TABLE['Group']['_join']: (_COMMAND_TABLE['Group']['_notif'], False),
+    _COMMAND_TABLE['Group']['_leave']: (_COMMAND_TABLE['Group']['_notif'], False),
+}
+
+# Set commands confirmed depending on their data: (set command, data) -> (notified command, notified data)
+_PAYLOAD_CONFIRMATION = {
+    (_COMMAND_TABLE['PlayControl']['_set'], b'PLAY'): (_COMMAND_TABLE['PlayStatus']['_get'], _COMMAND_TABLE['PlayStatus']['play']),
+    (_COMMAND_TABLE['PlayControl']['_set'], b'STOP'): (_COMMAND_TABLE['PlayStatus']['_get'], _COMMAND_TABLE['PlayStatus']['stop']),
+    (_COMMAND_TABLE['PlayControl']['_set'], b'PAUSE'): (_COMMAND_TABLE['PlayStatus']['_get'], _COMMAND_TABLE['PlayStatus']['pause']),
+    (_COMMAND_TABLE['Timer']['_set'], b'20'): (_COMMAND_TABLE['CurrPowerMode']['_get'], bytes([_COMMAND_TABLE['CurrPowerMode']['sleeping']])),
+    (_COMMAND_TABLE['Timer']['_set'], b'00'): (_COMMAND_TABLE['CurrPowerMode']['_get'], bytes([_COMMAND_TABLE['CurrPowerMode']['awake']])),
+}
+
+# Set commands for which only the latest value matters: a command waiting for the rate limit is replaced by a newer one, see Outbox
+# Transport commands (PlayControl, Player) and group commands are never coalesced
+_COALESCED_COMMANDS = frozenset((
+    _COMMAND_TABLE['Volume']['_set'],
+    _COMMAND_TABLE['Voicing']['_set'],
+    _COMMAND_TABLE['Room']['_set'],
+    _COMMAND_TABLE['Name']['_set'],
+    _COMMAND_TABLE['Timer']['_set'],
+))
+
+# Attribute holding the parsed answer of a command - returned by query(), raw decoded data otherwise
+_QUERY_ATTRIBUTE = {
+    _COMMAND_TABLE['Version']['_get']: 'version',
+    _COMMAND_TABLE['CurrPowerMode']['_get']: '_currpowermode',
+    _COMMAND_TABLE['Timer']['_get']: 'timer',
+    _COMMAND_TABLE['PlayStatus']['_get']: '_playstatus',
+    _COMMAND_TABLE['Volume']['_get']: 'volume',
+    _COMMAND_TABLE['Name']['_get']: 'name',
+    _COMMAND_TABLE['BatteryLevel']['_get2']: 'batterylevel',
+    _COMMAND_TABLE['Channel']['_get']: '_channel_json',
+    _COMMAND_TABLE['Player']['_get']: '_player_json',
+    _COMMAND_TABLE['Voicing']['_get']: 'voicing',
+    _COMMAND_TABLE['Voicing']['_getAll']: 'voicing_list',
+    _COMMAND_TABLE['Room']['_get']: 'room',
+    _COMMAND_TABLE['Room']['_getAll']: 'room_list',
+    _COMMAND_TABLE['MuteStatus']['_get']: 'mutestatus',
+    _COMMAND_TABLE['SignalStrength']['_get']: 'signalstrenght',
+    _COMMAND_TABLE['SerialNumber']['_get']: 'serialnumber',
+    _COMMAND_TABLE['DeviceColor']['_get']: 'devicecolor',
+    _COMMAND_TABLE['ChargingStatus']['_get']: 'chargingstatus',
+}
+
+# ACK sent after each notification
+_ACK_TEMPLATE = LibratoneMessage.get_template(0)
+
+# Group notification: "GROUPED,LINK ...", "MASTER,LINK ...", "SLAVE,LINK ..."
+_GROUP_NOTIF_RE = re.compile(r'^(GROUPED|MASTER|SLAVE),LINK\s+(.+)$')
+
+# Handler of process_zipp_message storing the decoded data in `attribute`
+def _store_decoded(attribute):
+    def handler(zipp, data): zipp._store(attribute, data.decode())
+    return handler
+
+# Wrap a handler registered with handler_register(): it may change any value, so the snapshot is always compared after it
+def _marking_dirty(handler):
+    def marked(zipp, data):
+        handler(zipp, data)
+        zipp._state_dirty = True
+    return marked
+
+# Blocking waiter for one query() answer
+class _QueryWaiter:
+    def __init__(self):
+        self._event = threading.Event()
+        self.value = None
+
+    def set(self, value):
+        self.value = value
+        self._event.set()
+
+    def wait(self, timeout):
+        return self._event.wait(timeout)
+
 # Check if host is up
-def host_up(host, port=80):
+def host_up(host, port=80, timeout=_HOST_UP_TIMEOUT):
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
     try:
         sock.connect((host, port))
     except socket.error:
+        sock.close()
         return False
     sock.close()
     del sock
@@ -187,37 +387,27 @@ def host_up(host, port=80):
 class LibratoneZipp:
     """Representing a Libratone Zipp device."""
 
-    # host is IP of Zipp
-    def __init__(self, host):
+    _ready_event_class = threading.Event
+
+    # host is IP of Zipp, hub is an optional shared hub (SocketHub or AsyncSocketHub) - default one is used if USE_SOCKET_HUB
+    # keepalive_interval is the time in second between each state_refresh()
+    # reliable resends commands until the speaker confirms them, see send_command()
+    # lifecycle_cache is an optional LifecycleCache serving the lifecycle values until the speaker answers, see _load_lifecycle()
+    def __init__(self, host, hub=None, keepalive_interval=_KEEPALIVE_CHECK_PERIOD, reliable=False, lifecycle_cache=None):
 
         # Configuration set by class client
         self.host = host
+        self.keepalive_interval = keepalive_interval
+        self.reliable = reliable
         
         # after self.host = host and normal state initialization
 
-        if USE_SOCKET_HUB:
-            # Use shared sockets; do NOT bind per device
-            _get_hub().register(self)
-            self._listening_notification_flag = False
-            self._listening_notification_thread = None
-            self._listening_notification_socket = None
-            self._listening_result_flag = False
-            self._listening_result_thread = None
-            self._listening_result_socket = None
-        else:
-            # ORIGINAL per-device sockets (unchanged)
-            self._listening_notification_flag = True
-            (self._listening_notification_socket,
-                self._listening_notification_thread) = self._get_new_socket(
-                receive_port=_UDP_NOTIFICATION_RECEIVE_PORT,
-                trigger_port=_UDP_CONTROL_PORT,
-                ack_port=_UDP_NOTIFICATION_SEND_PORT,
-            )
-            self._listening_result_flag = True
-            (self._listening_result_socket,
-                self._listening_result_thread) = self._get_new_socket(
-                receive_port=_UDP_RESULT_PORT
-            )            
+        if hub is None and USE_SOCKET_HUB: hub = _get_hub()
+        self._hub = hub
+
+        # Set by exit(): every wait of the device threads ends at once
+        self._closing = threading.Event()
+
         # TODO Update all variables to be set to Null when disconnect
 
         # Variables fixed for the lifecycle
@@ -241,6 +431,10 @@ class LibratoneZipp:
         self._room_list_json = None      
         self._player_json = None
         self._channel_json = None
+        self._voicing_catalog = None    # Catalog of _voicing_list_json, indexed by voicingId and name
+        self._room_catalog = None       # Catalog of _room_list_json
+        self._voicing_id = None         # voicingId of Voicing, named again when the voicing list arrives after it
+        self._room_id = None            # voicingId of Room, same
 
         # Calculated variables
         self.state = None               # STATE_OFF in self.state_refresh() or STATE_PLAY/STOP/PAUSE in process_zipp_message() initiated from 
@@ -263,16 +457,94 @@ class LibratoneZipp:
         self.group_last_notifier = None
         self.group_role = None        # "MASTER" | "SLAVE" | None
 
+        # Consistent copy of the values above, replaced on each change, see ZippState
+        # Values are changed under _state_lock, by process_zipp_message() and when the speaker is gone
+        self._state_lock = threading.RLock()
+        self._state_dirty = False       # Set by handlers when they change a value, see _store()
+        self.snapshot = ZippState(0, *_get_watched_values(self))
+
+        # command ID -> handler(zipp, data) used by process_zipp_message, see handler_register()
+        self._dispatch = dict(type(self)._DISPATCH_TABLE)
+
+        # Change subscriptions, see subscribe()
+        self._subscribers = _Subscribers()
+        self._notifier = self._hub.notifier if self._hub is not None else get_default_notifier()
+
+        # Counters and latency histograms, see Metrics
+        self._metrics = self._hub.metrics if self._hub is not None else get_default_metrics()
+
+        # Set commands sent within a rate limit, only the latest value of _COALESCED_COMMANDS when they wait, see Outbox
+        timer = self._hub.timer if self._hub is not None else get_default_timer()
+        self.outbox = Outbox(self._send_packet, timer, on_superseded=self._coalesced)
+        self._latest_write = {}         # command of _COALESCED_COMMANDS -> crc of its latest value sent
+
+        # Request/response correlation, see query() and _accept_reply()
+        self._pending_lock = threading.Lock()
+        self._request_seq = 0           # Incremented for each get request sent
+        self._requests = {}             # crc -> (reply command, seq, perf_counter() when sent) of in-flight get requests
+        self._applied_seq = {}          # reply command -> seq of the newest answer applied
+        self._confirmations = []        # (reply command, expected data or None for any, crc, waiter) of reliable commands in flight
+        self._retransmitted = {}        # crc -> None of packets sent again by _resend(), oldest first
+        self._received = {}             # (command, crc) -> (monotonic time, data) of recent answers to them, see _is_duplicate()
+
+        # Adaptive polling, see get_stale()
+        self._field_stats = {}          # reply command -> [monotonic time of last update, last data, poll interval]
+        self._waiters = {}              # reply command -> list of (seq, waiter) from query()
+
+        # Set once the speaker answered the values of _READY_COMMANDS, e.g. after bootstrap()
+        self.ready = self._ready_event_class()
+        self._unready = set(_READY_COMMANDS)
+
+        # Lifecycle values saved on disk, see _load_lifecycle()
+        self._lifecycle_cache = lifecycle_cache
+        self._lifecycle_confirmed = False   # The speaker answered the firmware version since the values were loaded
+        if self._lifecycle_cache is not None: self._load_lifecycle()
+
         # Network
+        # Registered or listening only now: a packet may be processed as soon as it is, and needs all the state above
 
-        ## Setup 3rd thread to make regular call to Zipp in order to update status in case of desync
-        self._keepalive_flag = True
-        self._keepalive_thread = threading.Thread(target=self._keepalive_check, name="Zipp_keepalive", args=[])
-        self._keepalive_thread.start()
+        if self._hub is not None:
+            # Use shared sockets; do NOT bind per device
+            self._hub.register(self)
+            self._listening_notification_thread = None
+            self._listening_notification_socket = None
+            self._listening_result_thread = None
+            self._listening_result_socket = None
+        else:
+            # ORIGINAL per-device sockets (unchanged)
+            (self._listening_notification_socket,
+                self._listening_notification_thread) = self._get_new_socket(
+                receive_port=_UDP_NOTIFICATION_RECEIVE_PORT,
+                trigger_port=_UDP_CONTROL_PORT,
+                ack_port=_UDP_NOTIFICATION_SEND_PORT,
+            )
+            (self._listening_result_socket,
+                self._listening_result_thread) = self._get_new_socket(
+                receive_port=_UDP_RESULT_PORT
+            )
 
+        ## Make regular call to Zipp in order to update status in case of desync
+        self._keepalive_thread = None
+        self._start_keepalive()
+
+    # Register on the hub scheduler, or setup a 3rd thread without hub
+    def _start_keepalive(self):
+        if self._hub is not None:
+            self._hub.scheduler.add(self, self.keepalive_interval)
+        else:
+            self._keepalive_thread = threading.Thread(target=self._keepalive_check, name="Zipp_keepalive", args=[], daemon=True)
+            self._keepalive_thread.start()
+
+    # Change the time in second between each state_refresh()
+    def keepalive_interval_set(self, interval):
+        self.keepalive_interval = interval
+        if self._hub is not None:
+            self._hub.scheduler.set_interval(self, interval)
+            self._hub.reachability.set_interval(self.host, interval)
 
     # Clean up all defined variables
     def _cleanup_variables(self):
+        self._field_stats = {}
         self.version = None
         self.name = None
         self.serialnumber = None
@@ -289,6 +561,10 @@ class LibratoneZipp:
         self._room_list_json = None      
         self._player_json = None
         self._channel_json = None
+        self._voicing_catalog = None
+        self._room_catalog = None
+        self._voicing_id = None
+        self._room_id = None
         self.room = None
         self.voicing = None
         self.room_list = None
@@ -305,27 +581,61 @@ class LibratoneZipp:
         self.group_last_notifier = None
         self.group_role = None
 
-    # Close the two socket thread by changing the flag and sending two packet to receive two answer on 2 ports
-    def exit(self):
-        self._listening_notification_flag = False
-        self.set_control_command(command=_COMMAND_TABLE['Volume']['_set'], data=self.volume)
-        self._listening_result_flag = False
-        self.get_control_command(command=_COMMAND_TABLE['Version']['_get'])
-        self._keepalive_flag = False
-        self._cleanup_variables()
-        _LOGGER.info("Disconnected from Libratone Zipp, waiting for last packets and keepalive thread.")
-        if USE_SOCKET_HUB:
-            try:
-                _get_hub().unregister(self)
-            except Exception:
-                pass
-
-    # Do a state_refresh every _KEEPALIVE_CHECK_PERIOD seconds to update self.state
+    # Stop the device without sending anything to the speaker: leave the hub, or wake up and join the keepalive and listener threads
+    # Calls waiting for an answer or a confirmation return at once, and commands waiting for the rate limit are dropped
+    # Return False if a thread was still running after `timeout` seconds
+    def exit(self, timeout=_EXIT_TIMEOUT):
+        self._closing.set()
+        self._release_waiters()
+        self.outbox.clear()
+        if self._hub is not None:
+            self._hub.scheduler.remove(self)
+            self._hub.unregister(self)
+        stopped = self._join_threads(timeout)
+        self._reset_state()
+        _LOGGER.info("Disconnected from Libratone Zipp.")
+        return stopped
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.exit()
+
+    # Wake up the listeners with an empty packet sent to themselves, then join them and the keepalive thread - only without hub
+    def _join_threads(self, timeout):
+        deadline = time.monotonic() + timeout
+        sockets = [(self._listening_notification_socket, _UDP_NOTIFICATION_RECEIVE_PORT), (self._listening_result_socket, _UDP_RESULT_PORT)]
+        for sock, port in sockets:
+            if sock is None: continue
+            try: sock.sendto(b"", ("127.0.0.1", port))
+            except OSError: pass
+        stopped = True
+        for thread in (self._listening_notification_thread, self._listening_result_thread, self._keepalive_thread):
+            if thread is None or thread is threading.current_thread(): continue
+            thread.join(max(deadline - time.monotonic(), 0))
+            stopped = stopped and not thread.is_alive()
+        for sock, _ in sockets:
+            if sock is None: continue
+            try: sock.close()
+            except OSError: pass
+        return stopped
+
+    # Set every waiter of query() and of reliable commands to None, so that they return now
+    def _release_waiters(self):
+        with self._pending_lock:
+            waiters = [w for waiting in self._waiters.values() for _, w in waiting]
+            waiters += [c[3] for c in self._confirmations if c[3] is not None]
+            self._waiters = {}
+            self._confirmations = []
+        for waiter in waiters: waiter.set(None)
+
+    # Do a state_refresh every keepalive_interval seconds to update self.state - only used without hub
     def _keepalive_check(self):
         _LOGGER.info("Keep-alive thread started.")
-        while(self._keepalive_flag):
+        while not self._closing.is_set():
             self.state_refresh()
-            time.sleep(_KEEPALIVE_CHECK_PERIOD)
+            self._closing.wait(self.keepalive_interval)
         _LOGGER.info("Keep-alive thread closed.")
 
     # Log messgaes in a pretty way
@@ -335,105 +645,486 @@ class LibratoneZipp:
         _LOGGER.info("Port:" + str(port) + " Command:" + str(command) + "\tData:" + str(pretty_data))
 
     # Interpret message from Zipp
-    def process_zipp_message(self, packet: bytearray, receive_port):
-        
-        zipp_message = LibratoneMessage.LibratoneMessage(packet=packet)
-        command = zipp_message.get_command_int()
-        data = zipp_message.data
+    def process_zipp_message(self, packet: bytes, receive_port):
+        start = time.perf_counter()
+        self._process_zipp_message(packet, receive_port)
+        self._metrics.observe("process", self.host, time.perf_counter() - start)
+
+    def _process_zipp_message(self, packet, receive_port):
+        try: zipp_message = LibratoneMessage.decode_packet(packet)
+        except ValueError as e:
+            self._metrics.inc("decode_errors", self.host)
+            _LOGGER.debug("Dropping malformed packet from %s on port %s: %s", self.host, receive_port, e)
+            return
+        command = zipp_message.command
+        data = bytes(zipp_message.data)
+        self._metrics.inc("rx", self.host, command)
 
         if _LOG_ALL_PACKET: self.log_zipp_messages(command=command, data=data, port=receive_port)
 
-        if data == "": pass # Skip everything which do not have any data in it
-        elif command == _COMMAND_TABLE['PlayStatus']['_get']:
-            if data == _COMMAND_TABLE['PlayStatus']['play']: self._playstatus = PLAYSTATUS_PLAY
-            elif data == _COMMAND_TABLE['PlayStatus']['stop']: self._playstatus = PLAYSTATUS_STOP
-            elif data == _COMMAND_TABLE['PlayStatus']['pause']: self._playstatus = PLAYSTATUS_PAUSE
-            self._state_calculate()
-        elif command == _COMMAND_TABLE['CurrPowerMode']['_get']:
-            if data[0] == _COMMAND_TABLE['CurrPowerMode']['awake']: self._currpowermode = POWERMODE_AWAKE
-            elif data[0] == _COMMAND_TABLE['CurrPowerMode']['sleeping']: self._currpowermode = POWERMODE_SLEEP
-            self._state_calculate()
-        elif command == _COMMAND_TABLE['Channel']['_get']:
-            try: self._channel_json = json.loads(data.decode())
-            except: self._channel_json = None
-        elif command == _COMMAND_TABLE['Voicing']['_get'] or command == _COMMAND_TABLE['Voicing']['_set']: self.voicing = self._voicingid_to_name(voicingid=data.decode(), json_list=self._voicing_list_json)
-        elif command == _COMMAND_TABLE['Room']['_get'] or command == _COMMAND_TABLE['Room']['_set']: self.room = self._voicingid_to_name(voicingid=data.decode(), json_list=self._room_list_json)
-        elif command == _COMMAND_TABLE['Voicing']['_getAll']: self._voicing_list_update_from_raw(data.decode())
-        elif command == _COMMAND_TABLE['Room']['_getAll']: self._room_list_update_from_raw(data.decode())
-        elif command == _COMMAND_TABLE['Player']['_get']: self._player_parse(player_data=data.decode())
-        elif command == _COMMAND_TABLE['Timer']['_get']: self.timer = self._timer_parse(data)
-        elif command == _COMMAND_TABLE['Name']['_get']: self.name = data.decode()
-        elif command == _COMMAND_TABLE['Version']['_get']: self.version = data.decode()
-        elif command == _COMMAND_TABLE['Volume']['_get']: self.volume = data.decode()
-        elif command == _COMMAND_TABLE['ChargingStatus']['_get']: self.chargingstatus = data.decode()
-        elif command == _COMMAND_TABLE['SignalStrength']['_get']: self.signalstrenght = data.decode()
-        elif command == _COMMAND_TABLE['SerialNumber']['_get']: self.serialnumber = data.decode()
-        elif command == _COMMAND_TABLE['MuteStatus']['_get']: self.mutestatus = data.decode()
-        elif command == _COMMAND_TABLE['DeviceColor']['_get'] or command == _COMMAND_TABLE['DeviceColor']['_set']: self.devicecolor = data.decode()
-        elif command == _COMMAND_TABLE['BatteryLevel']['_get'] or command == _COMMAND_TABLE['BatteryLevel']['_get2']: self.batterylevel = data.decode()
-
-        elif command == _COMMAND_TABLE['Group']['_notif']:
-            try:
-                s = data.decode(errors="ignore").strip()
-            except Exception:
-                s = ""
-            # Defensive: some captures showed a leading ':' or '=' — strip non-alnum at start
-            while s and not s[0].isalnum():
-                s = s[1:]
-            su = s.upper()
-            # Accept: "GROUPED,LINK ...", "MASTER,LINK ...", "SLAVE,LINK ..."
-            m = re.match(r'^(GROUPED|MASTER|SLAVE),LINK\s+(.+)$', su)
-            if m:
-                self.group_status = "GROUPED"
-                self.group_role = m.group(1)  # keep original role
-                # Use the original-cased string for link_id if possible
-                try:
-                    self.group_link_id = s.split(" ", 1)[1].strip()
-                except Exception:
-                    self.group_link_id = None
-            elif "UNGROUP" in su or "UNLINK" in su:               
-                self.group_status = "UNGROUPED"
-                self.group_link_id = None
-                self.group_role = None
-            else:
-                # Unknown group message; record raw for debugging
-                self.group_status = f"UNKNOWN({s})"
-                self.group_role = None
+        # Drop a packet received twice, i.e. the answers to a command and to its retransmission
+        if self._retransmitted and self._is_duplicate(command, zipp_message.crc, data):
+            self._metrics.inc("duplicates", self.host, command)
+            return
+
+        # Discard answers older than one already applied
+        seq = self._accept_reply(command, zipp_message.crc)
+        if seq is None: return
 
+        handler = self._dispatch.get(command)
+        if handler is not None:
+            with self._state_lock:
+                handler(self, data)
+                if self._state_dirty: self._commit_state()
         else:
+            self._metrics.inc("unknown", self.host, command)
             if _LOG_UNKNOWN_PACKET: self.log_zipp_messages(command=command, data=data, port=receive_port)
-            else: pass
 
-    # Wait for a message from the Zipp, start a thread to process it and send an ACK to _UDP_NOTIFICATION_SEND_PORT = 3334
-    def listen_incoming_zipp_notification(self, socket, receive_port, ack_port=None):
+        if self._lifecycle_cache is not None and command in _LIFECYCLE_COMMANDS: self._lifecycle_received(command, data)
+        if command in self._unready: self._answered_for_ready(command)
+        if command in _FIELD_STATS_COMMANDS: self._field_updated(command, data)
+        self._resolve_waiters(command, seq, data)
+        if self._confirmations: self._resolve_confirmations(command, zipp_message.crc, data)
+
+    # Return True if a packet with the same command, crc and data was received within _DUPLICATE_WINDOW, for a crc sent again
+    # Only retransmitted crcs are checked: a speaker which does not echo the crc may answer two requests with the same one,
+    # and the second answer must still reach its query() or reliable command
+    # Packets of a device are processed one at a time (see OrderedWorkerPool), so no lock is needed
+    def _is_duplicate(self, command, crc, data):
+        if crc not in self._retransmitted: return False
+        now = time.monotonic()
+        key = (command, crc)
+        previous = self._received.pop(key, None)
+        self._received[key] = (now, data)
+        if len(self._received) > _QUERY_TRACKED_REQUESTS:
+            del self._received[next(iter(self._received))]
+        return previous is not None and previous[1] == data and now - previous[0] < _DUPLICATE_WINDOW
+
+    # Record an update of the value carried by `command`: its poll interval is reset when it changes, doubled otherwise
+    # except for _STATE_COMMANDS, always polled every keepalive interval
+    def _field_updated(self, command, data):
+        now = time.monotonic()
+        stats = self._field_stats.get(command)
+        if stats is None:
+            self._field_stats[command] = [now, data, self.keepalive_interval]
+            return
+        if data == stats[1]:
+            if command not in _STATE_COMMANDS: stats[2] = min(stats[2] * 2, self.keepalive_interval * _POLL_INTERVAL_MAX_FACTOR)
+        else:
+            stats[1] = data
+            stats[2] = self.keepalive_interval
+        stats[0] = now
+
+    # _POLLED_COMMANDS whose value was not updated within its poll interval
+    def _stale_commands(self):
+        now = time.monotonic()
+        stale = []
+        for command in _POLLED_COMMANDS:
+            stats = self._field_stats.get(_QUERY_REPLY_COMMAND.get(command, command))
+            if stats is None or now - stats[0] >= stats[2] - _POLL_SLACK: stale.append(command)
+        return stale
+
+    # Call callback(zipp, {field: (old, new)}) when values in `fields` (default: all of _SUBSCRIBABLE_FIELDS) change
+    # Changes within the notifier window are merged into one call, made from the notifier and never from the receive thread
+    # Return a function removing the subscription
+    def subscribe(self, callback, fields=None):
+        return self._subscribers.add(callback, fields)
+
+    # Set a value of _SUBSCRIBABLE_FIELDS from a handler, and mark the snapshot to be replaced if it changed - _state_lock must be held
+    def _store(self, attribute, value):
+        if getattr(self, attribute) != value:
+            setattr(self, attribute, value)
+            self._state_dirty = True
+
+    # Replace the snapshot if a value changed, and publish the changes to subscribers - _state_lock must be held
+    # process_zipp_message() only calls it when a handler marked a change, see _store()
+    def _commit_state(self):
+        self._state_dirty = False
+        previous = self.snapshot
+        values = _get_watched_values(self)
+        if values == previous[1:]: return
+        self.snapshot = ZippState(previous.revision + 1, *values)
+        if self._subscribers or self._notifier.subscribers:
+            changes = {f: (old, new) for f, old, new in zip(_SUBSCRIBABLE_FIELDS, previous[1:], values) if old != new}
+            self._notifier.publish(self, changes)
+
+    # Set values of _SUBSCRIBABLE_FIELDS known from elsewhere, e.g. discovery, as one change of the snapshot
+    def _store_values(self, values):
+        with self._state_lock:
+            for attribute, value in values.items(): self._store(attribute, value)
+            if self._state_dirty: self._commit_state()
+
+    # Clean up all variables and set `state` if given, as one change of the snapshot
+    def _reset_state(self, state=None):
+        with self._state_lock:
+            self._cleanup_variables()
+            if state is not None: self.state = state
+            self._commit_state()
+
+    # Return the snapshot if a value changed after the snapshot `revision`, None otherwise - without lock nor copy
+    def changed_since(self, revision):
+        snapshot = self.snapshot
+        return snapshot if snapshot.revision > revision else None
+
+    # Serve the lifecycle values saved for this host, through their handlers, as one change of the snapshot
+    # They are revalidated in the background by the next get_all_fixed_for_lifecycle(), see state_refresh()
+    def _load_lifecycle(self):
+        values = self._lifecycle_cache.get(self.host)
+        self._lifecycle_confirmed = False
+        if not values: return
+        with self._state_lock:
+            for command, data in values.items():
+                if command not in _LIFECYCLE_COMMANDS: continue     # Saved by an older version
+                handler = self._dispatch.get(command)
+                if handler is not None: handler(self, data)
+                self._unready.discard(command)
+            self._commit_state()
+        _LOGGER.debug("Lifecycle values of %s loaded from %s", self.host, self._lifecycle_cache.path)
+
+    # Save a lifecycle answer; drop the saved values if the firmware or the speaker behind this host changed
+    def _lifecycle_received(self, command, data):
+        if command in _LIFECYCLE_IDENTITY:
+            cached = self._lifecycle_cache.value(self.host, command)
+            if cached is not None and cached != data:
+                _LOGGER.info("Lifecycle values of %s are outdated (%s changed), asking them again.", self.host, command)
+                self._lifecycle_cache.invalidate(self.host)
+                self._lifecycle_refetch()
+            if command == _COMMAND_TABLE['Version']['_get']: self._lifecycle_confirmed = True
+        self._lifecycle_cache.update(self.host, command, data)
+
+    # Ask again all lifecycle values, answers received before the invalidation being lost
+    def _lifecycle_refetch(self):
+        self._run_gets(self.get_all_fixed_for_lifecycle)
+
+    # Return True if state_refresh() must ask the lifecycle values: not if the version was answered within
+    # the keepalive interval (e.g. after bootstrap()), otherwise always without lifecycle cache,
+    # and with one until the speaker confirmed the firmware version of the values served
+    def _lifecycle_needed(self):
+        stats = self._field_stats.get(_COMMAND_TABLE['Version']['_get'])
+        if stats is not None and time.monotonic() - stats[0] < self.keepalive_interval - _POLL_SLACK: return False
+        if self._lifecycle_cache is None: return True
+        if self.version is None: self._load_lifecycle()   # Values cleared while the speaker was unreachable
+        return not self._lifecycle_confirmed
+
+    # Record the answer of a command of _READY_COMMANDS, and set `ready` once all were answered
+    def _answered_for_ready(self, command):
+        self._unready.discard(command)
+        if not self._unready: self.ready.set()
+
+    # Send the first requests at once, without waiting nor probing the host: lifecycle values, then current values
+    # Called by connect_many() from the hub timer; `ready` is set when the answers arrive
+    def bootstrap(self):
+        self._run_gets(self.get_all_fixed_for_lifecycle)
+        self._run_gets(self.get_stale)
+
+    # Call a function sending *get* commands - from the hub loop as a task for AsyncLibratoneZipp
+    def _run_gets(self, function):
+        function()
+
+    # Register handler(zipp, data) for `command` on this device, e.g. for unimplemented commands listed in README
+    # A handler registered for an already processed command replaces the built-in one
+    def handler_register(self, command: int, handler):
+        self._dispatch[command] = _marking_dirty(handler)
+
+    def handler_unregister(self, command: int):
+        self._dispatch[command] = type(self)._DISPATCH_TABLE.get(command)
+        if self._dispatch[command] is None: del self._dispatch[command]
+
+    # Handlers of process_zipp_message, see _DISPATCH_TABLE
+    def _process_playstatus(self, data):
+        if data == _COMMAND_TABLE['PlayStatus']['play']: self._playstatus = PLAYSTATUS_PLAY
+        elif data == _COMMAND_TABLE['PlayStatus']['stop']: self._playstatus = PLAYSTATUS_STOP
+        elif data == _COMMAND_TABLE['PlayStatus']['pause']: self._playstatus = PLAYSTATUS_PAUSE
+        self._state_calculate()
+
+    def _process_currpowermode(self, data):
+        if data[0] == _COMMAND_TABLE['CurrPowerMode']['awake']: self._currpowermode = POWERMODE_AWAKE
+        elif data[0] == _COMMAND_TABLE['CurrPowerMode']['sleeping']: self._currpowermode = POWERMODE_SLEEP
+        self._state_calculate()
+
+    def _process_channel(self, data): self._channel_json = interned(data, parse_json)
+    def _process_voicing(self, data):
+        self._voicing_id = data.decode()
+        self._store('voicing', self._voicingid_to_name(voicingid=self._voicing_id, catalog=self._voicing_catalog))
+    def _process_room(self, data):
+        self._room_id = data.decode()
+        self._store('room', self._voicingid_to_name(voicingid=self._room_id, catalog=self._room_catalog))
+    def _process_voicing_list(self, data): self._voicing_list_update_from_raw(data)
+    def _process_room_list(self, data): self._room_list_update_from_raw(data)
+    def _process_player(self, data): self._player_parse(player_data=data)
+    def _process_timer(self, data): self._store('timer', self._timer_parse(data))
+
+    def _process_group(self, data):
+        try:
+            s = data.decode(errors="ignore").strip()
+        except Exception:
+            s = ""
+        # Defensive: some captures showed a leading ':' or '=' — strip non-alnum at start
+        while s and not s[0].isalnum():
+            s = s[1:]
+        su = s.upper()
+        # Accept: "GROUPED,LINK ...", "MASTER,LINK ...", "SLAVE,LINK ..."
+        m = _GROUP_NOTIF_RE.match(su)
+        if m:
+            self._store('group_status', "GROUPED")
+            self._store('group_role', m.group(1))  # keep original role
+            # Use the original-cased string for link_id if possible
+            try:
+                self._store('group_link_id', s.split(" ", 1)[1].strip())
+            except Exception:
+                self._store('group_link_id', None)
+        elif "UNGROUP" in su or "UNLINK" in su:               
+            self._store('group_status', "UNGROUPED")
+            self._store('group_link_id', None)
+            self._store('group_role', None)
+        else:
+            # Unknown group message; record raw for debugging
+            self._store('group_status', f"UNKNOWN({s})")
+            self._store('group_role', None)
+
+    # command ID -> handler(zipp, data), built once from _COMMAND_TABLE
+    _DISPATCH_TABLE = {
+        _COMMAND_TABLE['PlayStatus']['_get']: _process_playstatus,
+        _COMMAND_TABLE['CurrPowerMode']['_get']: _process_currpowermode,
+        _COMMAND_TABLE['Channel']['_get']: _process_channel,
+        _COMMAND_TABLE['Voicing']['_get']: _process_voicing,
+        _COMMAND_TABLE['Voicing']['_set']: _process_voicing,
+        _COMMAND_TABLE['Room']['_get']: _process_room,
+        _COMMAND_TABLE['Room']['_set']: _process_room,
+        _COMMAND_TABLE['Voicing']['_getAll']: _process_voicing_list,
+        _COMMAND_TABLE['Room']['_getAll']: _process_room_list,
+        _COMMAND_TABLE['Player']['_get']: _process_player,
+        _COMMAND_TABLE['Timer']['_get']: _process_timer,
+        _COMMAND_TABLE['Name']['_get']: _store_decoded('name'),
+        _COMMAND_TABLE['Version']['_get']: _store_decoded('version'),
+        _COMMAND_TABLE['Volume']['_get']: _store_decoded('volume'),
+        _COMMAND_TABLE['ChargingStatus']['_get']: _store_decoded('chargingstatus'),
+        _COMMAND_TABLE['SignalStrength']['_get']: _store_decoded('signalstrenght'),
+        _COMMAND_TABLE['SerialNumber']['_get']: _store_decoded('serialnumber'),
+        _COMMAND_TABLE['MuteStatus']['_get']: _store_decoded('mutestatus'),
+        _COMMAND_TABLE['DeviceColor']['_get']: _store_decoded('devicecolor'),
+        _COMMAND_TABLE['DeviceColor']['_set']: _store_decoded('devicecolor'),
+        _COMMAND_TABLE['BatteryLevel']['_get']: _store_decoded('batterylevel'),
+        _COMMAND_TABLE['BatteryLevel']['_get2']: _store_decoded('batterylevel'),
+        _COMMAND_TABLE['Group']['_notif']: _process_group,
+    }
+
+    # Remember an in-flight get request by its crc, return its sequence number
+    def _track_request(self, reply_command, crc):
+        with self._pending_lock:
+            self._request_seq += 1
+            self._requests[crc] = (reply_command, self._request_seq, time.perf_counter())
+            if len(self._requests) > _QUERY_TRACKED_REQUESTS:
+                del self._requests[next(iter(self._requests))]
+            return self._request_seq
+
+    # Return the sequence number of a received answer, or None if a newer answer was already applied
+    # Answers which do not match a tracked request (notifications, or no crc echo) are as new as the last request sent
+    def _accept_reply(self, command, crc):
+        with self._pending_lock:
+            request = self._requests.get(crc)
+            if request is not None and request[0] == command:
+                del self._requests[crc]
+                seq = request[1]
+                stale = seq < self._applied_seq.get(command, 0)
+            else:
+                request = None
+                seq = self._request_seq
+                stale = False
+            if not stale: self._applied_seq[command] = seq
+        if request is not None: self._metrics.observe("rtt", self.host, time.perf_counter() - request[2])
+        return None if stale else seq
+
+    # Wake up every query() waiting for `command` which was sent before the answer `seq`
+    # Waiters registered after the answer have a newer seq, so an empty list is checked without the lock
+    def _resolve_waiters(self, command, seq, data):
+        if not self._waiters.get(command): return
+        with self._pending_lock:
+            waiters = self._waiters.get(command)
+            if not waiters: return
+            done = [w for w in waiters if w[0] <= seq]
+            if not done: return
+            self._waiters[command] = [w for w in waiters if w[0] > seq]
+        attribute = _QUERY_ATTRIBUTE.get(command)
+        if attribute is not None: value = getattr(self, attribute)
+        else:
+            try: value = data.decode()
+            except: value = data
+        for _, waiter in done: waiter.set(value)
+
+    def _new_waiter(self): return _QueryWaiter()
+
+    # (reply command, expected data or None for any) confirming `command`, or None if the speaker does not confirm it
+    def _confirmation(self, command, commandType, payload):
+        if commandType == 1: return _QUERY_REPLY_COMMAND.get(command, command), None
+        payload = bytes(payload)
+        confirmation = _PAYLOAD_CONFIRMATION.get((command, payload))
+        if confirmation is not None: return confirmation
+        confirmation = _SET_CONFIRMATION.get(command)
+        if confirmation is None: return None
+        return confirmation[0], payload if confirmation[1] else None
+
+    # Register a waiter set when `command` is confirmed, or return None if it cannot be
+    def _expect_confirmation(self, command, commandType, payload, crc):
+        confirmation = self._confirmation(command, commandType, payload)
+        if confirmation is None: return None
+        waiter = self._new_waiter()
+        with self._pending_lock:
+            self._confirmations.append((confirmation[0], confirmation[1], crc, waiter))
+        return waiter
+
+    def _remove_confirmation(self, waiter):
+        with self._pending_lock:
+            self._confirmations = [c for c in self._confirmations if c[3] is not waiter]
+
+    # Set the waiters of reliable commands confirmed by this packet: the reply to their crc, or the expected notification
+    def _resolve_confirmations(self, command, crc, data):
+        with self._pending_lock:
+            done = [c for c in self._confirmations if c[0] == command and (c[2] == crc or c[1] is None or c[1] == data)]
+            if not done: return
+            self._confirmations = [c for c in self._confirmations if c not in done]
+        for confirmation in done: confirmation[3].set(True)
+
+    # Resend a packet with the same crc after _RETRANSMIT_DELAY, then twice as long each time, until `waiter` is set
+    # Return True if it was set within `deadline` seconds
+    def _retransmit(self, waiter, deadline, port, template, payload, crc):
+        end = time.monotonic() + deadline
+        delay = _RETRANSMIT_DELAY
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0: return False
+            if waiter.wait(min(delay, remaining)): return True
+            if time.monotonic() >= end: return False
+            self._resend(port, template, payload, crc)
+            delay *= 2
+
+    # Send a packet again, unless it is still waiting in the outbox or a newer value of its command was sent
+    def _resend(self, port, template, payload, crc):
+        if template.commandType != 1:
+            if self._latest_write.get(template.command, crc) != crc: return
+            if self.outbox.waiting(lambda args: args[3] == crc): return
+        self._metrics.inc("retransmits", self.host, template.command)
+        with self._pending_lock:
+            self._retransmitted[crc] = None
+            if len(self._retransmitted) > _QUERY_TRACKED_REQUESTS:
+                del self._retransmitted[next(iter(self._retransmitted))]
+        self._send(port, template, payload, crc)
+
+    # Stop waiting for the confirmation of the previous value of `command`: the one with `crc` replaces it
+    # Its reliable send_command() returns False, as the speaker is only asked the latest value
+    def _supersede(self, command, crc):
+        with self._pending_lock:
+            previous = self._latest_write.get(command)
+            self._latest_write[command] = crc
+            if previous is None or previous == crc: return
+            done = [c for c in self._confirmations if c[2] == previous]
+            if not done: return
+            self._confirmations = [c for c in self._confirmations if c[2] != previous]
+        for confirmation in done: confirmation[3].set(None)
+
+    # Outbox callback: a command waiting was replaced by a newer value
+    def _coalesced(self, args):
+        self._metrics.inc("coalesced", self.host, args[1].command)
+
+    def _remove_waiter(self, reply_command, waiter):
+        with self._pending_lock:
+            waiters = self._waiters.get(reply_command, [])
+            self._waiters[reply_command] = [w for w in waiters if w[1] is not waiter]
+
+    # Send a get request for `command` and register a waiter for its answer
+    def _send_query(self, command):
+        if isinstance(command, str): command = _COMMAND_TABLE[command]['_get']
+        reply_command = _QUERY_REPLY_COMMAND.get(command, command)
+        crc = LibratoneMessage.next_crc()
+        waiter = self._new_waiter()
+        seq = self._track_request(reply_command, crc)
+        with self._pending_lock:
+            self._waiters.setdefault(reply_command, []).append((seq, waiter))
+        template = LibratoneMessage.get_template(command, 1)
+        if not self._send_packet(_UDP_CONTROL_PORT, template, b'', crc):
+            self._remove_waiter(reply_command, waiter)
+            return reply_command, None, template, crc
+        return reply_command, waiter, template, crc
+
+    # Ask a value and wait for its answer: return the parsed value (see _QUERY_ATTRIBUTE), or None on timeout
+    # `command` is either a command ID or a _COMMAND_TABLE key like 'Volume'
+    # If reliable (default: self.reliable), the request is resent until answered within `timeout`
+    def query(self, command, timeout=_QUERY_TIMEOUT, reliable=None):
+        reply_command, waiter, template, crc = self._send_query(command)
+        if waiter is None: return None
+        if self.reliable if reliable is None else reliable: answered = self._retransmit(waiter, timeout, _UDP_CONTROL_PORT, template, b'', crc)
+        else: answered = waiter.wait(timeout)
+        if answered: return waiter.value
+        self._remove_waiter(reply_command, waiter)
+        return None
+
+    # Wait for a message from the Zipp, send an ACK to _UDP_NOTIFICATION_SEND_PORT = 3334 and queue it on the shared worker pool
+    # Like on the hub, packets of this device are processed in order by a fixed number of threads, the oldest dropped if too many wait
+    # On socket error, the socket is bound again after a growing delay, instead of giving up
+    def listen_incoming_zipp_notification(self, sock, receive_port, ack_port=None):
         _LOGGER.info("Listening incoming Zipp messages on %s", str(receive_port))
-        while(self._listening_notification_flag):
+        workers = get_default_workers()
+        retry_delay = _LISTEN_RETRY_DELAY
+        while not self._closing.is_set():
             # Wait for new packet; address is the originating IP:port
             try:
-                message, address = socket.recvfrom(_UDP_BUFFER_SIZE)
-                thread = threading.Thread(target=self.process_zipp_message, name="Process_Zipp_Message", args=[message, receive_port])
-                thread.start()
-
-                # Send the ack
-                if ack_port != None: socket.sendto(LibratoneMessage.LibratoneMessage(command=0).get_packet(), (self.host, _UDP_NOTIFICATION_SEND_PORT))
-            except:
-                _LOGGER.info("Connection closed! Port %s", str(receive_port))
-                self.state = STATE_UNKNOWN
-                while(self.state == STATE_UNKNOWN):
-                    time.sleep(_KEEPALIVE_CHECK_PERIOD)
+                message, address = sock.recvfrom(_UDP_BUFFER_SIZE)
+            except OSError as e:
+                if self._closing.is_set(): break
+                _LOGGER.warning("Socket error on port %s, binding again in %s s: %s", receive_port, retry_delay, e)
+                with self._state_lock:
+                    self.state = STATE_UNKNOWN
+                    self._commit_state()
+                try: sock.close()
+                except OSError: pass
+                if self._closing.wait(retry_delay): break
+                retry_delay = min(retry_delay * 2, _KEEPALIVE_CHECK_PERIOD)
+                new_sock = self._bind_socket(receive_port)
+                if new_sock is not None:
+                    sock = new_sock
+                    if receive_port == _UDP_RESULT_PORT: self._listening_result_socket = sock
+                    else: self._listening_notification_socket = sock
+                continue
+            retry_delay = _LISTEN_RETRY_DELAY
+            # Woken up by exit()
+            if self._closing.is_set(): break
+
+            # Send the ack
+            if ack_port != None:
+                try:
+                    _ACK_TEMPLATE.sendmsg(sock, (self.host, _UDP_NOTIFICATION_SEND_PORT))
+                    self._metrics.inc("acks", self.host)
+                except OSError as e:
+                    _LOGGER.debug("ACK to %s not sent: %s", self.host, e)
+
+            if not workers.submit(self.host, self.process_zipp_message, message, receive_port):
+                self._metrics.inc("queue_drops", self.host)
         _LOGGER.info("Stopped listening Zipp messages on %s", str(receive_port))
 
-    # Create a socket, start a thread to manage incoming messages from receive_port and send a trigger to trigger_port
-    
-    def _get_new_socket(self, receive_port, trigger_port=None, ack_port=None):
-        """Create one UDP socket bound to receive_port, start its recv thread, and optionally send a trigger."""
+    # Return a UDP socket bound to receive_port, or None
+    def _bind_socket(self, receive_port):
         try:
             s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             # Optional: on some OSes this helps quick restarts; does NOT allow two binds simultaneously.
             s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            # Absorb bursts while the workers are busy, like the hub
+            try: s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _UDP_RECEIVE_BUFFER)
+            except OSError: pass
 
             print(f"[LZ] binding receive_port {receive_port}")
             s.bind(("", receive_port))
+            return s
+        except OSError as e:
+            _LOGGER.warning("Socket error binding %s: %s", receive_port, e)
+            return None
+
+    # Create a socket, start a thread to manage incoming messages from receive_port and send a trigger to trigger_port
+
+    def _get_new_socket(self, receive_port, trigger_port=None, ack_port=None):
+        """Create one UDP socket bound to receive_port, start its recv thread, and optionally send a trigger."""
+        try:
+            s = self._bind_socket(receive_port)
+            if s is None: return None
 
             # Start the listener thread AFTER bind
             t = threading.Thread(
@@ -447,10 +1138,7 @@ class LibratoneZipp:
             # Optional trigger to kick traffic (same as your original intent)
             if trigger_port is not None:
                 try:
-                    pkt = LibratoneMessage.LibratoneMessage(
-                        command=_COMMAND_TABLE["ChargingStatus"]["_get"]
-                    ).get_packet()
-                    s.sendto(pkt, (self.host, trigger_port))
+                    LibratoneMessage.get_template(_COMMAND_TABLE["ChargingStatus"]["_get"]).sendmsg(s, (self.host, trigger_port))
                 except Exception as e:
                     _LOGGER.warning("Trigger send failed on port %s: %s", trigger_port, e)
 
@@ -466,19 +1154,70 @@ class LibratoneZipp:
             _LOGGER.warning("Socket error binding %s: %s", receive_port, e)
             return None
            
-    def send_command(self, port, command, commandType=None, data=None):
+    def send_command(self, port, command, commandType=None, data=None, reliable=None):
         """Send a command packet. In hub mode, use shared sockets; otherwise, legacy per-device socket.
         Returns True on successful send, False on failure.
+        If reliable (default: self.reliable), the packet is resent until the speaker confirms it, see _SET_CONFIRMATION:
+        returns True once confirmed, False if not within _RETRANSMIT_DEADLINE. Commands without confirmation are sent once.
         """
-        # Build the exact same packet as before
-        message = LibratoneMessage.LibratoneMessage(
-            command=command, data=data, commandType=commandType
-        ).get_packet()
+        template, payload, crc, waiter = self._prepare_command(command, commandType, data, reliable)
+        if waiter is None: return self._send(port, template, payload, crc)
+        start = time.perf_counter()
+        try:
+            confirmed = self._send(port, template, payload, crc) and self._retransmit(waiter, _RETRANSMIT_DEADLINE, port, template, payload, crc) and waiter.value
+        finally:
+            self._remove_confirmation(waiter)
+        return self._confirmed(command, confirmed, start)
+
+    # Send a get right away, and a set through the outbox
+    def _send(self, port, template, payload, crc):
+        if template.commandType == 1: return self._send_packet(port, template, payload, crc)
+        coalesce = template.command in _COALESCED_COMMANDS
+        if coalesce: self._supersede(template.command, crc)
+        return self.outbox.submit(template.command, (port, template, payload, crc), coalesce)
+
+    # Same packet as LibratoneMessage(command, data, commandType) from a cached header template, and its confirmation waiter if reliable
+    def _prepare_command(self, command, commandType, data, reliable):
+        crc = LibratoneMessage.next_crc()
+        if commandType == 1: self._track_request(_QUERY_REPLY_COMMAND.get(command, command), crc)
+        template = LibratoneMessage.get_template(command, commandType)
+        payload = LibratoneMessage.encode_data(data)
+        waiter = None
+        if self.reliable if reliable is None else reliable: waiter = self._expect_confirmation(command, commandType, payload, crc)
+        return template, payload, crc, waiter
+
+    # `confirmed` is True if confirmed, None if superseded by a newer value, False otherwise
+    def _confirmed(self, command, confirmed, start):
+        if confirmed: self._metrics.observe("confirm", self.host, time.perf_counter() - start)
+        elif confirmed is None: return False
+        else:
+            self._metrics.inc("unconfirmed", self.host, command)
+            _LOGGER.warning("Command %s not confirmed by %s within %s s", command, self.host, _RETRANSMIT_DEADLINE)
+        return confirmed
+
+    # Packet of a set command sent by a group fan-out (see ZippGroup), or None if it was queued behind commands waiting in the outbox
+    def _group_packet(self, command, data):
+        crc = LibratoneMessage.next_crc()
+        template = LibratoneMessage.get_template(command)
+        payload = LibratoneMessage.encode_data(data)
+        coalesce = command in _COALESCED_COMMANDS
+        if coalesce: self._supersede(command, crc)
+        if not self.outbox.reserve():
+            self.outbox.submit(command, (_UDP_CONTROL_PORT, template, payload, crc), coalesce)
+            return None
+        self._metrics.inc("tx", self.host, command)
+        return template.packet(payload, crc)
+
+    # Send a packet from its template, payload and crc
+    # Nothing is sent after exit(), e.g. by a setter or the outbox running on another thread
+    def _send_packet(self, port, template, payload, crc):
+        if self._closing.is_set(): return False
 
         # --- Hub path: bypass per-device sockets entirely ---
-        if 'USE_SOCKET_HUB' in globals() and USE_SOCKET_HUB:
+        if self._hub is not None:
             try:
-                _get_hub().send_control(self.host, message)  # always goes to host:7777
+                self._hub.send_template(self.host, template, payload, crc)  # always goes to host:7777
+                self._metrics.inc("tx", self.host, template.command)
                 return True
             except Exception as e:
                 try:
@@ -489,57 +1228,35 @@ class LibratoneZipp:
 
         # --- Legacy path: original per-device socket logic ---
         if self._listening_notification_socket is None:
-            self._listening_notification_socket, _ = self._get_new_socket(receive_port=_UDP_NOTIFICATION_RECEIVE_PORT)
-            if self._listening_notification_socket is None:
-                try:
-                    _LOGGER.warning("Failed to create notification socket")
-                except Exception:
-                    pass
+            new_socket = self._get_new_socket(receive_port=_UDP_NOTIFICATION_RECEIVE_PORT, ack_port=_UDP_NOTIFICATION_SEND_PORT)
+            if new_socket is None:
+                _LOGGER.warning("Failed to create notification socket")
                 return False
+            self._listening_notification_socket, self._listening_notification_thread = new_socket
 
         try:
-            # Send and store the answer in resp
-            resp = self._listening_notification_socket.sendto(message, (self.host, port))
-
-            if resp == 0:
-                try:
-                    _LOGGER.warning("Send fail, disconnecting socket")
-                except Exception:
-                    pass
-                try:
-                    self._listening_notification_socket.close()
-                except Exception:
-                    pass
-                self._listening_notification_socket = None
-                return False
+            template.sendmsg(self._listening_notification_socket, (self.host, port), payload, crc)
+            self._metrics.inc("tx", self.host, template.command)
             return True
 
-        except (BrokenPipeError, ConnectionError) as connect_error:
+        except OSError as connect_error:
+            # The listener binds its socket again on error: retry once with the current one
+            _LOGGER.warning("Connection error, retrying. %s", connect_error)
             try:
-                _LOGGER.warning("Connection error, retrying. %s", connect_error)
-            except Exception:
-                pass
-            self._listening_notification_socket = None
-            self._listening_notification_socket = self._get_new_socket(self.host, port)
-            if self._listening_notification_socket is not None:
-                try:
-                    # retrying after broken pipe error
-                    self._listening_notification_socket.sendto(message, (self.host, port))
-                    return True
-                except Exception as e2:
-                    try:
-                        _LOGGER.error("Retry send failed: %s", e2)
-                    except Exception:
-                        pass
+                template.sendmsg(self._listening_notification_socket, (self.host, port), payload, crc)
+                self._metrics.inc("tx", self.host, template.command)
+                return True
+            except OSError as e2:
+                _LOGGER.error("Retry send failed: %s", e2)
             return False
 
         # Send a control message to set something (port _UDP_CONTROL_PORT = 7777) - Use the send_command function
-    def set_control_command(self, command, data = None):
-        return self.send_command(port=_UDP_CONTROL_PORT, command=command, data=data)
+    def set_control_command(self, command, data = None, reliable = None):
+        return self.send_command(port=_UDP_CONTROL_PORT, command=command, data=data, reliable=reliable)
 
     # Send a control message to get something - same than above
-    def get_control_command(self, command, data = None):
-        return self.send_command(port=_UDP_CONTROL_PORT, command=command, data=data, commandType=1)
+    def get_control_command(self, command, data = None, reliable = None):
+        return self.send_command(port=_UDP_CONTROL_PORT, command=command, data=data, commandType=1, reliable=reliable)
 
     # Get functions to get status - assuming that the speaker will answer it
     def version_get(self): return self.get_control_command(command=_COMMAND_TABLE['Version']['_get'])
@@ -575,52 +1292,55 @@ class LibratoneZipp:
         self.timer_get()
         self.playstatus_get()
 
-    # Call all *get* for values that are fixed for the lifecycle 
+    # Call *get* functions of get_all() only for values not updated recently, by a notification or a previous answer
+    # Values which do not change are polled less and less often, see _field_updated()
+    # Keepalive and bootstrap polls are never reliable: a lost answer is asked again by the next keepalive,
+    # while waiting for it would block the scheduler worker or the hub timer shared by every device
+    def get_stale(self):
+        for command in self._stale_commands():
+            self.get_control_command(command=command, reliable=False)
+
+    # Call all *get* for values that are fixed for the lifecycle - not reliable, like get_stale()
     def get_all_fixed_for_lifecycle(self):
-        self.currpowermode_get()
-        self.version_get()
-        self.name_get()
-        self.room_getall()
-        self.voicing_getall()
-        self.devicecolor_get()
-        self.serialnumber_get()
-        self.channel_get()
+        for command in _LIFECYCLE_POLLED_COMMANDS:
+            self.get_control_command(command=command, reliable=False)
 
     # Calculate Zipp state based on _currpowermode and _playstatus
     def _state_calculate(self):
         # If the Zipp sleeps, set this status
         if self._currpowermode == POWERMODE_SLEEP:
-            self.state = STATE_SLEEP
+            self._store('state', STATE_SLEEP)
             return True
         elif self._currpowermode == POWERMODE_AWAKE:
-            if self._playstatus == PLAYSTATUS_PLAY: self.state = STATE_PLAY
-            elif self._playstatus == PLAYSTATUS_PAUSE: self.state = STATE_PAUSE
-            elif self._playstatus == PLAYSTATUS_STOP: self.state = STATE_STOP
+            if self._playstatus == PLAYSTATUS_PLAY: self._store('state', STATE_PLAY)
+            elif self._playstatus == PLAYSTATUS_PAUSE: self._store('state', STATE_PAUSE)
+            elif self._playstatus == PLAYSTATUS_STOP: self._store('state', STATE_STOP)
             else:
-                self.state = STATE_ON
+                self._store('state', STATE_ON)
                 return True
         else:
-            self.state = STATE_UNKNOWN
+            self._store('state', STATE_UNKNOWN)
             return False
 
     # Refresh the state of the Zipp
     def state_refresh(self):
-        if host_up(self.host):
+        # With a hub, use its cached and concurrent probing; otherwise a single bounded probe
+        if self._hub is not None: up = self._hub.reachability.is_up(self.host)
+        else: up = host_up(self.host)
+        if up:
             # If the Zipp was not in a "controlled" state, refresh also lifecycle variables
-            if self.state != STATE_PLAY and self.state != STATE_PAUSE and self.state != STATE_STOP:
+            # Voicing and room answered before their list are named when it arrives, so current values are asked at once
+            if self.state != STATE_PLAY and self.state != STATE_PAUSE and self.state != STATE_STOP and self._lifecycle_needed():
                 self.get_all_fixed_for_lifecycle()
-                time.sleep(_GET_LIFECYCLE_VALUES)
-            self.get_all()
+            self.get_stale()
         else:
-            self._cleanup_variables()
-            self.state = STATE_UNKNOWN
+            self._reset_state(STATE_UNKNOWN)
 
     # Send PlayControl commands
     def _playcontrol_set(self, action):
         # Possible actions are defined in _COMMAND_TABLE['PlayControl']
         try:
-            self.set_control_command(_COMMAND_TABLE['PlayControl']['_set'], _COMMAND_TABLE['PlayControl'][action])
-            return True
+            return self.set_control_command(_COMMAND_TABLE['PlayControl']['_set'], _COMMAND_TABLE['PlayControl'][action])
         except:
             _LOGGER.warning("Error: %s command not sent.", action)
             return False
@@ -641,8 +1361,7 @@ class LibratoneZipp:
             return False
         try:
             if not isinstance(favourite_id, str): favourite_id = str(favourite_id)
-            self.set_control_command(_COMMAND_TABLE['Player']['_set'], _COMMAND_TABLE['Player']['favorite'][favourite_id])
-            return True
+            return self.set_control_command(_COMMAND_TABLE['Player']['_set'], _COMMAND_TABLE['Player']['favorite'][favourite_id])
         except:
             _LOGGER.warning("Error: favorite command not sent.")
             return False
@@ -651,64 +1370,46 @@ class LibratoneZipp:
     def _voicingid_set(self, voicing_name, type):
 
         if type == "Voicing":
-            json_list = self._voicing_list_json
+            catalog = self._voicing_catalog
         elif type == "Room":
-            json_list = self._room_list_json
+            catalog = self._room_catalog
         else:
             _LOGGER.warning("voicingid_set: type must be either 'Voicing' or 'Room'")
             return False
-        
-        try:
-            for item in json_list:
-                if voicing_name == item['name']:
-                    self.set_control_command(command=_COMMAND_TABLE[type]['_set'], data=item['voicingId'])
-                    break
-            return True
-        except:
+
+        if catalog is None:
             _LOGGER.warning("Error: voicing command not sent.")
             return False
+        voicing_id = catalog.voicing_id(voicing_name)
+        if voicing_id is None: return True
+        return self.set_control_command(command=_COMMAND_TABLE[type]['_set'], data=voicing_id)
 
     # Send Voicing command
     def voicing_set(self, voicing_name:str): return self._voicingid_set(voicing_name=voicing_name, type="Voicing")
     def room_set(self, room_name:str): return self._voicingid_set(voicing_name=room_name, type="Room")
 
 
-    # Transform raw all room/voicing list (JSON) into a list with only room names
-    def _name_list_from_json(self, json_list):
-        name_list = []
-        for item in json_list:
-            name_list.append(item['name'])
-        return name_list
-
-    # Parse raw voicing list, update the name list
+    # Parse raw voicing list (bytes or str), update the name list
+    # Parsed once per distinct list and shared by all speakers sending it: lists and names must not be modified
     def _voicing_list_update_from_raw(self, raw_list):
-        try:
-            self._voicing_list_json = json.loads(raw_list)
-            self.voicing_list = self._name_list_from_json(self._voicing_list_json)
-        except:
-            self._voicing_list_json = None
-            self.voicing_list = None
+        self._voicing_catalog = interned(raw_list, parse_catalog)
+        self._voicing_list_json = self._voicing_catalog.items if self._voicing_catalog is not None else None
+        self._store('voicing_list', self._voicing_catalog.names if self._voicing_catalog is not None else None)
+        if self._voicing_id is not None: self._store('voicing', self._voicingid_to_name(self._voicing_id, self._voicing_catalog))
 
-    # Parse raw room list, update the name list
+    # Parse raw room list, update the name list - same than above
     def _room_list_update_from_raw(self, raw_list):
-        try:
-            self._room_list_json = json.loads(raw_list)
-            self.room_list = self._name_list_from_json(self._room_list_json)
-        except:
-            self._room_list_json = None
-            self.room_list = None
-
-    # Transform a raw voicingId (used by both Voicing and Room) into Name
-    def _voicingid_to_name(self, voicingid, json_list):
-        if json_list == None:
-            _LOGGER.error("Cannot parse " + voicingid + " as JSON list is empty.")
-            return None
-        try:
-            for item in json_list:
-                if voicingid == item['voicingId']:
-                    return item['name']
-        except:
+        self._room_catalog = interned(raw_list, parse_catalog)
+        self._room_list_json = self._room_catalog.items if self._room_catalog is not None else None
+        self._store('room_list', self._room_catalog.names if self._room_catalog is not None else None)
+        if self._room_id is not None: self._store('room', self._voicingid_to_name(self._room_id, self._room_catalog))
+
+    # Transform a raw voicingId (used by both Voicing and Room) into Name, from the Catalog of the list
+    def _voicingid_to_name(self, voicingid, catalog):
+        if catalog is None:
+            _LOGGER.debug("Cannot name " + voicingid + " before its JSON list is received.")
             return None
+        return catalog.name(voicingid)
 
     # Send Volume command
     def volume_set(self, volume):
@@ -717,38 +1418,22 @@ class LibratoneZipp:
             return False
         try:
             # if volume is a string
-            if isinstance(volume, str): self.set_control_command(_COMMAND_TABLE['Volume']['_set'], volume)
-            else: self.set_control_command(_COMMAND_TABLE['Volume']['_set'], str(volume))
-            return True
+            if isinstance(volume, str): return self.set_control_command(_COMMAND_TABLE['Volume']['_set'], volume)
+            else: return self.set_control_command(_COMMAND_TABLE['Volume']['_set'], str(volume))
         except:
             _LOGGER.warning("Error: volume command not sent.")
             return False
 
-    # Parse Player data: populate all play_* variables
+    # Parse Player data (bytes or str): populate all play_* variables, None if it is not a JSON object
+    # Parsed once per distinct payload, like the voicing list: _player_json must not be modified
     def _player_parse(self, player_data):
-
-        # Initialize to none
-        self._player_json = None
-        self.isFromChannel = None
-        self.play_identity = None
-        self.play_preset_available = None
-        self.play_subtitle = None
-        self.play_title = None
-        self.play_token = None
-        self.play_type = None
-
-        try:
-            self._player_json = json.loads(player_data)
-        except:
-            pass
-
-        self.isFromChannel = self._player_json.get('isFromChannel', '')
-        self.play_identity = self._player_json.get('play_identity', '')
-        self.play_preset_available = self._player_json.get('play_preset_available', '')
-        self.play_subtitle = self._player_json.get('play_subtitle', '')
-        self.play_title = self._player_json.get('play_title', '')
-        self.play_token = self._player_json.get('play_token', '')
-        self.play_type = self._player_json.get('play_type', '')
+        player = interned(player_data, _parse_player)
+        if player is None:
+            self._player_json = None
+            for field in _PLAYER_FIELDS: self._store(field, None)
+            return
+        self._player_json, values = player
+        for field, value in zip(_PLAYER_FIELDS, values): self._store(field, value)
 
     # Parse Timer, return *DEFINED* timer in second, not the actual one which is running!
     def _timer_parse(self, timer_data):
@@ -778,4 +1463,18 @@ class LibratoneZipp:
             return False
         return self.set_control_command(_COMMAND_TABLE['Group']['_leave'], f"LINK {lid}")
 
-
+def connect_many(hosts, hub=None, rate=_BOOTSTRAP_RATE, **kwargs):
+    """
+    Create a LibratoneZipp per host on `hub` (default: the shared SocketHub) and return them, without waiting.
+    Their first requests are sent from the hub timer, `rate` devices per second, instead of one keepalive each:
+    wait for `zipp.ready` (a threading.Event) to know when each one answered. Other kwargs go to LibratoneZipp.
+    """
+    if hub is None: hub = _get_hub()
+    zipps = [LibratoneZipp(host, hub=hub, **kwargs) for host in hosts]
+    _bootstrap_paced(zipps, hub.timer, rate)
+    return zipps
+
+# Call bootstrap() of `zipps` from `timer` (TimerThread or asyncio loop), `rate` devices per second
+def _bootstrap_paced(zipps, timer, rate):
+    for i, zipp in enumerate(zipps):
+        timer.call_later(i / rate, zipp.bootstrap)
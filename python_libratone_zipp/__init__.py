@@ -1,3 +1,5 @@
-from .LibratoneZipp import LibratoneZipp
+from .LibratoneZipp import LibratoneZipp, connect_many
+from .AsyncLibratoneZipp import AsyncLibratoneZipp, async_connect_many, async_get_hub
+from .async_hub import AsyncSocketHub
 
 __version__ = '3.0.0'
\ No newline at end of file
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import socket
+import time
+from .LibratoneMessage import get_template
+from .metrics import Metrics
+from .reachability import Reachability
+from .scheduler import AsyncPollScheduler
+from .subscriptions import AsyncChangeNotifier
+from .socket_hub import (
+    _UDP_CONTROL_PORT,
+    _UDP_RESULT_PORT,
+    _UDP_NOTIFICATION_RECV,
+    _UDP_NOTIFICATION_ACK,
+)
+
+_LOGGER = logging.getLogger("LibratoneZipp")
+
+class _HubProtocol(asyncio.DatagramProtocol):
+    """Forward every datagram received on one port to the owning AsyncSocketHub."""
+    def __init__(self, hub, rx_port, do_ack):
+        self._hub = hub
+        self._rx_port = rx_port
+        self._do_ack = do_ack
+
+    def datagram_received(self, data, addr):
+        self._hub._on_datagram(data, addr[0], self._rx_port, self._do_ack)
+
+    def error_received(self, exc):
+        # ICMP errors (e.g. port unreachable on a sleeping speaker) must not close the endpoint
+        pass
+
+class AsyncSocketHub:
+    """
+    asyncio version of SocketHub: owns ONE notification endpoint (3333),
+    ONE result endpoint (7778) and ONE sender endpoint, all driven by the event loop.
+    No thread is started; received packets are demuxed by source IP and handed to
+    the registered device's process_zipp_message from the loop itself.
+    Its `scheduler` runs the keepalive of every device from one task,
+    and its `reachability` tells which speakers are up.
+    Its `notifier` delivers value changes of devices to subscribers, see subscribe().
+    Its `metrics` counts packets per device and command, see Metrics.snapshot() and Metrics.prometheus().
+    Packets received and commands sent are written to `recorder` (a CaptureRecorder) if set.
+
+    Usage:
+        hub = AsyncSocketHub()
+        await hub.start()
+    or:
+        async with AsyncSocketHub() as hub:     | Started, and stopped on exit
+    """
+    def __init__(self, recorder=None):
+        self._devices = {}   # ip -> device (must implement process_zipp_message(packet, port))
+        self.recorder = recorder
+        self._loop = None
+        self._notif_transport = None
+        self._result_transport = None
+        self._send_transport = None
+        self._ack = get_template(0).packet()
+        self.reachability = Reachability()
+        self.scheduler = AsyncPollScheduler()
+        self.notifier = AsyncChangeNotifier()
+        self.metrics = Metrics()
+        self.metrics.register_gauge("zipp_outbox_depth", "Commands waiting for the rate limit of the speaker", self._outbox_depths)
+
+    # --- Public API ---------------------------------------------------------
+
+    @property
+    def loop(self):
+        return self._loop
+
+    # Commands held by the rate limit of devices are sent from the loop, see Outbox
+    @property
+    def timer(self):
+        return self._loop
+
+    async def start(self):
+        """Bind the notification, result and sender endpoints on the running loop."""
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._notif_transport, _ = await self._loop.create_datagram_endpoint(
+            lambda: _HubProtocol(self, _UDP_NOTIFICATION_RECV, True),
+            local_addr=("0.0.0.0", _UDP_NOTIFICATION_RECV), family=socket.AF_INET,
+        )
+        self._result_transport, _ = await self._loop.create_datagram_endpoint(
+            lambda: _HubProtocol(self, _UDP_RESULT_PORT, False),
+            local_addr=("0.0.0.0", _UDP_RESULT_PORT), family=socket.AF_INET,
+        )
+        # Unbound sender
+        self._send_transport, _ = await self._loop.create_datagram_endpoint(
+            asyncio.DatagramProtocol,
+            local_addr=("0.0.0.0", 0), family=socket.AF_INET,
+        )
+        self.scheduler.start()
+        self.notifier.start()
+
+    def register(self, device):
+        """Call with a device that has `host` (IP string) and `process_zipp_message(bytes, port)`."""
+        self._devices[device.host] = device
+        interval = getattr(device, "keepalive_interval", None)
+        if interval is not None: self.reachability.set_interval(device.host, interval)
+
+    def unregister(self, device):
+        self._devices.pop(device.host, None)
+
+    def subscribe(self, callback, fields=None):
+        """Call callback(device, {field: (old, new)}) when values of any device change; callback may be a coroutine function.
+        Return a function removing the subscription."""
+        return self.notifier.subscribe(callback, fields)
+
+    def send_control(self, host: str, packet: bytes):
+        """Queue a pre-built packet to the speaker's control port (7777). Never blocks."""
+        if self._send_transport is None:
+            raise RuntimeError("AsyncSocketHub is not started")
+        if self.recorder is not None:
+            self.recorder.sent(_UDP_CONTROL_PORT, host, packet)
+        self._send_transport.sendto(packet, (host, _UDP_CONTROL_PORT))
+
+    def send_template(self, host: str, template, payload: bytes = b'', crc: int = None):
+        """Queue a packet from its PacketTemplate to the speaker's control port (7777).
+        asyncio transports have no sendmsg: header and payload are joined once here."""
+        self.send_control(host, template.packet(payload, crc))
+
+    def send_packets(self, packets):
+        """Queue pre-built packets [(host, packet)] to the control port (7777) back-to-back, e.g. for a group.
+        Return the time in second between the first and the last send."""
+        if self._send_transport is None:
+            raise RuntimeError("AsyncSocketHub is not started")
+        sendto = self._send_transport.sendto
+        start = time.perf_counter()
+        for host, packet in packets:
+            sendto(packet, (host, _UDP_CONTROL_PORT))
+        skew = time.perf_counter() - start
+        if self.recorder is not None:
+            for host, packet in packets:
+                self.recorder.sent(_UDP_CONTROL_PORT, host, packet)
+        return skew
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.stop()
+
+    def stop(self):
+        """Stop the scheduler, cancel running refreshes and close all endpoints. Never blocks."""
+        self.scheduler.stop()
+        self.notifier.stop()
+        for t in (self._notif_transport, self._result_transport, self._send_transport):
+            if t is not None:
+                t.close()
+        self._notif_transport = self._result_transport = self._send_transport = None
+        self._loop = None
+
+    # --- Internals ----------------------------------------------------------
+
+    def _outbox_depths(self):
+        return {d.host: d.outbox.depth() for d in list(self._devices.values()) if getattr(d, "outbox", None) is not None}
+
+    def _on_datagram(self, data, src_ip, rx_port, do_ack):
+        if self.recorder is not None:
+            self.recorder.received(rx_port, src_ip, data)
+        dev = self._devices.get(src_ip)
+        if dev:
+            self.reachability.seen(src_ip)
+            # ACK first, like SocketHub: the speaker does not wait for the packet to be processed
+            if do_ack and self._send_transport is not None:
+                self._send_transport.sendto(self._ack, (src_ip, _UDP_NOTIFICATION_ACK))
+                self.metrics.inc("acks", src_ip)
+            # A failing handler must not break the loop callback, like on the worker pool of SocketHub
+            try:
+                dev.process_zipp_message(data, rx_port)
+            except Exception:
+                _LOGGER.exception("Processing failed for %s", src_ip)
@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks for python_libratone_zipp, no speaker needed. Results are printed as JSON, to be compared between releases.
+
+    codec       LibratoneMessage encode/decode against PacketTemplate/decode_packet, in ops/s
+    dispatch    process_zipp_message cost per command, in ns, split into decode, handler lookup and call, and bookkeeping
+                (metrics, reply correlation, poll stats, snapshot); the lookup is compared with the former if/elif chain
+    hub         SocketHub notification-to-state latency (p50/p99) for 1 to 1000 emulated speakers
+    fanout      Time for get_all() on every speaker of an emulated fleet to be answered
+    group       Send skew of one command to a group of speakers: one volume_set() per speaker against ZippGroup
+    reliable    volume_set() time-to-applied (p50/p99) on lossy emulated speakers, with and without reliable delivery
+    connect     Time for connect_many() to return, and for every speaker of an emulated fleet to be ready
+    shutdown    Time for exit() of every speaker of an emulated fleet with requests in flight, then for SocketHub.stop()
+
+Usage:
+    python -m python_libratone_zipp.bench                       | Everything, needs 3333/7778 free for the hub
+    python -m python_libratone_zipp.bench codec dispatch        | No network
+    python -m python_libratone_zipp.bench --devices 1,10,100 --fleet 100 --output bench.json
+    python -m python_libratone_zipp.bench reliable --loss 0.1
+    python -m python_libratone_zipp.bench hub --shards 4           | Hub receiving with 4 sockets per port, load per shard in "shards"
+"""
+
+import argparse
+import json
+import math
+import platform
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import __version__
+from .LibratoneMessage import LibratoneMessage, decode_packet, encode_data, get_template
+from .LibratoneZipp import LibratoneZipp, connect_many, _COMMAND_TABLE, _POLLED_COMMANDS, _QUERY_REPLY_COMMAND, _UDP_RESULT_PORT
+from .null_hub import NullHub
+
+_DEVICE_COUNTS = (1, 10, 100, 1000)     # Emulated speakers of the hub latency benchmark
+_FLEET_SIZE = 1000                      # Emulated speakers of the get_all() fan-out benchmark
+_LATENCY_SAMPLES = 1000                 # Min notifications per device count, one per speaker per round
+_BENCHMARKS = ("codec", "dispatch", "hub", "fanout", "group", "reliable", "connect", "shutdown")
+_ROUND_TIMEOUT = 2                      # Time in second after which packets not processed are counted as lost
+_GROUP_SIZE = 8                         # Emulated speakers of the group benchmark
+_GROUP_ROUNDS = 200                     # Commands sent to the group, per mode
+_RELIABLE_DEVICES = 50                  # Emulated speakers of the reliable delivery benchmark
+_RELIABLE_SAMPLES = 500                 # Min volume_set() per mode of the reliable delivery benchmark
+_LOSS = 0.05                            # Probability for an emulated speaker to drop each packet, in the reliable delivery benchmark
+_CONNECT_SIZE = 200                     # Emulated speakers of the bring-up benchmark
+_CONNECT_TIMEOUT = 10                   # Time in second after which speakers not ready are counted as such
+_SHUTDOWN_SIZE = 200                    # Emulated speakers of the shutdown benchmark
+
+# Typical packets received from a speaker: (command, data)
+_SAMPLE_PACKETS = [
+    (_COMMAND_TABLE['Volume']['_get'], b'30'),
+    (_COMMAND_TABLE['PlayStatus']['_get'], _COMMAND_TABLE['PlayStatus']['play']),
+    (_COMMAND_TABLE['CurrPowerMode']['_get'], bytes([_COMMAND_TABLE['CurrPowerMode']['awake']])),
+    (_COMMAND_TABLE['Name']['_get'], b'Kitchen'),
+    (_COMMAND_TABLE['Version']['_get'], b'809'),
+    (_COMMAND_TABLE['SignalStrength']['_get'], b'-86,-42,5/5'),
+    (_COMMAND_TABLE['BatteryLevel']['_get2'], b'59'),
+    (_COMMAND_TABLE['ChargingStatus']['_get'], b'1'),
+    (_COMMAND_TABLE['MuteStatus']['_get'], b'UNMUTE'),
+    (_COMMAND_TABLE['Player']['_get'], b'{"isFromChannel":false,"play_identity":"1","play_subtitle":"Radio","play_title":"Song","play_type":"channel","token":""}'),
+    (_COMMAND_TABLE['Voicing']['_getAll'], b'[{"description":"Basic neutral setting","name":"Neutral","voicingId":"V100"},{"description":"Bass boost","name":"Easy listening","voicingId":"V101"},{"description":"Soft","name":"Soft","voicingId":"V102"},{"description":"Rock","name":"Rock","voicingId":"V103"}]'),
+    (_COMMAND_TABLE['Voicing']['_get'], b'V103'),
+    (_COMMAND_TABLE['Group']['_notif'], b'MASTER,LINK 1234'),
+    (1285, b'0'),   # Unknown command: fetchPrivateMode
+]
+
+def _sample_packets():
+    return [bytes(LibratoneMessage(command=c, data=d.decode('latin-1')).get_packet()) for c, d in _SAMPLE_PACKETS]
+
+# Value at `fraction` of sorted `values`, by nearest rank
+def _percentile(values, fraction):
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))]
+
+def _latency_summary(latencies):
+    latencies = sorted(latencies)
+    return {
+        "p50_us": round(_percentile(latencies, 0.5) * 1e6, 1) if latencies else None,
+        "p99_us": round(_percentile(latencies, 0.99) * 1e6, 1) if latencies else None,
+        "max_us": round(latencies[-1] * 1e6, 1) if latencies else None,
+    }
+
+# --- Codec and dispatch ---------------------------------------------------------
+
+# Time per call of process_zipp_message, for each sample command
+# Each packet has its own crc, like the answers to successive requests
+def bench_dispatch(iterations=20000):
+    results = {}
+    with NullHub() as hub:
+        zipp = LibratoneZipp('127.0.0.1', hub=hub)
+        for command, data in _SAMPLE_PACKETS:
+            template = get_template(command)
+            packets = [template.packet(data, i % 65535 + 1) for i in range(iterations)]
+            start = time.perf_counter()
+            for packet in packets:
+                zipp.process_zipp_message(packet, _UDP_RESULT_PORT)
+            results[command] = (time.perf_counter() - start) / iterations * 1e9
+    return results
+
+# Time per packet decoding, for each sample command, with `decoder(packet)`
+def bench_decode(decoder=decode_packet, iterations=20000):
+    results = {}
+    for (command, _), packet in zip(_SAMPLE_PACKETS, _sample_packets()):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            decoder(packet)
+        results[command] = (time.perf_counter() - start) / iterations * 1e9
+    return results
+
+# Time per outbound packet built by `encoder(command, data)`, over get_all() commands
+def bench_encode(encoder, iterations=20000):
+    commands = [(c, '30' if c == _COMMAND_TABLE['Volume']['_get'] else None) for c, _ in _SAMPLE_PACKETS]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for command, data in commands:
+            encoder(command, data)
+    return (time.perf_counter() - start) / iterations / len(commands) * 1e9
+
+def run_codec():
+    encode_legacy = bench_encode(lambda command, data: LibratoneMessage(command=command, data=data, commandType=1).get_packet())
+    encode_template = bench_encode(lambda command, data: get_template(command, 1).packet(encode_data(data)))
+    decode_legacy = bench_decode(lambda packet: LibratoneMessage(packet=packet))
+    decode = bench_decode()
+    mean = lambda results: sum(results.values()) / len(results)
+    return {
+        "encode_ops_per_s": {
+            "LibratoneMessage.get_packet": round(1e9 / encode_legacy),
+            "PacketTemplate.packet": round(1e9 / encode_template),
+        },
+        "decode_ops_per_s": {
+            "LibratoneMessage": round(1e9 / mean(decode_legacy)),
+            "decode_packet": round(1e9 / mean(decode)),
+        },
+    }
+
+# Handler lookup and call through the command table of the device, as in process_zipp_message
+def _table_dispatch(zipp, command, data):
+    handler = zipp._dispatch.get(command)
+    if handler is not None: handler(zipp, data)
+
+# The if/elif chain of process_zipp_message before the command table, calling the same handlers: reference of _table_dispatch
+def _elif_dispatch(zipp, command, data):
+    if data == "": pass
+    elif command == _COMMAND_TABLE['PlayStatus']['_get']: zipp._process_playstatus(data)
+    elif command == _COMMAND_TABLE['CurrPowerMode']['_get']: zipp._process_currpowermode(data)
+    elif command == _COMMAND_TABLE['Channel']['_get']: zipp._process_channel(data)
+    elif command == _COMMAND_TABLE['Voicing']['_get'] or command == _COMMAND_TABLE['Voicing']['_set']: zipp._process_voicing(data)
+    elif command == _COMMAND_TABLE['Room']['_get'] or command == _COMMAND_TABLE['Room']['_set']: zipp._process_room(data)
+    elif command == _COMMAND_TABLE['Voicing']['_getAll']: zipp._process_voicing_list(data)
+    elif command == _COMMAND_TABLE['Room']['_getAll']: zipp._process_room_list(data)
+    elif command == _COMMAND_TABLE['Player']['_get']: zipp._process_player(data)
+    elif command == _COMMAND_TABLE['Timer']['_get']: zipp._process_timer(data)
+    elif command == _COMMAND_TABLE['Name']['_get']: zipp._store('name', data.decode())
+    elif command == _COMMAND_TABLE['Version']['_get']: zipp._store('version', data.decode())
+    elif command == _COMMAND_TABLE['Volume']['_get']: zipp._store('volume', data.decode())
+    elif command == _COMMAND_TABLE['ChargingStatus']['_get']: zipp._store('chargingstatus', data.decode())
+    elif command == _COMMAND_TABLE['SignalStrength']['_get']: zipp._store('signalstrenght', data.decode())
+    elif command == _COMMAND_TABLE['SerialNumber']['_get']: zipp._store('serialnumber', data.decode())
+    elif command == _COMMAND_TABLE['MuteStatus']['_get']: zipp._store('mutestatus', data.decode())
+    elif command == _COMMAND_TABLE['DeviceColor']['_get'] or command == _COMMAND_TABLE['DeviceColor']['_set']: zipp._store('devicecolor', data.decode())
+    elif command == _COMMAND_TABLE['BatteryLevel']['_get'] or command == _COMMAND_TABLE['BatteryLevel']['_get2']: zipp._store('batterylevel', data.decode())
+    elif command == _COMMAND_TABLE['Group']['_notif']: zipp._process_group(data)
+
+# Time per handler lookup and call with `dispatch(zipp, command, data)`, for each sample command, without decoding nor bookkeeping
+def bench_handlers(dispatch, iterations=20000):
+    results = {}
+    with NullHub() as hub:
+        zipp = LibratoneZipp('127.0.0.1', hub=hub)
+        for command, data in _SAMPLE_PACKETS:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                dispatch(zipp, command, data)
+            results[command] = (time.perf_counter() - start) / iterations * 1e9
+    return results
+
+def run_dispatch():
+    decode = bench_decode()
+    table = bench_handlers(_table_dispatch)
+    chain = bench_handlers(_elif_dispatch)
+    dispatch = bench_dispatch()
+    return {
+        str(command): {
+            "process_zipp_message_ns": round(ns),
+            "decode_ns": round(decode[command]),
+            "handler_table_ns": round(table[command]),
+            "handler_elif_ns": round(chain[command]),
+            "bookkeeping_ns": round(ns - decode[command] - table[command]),
+        }
+        for command, ns in dispatch.items()
+    }
+
+# --- Hub, against emulated speakers -----------------------------------------------
+
+class _Arrivals:
+    """Time at which each device processed its last packet, and wait for `expected` packets."""
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.times = {}
+        self.count = 0
+        self.expected = 0
+
+    def reset(self, expected):
+        with self._cond:
+            self.times = {}
+            self.count = 0
+            self.expected = expected
+
+    def arrived(self, device):
+        now = time.perf_counter()
+        with self._cond:
+            self.times[device] = now
+            self.count += 1
+            if self.count >= self.expected:
+                self._cond.notify()
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.count < self.expected:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+class _BenchZipp(LibratoneZipp):
+    """LibratoneZipp telling `arrivals` when a packet was processed, i.e. when its value is in the device state."""
+    def __init__(self, host, hub, arrivals):
+        self._arrivals = arrivals
+        super().__init__(host, hub=hub)
+        hub.scheduler.remove(self)  # No keepalive traffic during measures
+
+    def process_zipp_message(self, packet, receive_port):
+        super().process_zipp_message(packet, receive_port)
+        self._arrivals.arrived(self)
+
+class _Fleet:
+    """SocketHub with one _BenchZipp per speaker of a ZippEmulator."""
+    def __init__(self, size, shards=1):
+        from .emulator import ZippEmulator
+        from .socket_hub import SocketHub
+        self.emulator = ZippEmulator(count=size)
+        self.hub = SocketHub(shards=shards)
+        self.arrivals = _Arrivals()
+        self.zipps = []
+        self._senders = []
+
+    def grow(self, size):
+        while len(self.zipps) < size:
+            speaker = self.emulator.speakers[len(self.zipps)]
+            self.zipps.append(_BenchZipp(speaker.host, self.hub, self.arrivals))
+            # Notifications are sent by the benchmark itself from the speaker address, to time them exactly
+            sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sender.bind((speaker.host, 0))
+            self._senders.append(sender)
+
+    def stop(self):
+        for sender in self._senders:
+            sender.close()
+        for zipp in self.zipps:
+            self.hub.unregister(zipp)
+        self.hub.stop()
+        self.emulator.stop()
+
+# Notification sent to every device at once, `rounds` times: latency from sendto() to the value being processed
+def bench_hub_latency(fleet, count, samples=_LATENCY_SAMPLES):
+    from .socket_hub import _UDP_NOTIFICATION_RECV
+    fleet.grow(count)
+    zipps, senders = fleet.zipps[:count], fleet._senders[:count]
+    template = get_template(_COMMAND_TABLE['Volume']['_get'])
+    address = (fleet.emulator.hub_host, _UDP_NOTIFICATION_RECV)
+    rounds = max(3, math.ceil(samples / count))
+    latencies, lost = [], 0
+    start = time.perf_counter()
+    for i in range(rounds):
+        packet = template.packet(str(i % 101).encode())
+        fleet.arrivals.reset(count)
+        sent = []
+        for sender in senders:
+            sent.append(time.perf_counter())
+            sender.sendto(packet, address)
+        fleet.arrivals.wait(_ROUND_TIMEOUT)
+        times = fleet.arrivals.times
+        for zipp, t0 in zip(zipps, sent):
+            if zipp in times: latencies.append(times[zipp] - t0)
+            else: lost += 1
+    elapsed = time.perf_counter() - start
+    return dict(_latency_summary(latencies), devices=count, samples=len(latencies), lost=lost,
+                notifications_per_s=round(len(latencies) / elapsed))
+
+# get_all() on every device at once: time until every reply is processed
+def bench_fanout(fleet, count):
+    fleet.grow(count)
+    zipps = fleet.zipps[:count]
+    replies = len(_POLLED_COMMANDS) + len(_QUERY_REPLY_COMMAND)
+    fleet.arrivals.reset(count * replies)
+    start = time.perf_counter()
+    for zipp in zipps:
+        zipp.get_all()
+    sent = time.perf_counter()
+    complete = fleet.arrivals.wait(_ROUND_TIMEOUT * 5)
+    end = max(fleet.arrivals.times.values(), default=sent)
+    return {
+        "devices": count,
+        "requests": count * len(_POLLED_COMMANDS),
+        "replies": fleet.arrivals.count,
+        "lost": max(count * replies - fleet.arrivals.count, 0),
+        "send_ms": round((sent - start) * 1e3, 1),
+        "total_ms": round((end - start) * 1e3, 1),
+        "complete": complete,
+    }
+
+# Time between the first and the last volume packet sent to `count` devices: volume_set() on each of them, then ZippGroup
+def bench_group(fleet, count, rounds=_GROUP_ROUNDS):
+    from .group import ZippGroup
+    fleet.grow(count)
+    zipps = fleet.zipps[:count]
+    group = ZippGroup(zipps)
+    rates = [zipp.outbox.rate for zipp in zipps]
+    for zipp in zipps:
+        zipp.outbox.rate = 1e6  # Measure sends, not the rate limit
+    try:
+        sequential, grouped = [], []
+        for i in range(rounds):
+            start = time.perf_counter()
+            for zipp in zipps:
+                zipp.volume_set(i % 101)
+            sequential.append(time.perf_counter() - start)
+            grouped.append(group.volume_set(i % 101).skew)
+    finally:
+        for zipp, rate in zip(zipps, rates):
+            zipp.outbox.rate = rate
+    return {"devices": count, "rounds": rounds, "volume_set": _latency_summary(sequential), "ZippGroup": _latency_summary(grouped)}
+
+# volume_set() on every device at once, speakers dropping `loss` of packets: time until the value is applied
+# Without reliable delivery, a value not applied within _ROUND_TIMEOUT is lost; with it, within _RETRANSMIT_DEADLINE
+def bench_reliable(fleet, count, reliable, loss=_LOSS, samples=_RELIABLE_SAMPLES):
+    fleet.grow(count)
+    zipps = fleet.zipps[:count]
+    speakers = fleet.emulator.speakers[:count]
+    for speaker in speakers:
+        speaker.loss = loss
+    rounds = max(3, math.ceil(samples / count))
+    latencies, lost = [], 0
+
+    def volume_set(zipp, volume):
+        start = time.perf_counter()
+        if zipp.volume_set(volume): return time.perf_counter() - start
+        return None
+
+    try:
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            for i in range(rounds):
+                volume = str((i * 7 + (50 if reliable else 0)) % 101)
+                if reliable:
+                    for elapsed in pool.map(volume_set, zipps, [volume] * count):
+                        if elapsed is None: lost += 1
+                        else: latencies.append(elapsed)
+                    continue
+                fleet.arrivals.reset(count)
+                sent = []
+                for zipp in zipps:
+                    sent.append(time.perf_counter())
+                    zipp.volume_set(volume)
+                fleet.arrivals.wait(_ROUND_TIMEOUT)
+                times = fleet.arrivals.times
+                for zipp, t0 in zip(zipps, sent):
+                    if zipp in times and zipp.volume == volume: latencies.append(times[zipp] - t0)
+                    else: lost += 1
+    finally:
+        for speaker in speakers:
+            speaker.loss = 0.0
+    return dict(_latency_summary(latencies), devices=count, reliable=reliable, loss=loss,
+                samples=len(latencies) + lost, lost=lost)
+
+# connect_many() on `count` speakers: time until it returns, and until every speaker is ready
+# The speakers replace the benchmark devices of the same hosts on the hub, so this runs last
+def bench_connect(fleet, count):
+    hosts = [speaker.host for speaker in fleet.emulator.speakers[:count]]
+    start = time.perf_counter()
+    zipps = connect_many(hosts, hub=fleet.hub)
+    returned = time.perf_counter()
+    deadline = returned + _CONNECT_TIMEOUT
+    for zipp in zipps:
+        zipp.ready.wait(max(deadline - time.perf_counter(), 0))
+    end = time.perf_counter()
+    for zipp in zipps:
+        fleet.hub.scheduler.remove(zipp)
+    return {
+        "devices": count,
+        "ready": sum(zipp.ready.is_set() for zipp in zipps),
+        "return_ms": round((returned - start) * 1e3, 1),
+        "all_ready_ms": round((end - start) * 1e3, 1),
+    }
+
+# exit() of `count` devices just after their get_all(), then stop() of the hub: time of each, and hub threads left running
+# The hub is stopped, so this runs after every other benchmark
+def bench_shutdown(fleet, count):
+    fleet.grow(count)
+    zipps = fleet.zipps[:count]
+    for zipp in zipps:
+        zipp.get_all()
+    start = time.perf_counter()
+    for zipp in zipps:
+        zipp.exit()
+    exited = time.perf_counter()
+    stopped = fleet.hub.stop()
+    end = time.perf_counter()
+    return {
+        "devices": count,
+        "exit_ms": round((exited - start) * 1e3, 1),
+        "hub_stop_ms": round((end - exited) * 1e3, 1),
+        "stopped": stopped,
+        "threads_left": sorted(t.name for t in threading.enumerate() if t.name.startswith(("ZippHub", "ZippPoll"))),
+    }
+
+def run_hub(device_counts=_DEVICE_COUNTS, fleet_size=None, reliable_devices=None, loss=_LOSS, group_size=None, connect_size=None,
+            shutdown_size=None, shards=1):
+    fleet = _Fleet(max(list(device_counts) + [fleet_size or 0, reliable_devices or 0, group_size or 0, connect_size or 0,
+                                              shutdown_size or 0]), shards)
+    try:
+        results = {}
+        if device_counts:
+            results["hub"] = [bench_hub_latency(fleet, count) for count in device_counts]
+        if fleet_size:
+            results["fanout"] = bench_fanout(fleet, fleet_size)
+        if group_size:
+            results["group"] = bench_group(fleet, group_size)
+        if reliable_devices:
+            results["reliable"] = []
+            for reliable in (False, True):
+                for zipp in fleet.zipps: zipp.reliable = reliable
+                results["reliable"].append(bench_reliable(fleet, reliable_devices, reliable, loss))
+        if connect_size:
+            results["connect"] = bench_connect(fleet, connect_size)
+        if shutdown_size:
+            results["shutdown"] = bench_shutdown(fleet, shutdown_size)
+        if shards > 1:
+            results["shards"] = fleet.hub.shard_stats()
+        return results
+    finally:
+        fleet.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark python_libratone_zipp, print results as JSON.")
+    parser.add_argument("benchmarks", nargs="*", help=f"Benchmarks to run among {', '.join(_BENCHMARKS)}, all by default")
+    parser.add_argument("--devices", default=",".join(map(str, _DEVICE_COUNTS)), help="Device counts of the hub benchmark")
+    parser.add_argument("--fleet", type=int, default=_FLEET_SIZE, help="Device count of the fanout benchmark")
+    parser.add_argument("--group", type=int, default=_GROUP_SIZE, help="Device count of the group benchmark")
+    parser.add_argument("--reliable-devices", type=int, default=_RELIABLE_DEVICES, help="Device count of the reliable benchmark")
+    parser.add_argument("--connect", type=int, default=_CONNECT_SIZE, help="Device count of the connect benchmark")
+    parser.add_argument("--shutdown", type=int, default=_SHUTDOWN_SIZE, help="Device count of the shutdown benchmark")
+    parser.add_argument("--shards", type=int, default=1, help="Receive sockets per port of the hub, see SocketHub(shards=)")
+    parser.add_argument("--loss", type=float, default=_LOSS, help="Packet loss of the speakers in the reliable benchmark")
+    parser.add_argument("--output", help="Also write results to this file")
+    args = parser.parse_args()
+    benchmarks = args.benchmarks or list(_BENCHMARKS)
+    unknown = set(benchmarks) - set(_BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(sorted(unknown))}")
+
+    results = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    if "codec" in benchmarks: results["codec"] = run_codec()
+    if "dispatch" in benchmarks: results["dispatch"] = run_dispatch()
+    if {"hub", "fanout", "group", "reliable", "connect", "shutdown"} & set(benchmarks):
+        device_counts = [int(c) for c in args.devices.split(",")] if "hub" in benchmarks else []
+        results.update(run_hub(device_counts, args.fleet if "fanout" in benchmarks else None,
+                               args.reliable_devices if "reliable" in benchmarks else None, args.loss,
+                               args.group if "group" in benchmarks else None,
+                               args.connect if "connect" in benchmarks else None,
+                               args.shutdown if "shutdown" in benchmarks else None, args.shards))
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Record packets exchanged by a hub into a compact binary file, and replay them into devices.
+
+Usage:
+    recorder = CaptureRecorder("zipp.cap")                 | Rotated to zipp.cap.1, zipp.cap.2... every 16 MiB
+    hub = SocketHub(recorder=recorder)                     | Or hub.recorder = recorder at any time
+    ...
+    recorder.close()
+
+    replay(capture_files("zipp.cap"), zipps)               | As fast as possible, oldest file first
+    replay("zipp.cap", zipps, speed=1.0)                   | In real time
+
+Or from a shell:
+    python -m python_libratone_zipp.capture dump zipp.cap
+    python -m python_libratone_zipp.capture replay zipp.cap
+
+File format: _FILE_MAGIC, then one record per packet: _RECORD header (timestamp, direction, port,
+IPv4 address of the speaker, length) followed by the raw packet.
+"""
+
+import argparse
+import collections
+import json
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+
+_FILE_MAGIC = b"ZIPPCAP1"
+_RECORD = struct.Struct('<dBH4sH')      # time.time(), direction, UDP port, speaker IPv4, packet length
+_MAX_BYTES = 16 * 1024 * 1024           # Size in bytes after which the capture file is rotated
+_BACKUP_COUNT = 3                       # Rotated files kept: path.1 (newest) ... path.N (oldest)
+
+DIRECTION_RX = 0    # Received from the speaker on `port` (3333 or 7778)
+DIRECTION_TX = 1    # Sent to the speaker on `port` (7777)
+
+CapturedPacket = collections.namedtuple("CapturedPacket", ["timestamp", "direction", "port", "host", "packet"])
+
+class CaptureRecorder:
+    """
+    Append packets to `path`, rotated like logging.handlers.RotatingFileHandler when it exceeds `max_bytes`.
+    Hubs call received() and sent(). record() is thread-safe and only packs a 17 bytes header and writes to a buffered file.
+    """
+    def __init__(self, path, max_bytes=_MAX_BYTES, backup_count=_BACKUP_COUNT):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self._open()
+
+    # --- Public API ---------------------------------------------------------
+
+    def record(self, direction, port, host, packet):
+        header = _RECORD.pack(time.time(), direction, port, socket.inet_aton(host), len(packet))
+        with self._lock:
+            if self._file is None:
+                return
+            if self._size + len(header) + len(packet) > self.max_bytes and self._size > len(_FILE_MAGIC):
+                self._rotate()
+            self._file.write(header)
+            self._file.write(packet)
+            self._size += len(header) + len(packet)
+
+    def received(self, port, host, packet):
+        self.record(DIRECTION_RX, port, host, packet)
+
+    def sent(self, port, host, packet):
+        self.record(DIRECTION_TX, port, host, packet)
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # --- Internals ----------------------------------------------------------
+
+    def _open(self):
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        if self._size == 0:
+            self._file.write(_FILE_MAGIC)
+            self._size = len(_FILE_MAGIC)
+
+    def _rotate(self):
+        self._file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{i}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+def capture_files(path):
+    """Return `path` and its rotated files which exist, oldest first."""
+    files = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        files.insert(0, f"{path}.{i}")
+        i += 1
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+class CaptureReader:
+    """
+    Iterate over the CapturedPacket of a capture file, mapped in memory.
+    `packet` is a memoryview of the mapping, without copy: copy it with bytes() to keep it after close().
+    A record truncated by a crash ends the iteration.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._view = memoryview(self._map) if self._map is not None else memoryview(b"")
+        if len(self._view) and bytes(self._view[:len(_FILE_MAGIC)]) != _FILE_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a capture file")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        view = self._view
+        offset = len(_FILE_MAGIC)
+        end = len(view)
+        while offset + _RECORD.size <= end:
+            timestamp, direction, port, address, length = _RECORD.unpack_from(view, offset)
+            offset += _RECORD.size
+            if offset + length > end:
+                return
+            yield CapturedPacket(timestamp, direction, port, socket.inet_ntoa(address), view[offset:offset + length])
+            offset += length
+
+    def close(self):
+        self._view.release()
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # A packet is still referenced: the mapping is closed when the last one is gone
+                pass
+            self._map = None
+
+def replay(paths, devices, speed=None, directions=(DIRECTION_RX,)):
+    """
+    Call device.process_zipp_message(packet, port) for each received packet of the capture files `paths`
+    (one path or a list, oldest first), on the device of `devices` (iterable of devices or {host: device})
+    whose host sent it; packets of other hosts are skipped.
+    `speed` None replays as fast as possible, 1.0 in real time, 2.0 twice as fast...
+    Return (packets replayed, elapsed seconds).
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    if not isinstance(devices, dict):
+        devices = {device.host: device for device in devices}
+    count = 0
+    start = time.perf_counter()
+    first_timestamp = None
+    for path in paths:
+        with CaptureReader(path) as reader:
+            for captured in reader:
+                if captured.direction not in directions:
+                    continue
+                device = devices.get(captured.host)
+                if device is not None:
+                    if speed is not None:
+                        if first_timestamp is None:
+                            first_timestamp = captured.timestamp
+                        delay = (captured.timestamp - first_timestamp) / speed - (time.perf_counter() - start)
+                        if delay > 0:
+                            time.sleep(delay)
+                    device.process_zipp_message(captured.packet, captured.port)
+                    count += 1
+    return count, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Dump a capture file, or replay it to measure parsing speed.")
+    parser.add_argument("action", choices=["dump", "replay"])
+    parser.add_argument("path", help="Capture file; rotated files are read too, oldest first")
+    parser.add_argument("--speed", type=float, help="Replay speed, 1.0 for real time; as fast as possible by default")
+    args = parser.parse_args()
+    paths = capture_files(args.path)
+
+    if args.action == "dump":
+        for path in paths:
+            with CaptureReader(path) as reader:
+                for captured in reader:
+                    direction = "<" if captured.direction == DIRECTION_RX else ">"
+                    when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(captured.timestamp))
+                    print(f"{when}.{int(captured.timestamp % 1 * 1e6):06d} {direction} {captured.host}:{captured.port} {captured.packet.hex()}")
+        return
+
+    # One LibratoneZipp per captured speaker, on a hub which sends nothing
+    from .LibratoneZipp import LibratoneZipp
+    from .null_hub import NullHub
+    hub = NullHub()
+    hosts = set()
+    for path in paths:
+        with CaptureReader(path) as reader:
+            for captured in reader:
+                hosts.add(captured.host)
+    devices = {host: LibratoneZipp(host, hub=hub) for host in hosts}
+    count, elapsed = replay(paths, devices, speed=args.speed)
+    print(json.dumps({
+        "files": paths,
+        "devices": len(devices),
+        "packets": count,
+        "elapsed_s": round(elapsed, 3),
+        "packets_per_s": round(count / elapsed) if elapsed else None,
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
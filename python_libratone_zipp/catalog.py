@@ -0,0 +1,58 @@
+import json
+import threading
+
+_INTERNED_MAX = 256         # Distinct payloads kept parsed, shared by every speaker
+
+_interned = {}              # (parse, raw payload) -> parsed value, least recently used first
+_interned_lock = threading.Lock()
+_MISSING = object()
+
+def interned(raw, parse):
+    """
+    Return parse(raw), or None if it fails, computed once per distinct raw payload and shared by every caller.
+    Speakers of one model send the same lists: a fleet holds one parsed copy, and a payload received again
+    costs a dict lookup instead of json.loads(). The value returned is shared: never modify it.
+    """
+    if isinstance(raw, str): raw = raw.encode()
+    key = (parse, raw)
+    with _interned_lock:
+        value = _interned.pop(key, _MISSING)
+        if value is not _MISSING:
+            _interned[key] = value
+            return value
+    try:
+        value = parse(raw)
+    except (ValueError, TypeError, KeyError, AttributeError):
+        value = None
+    with _interned_lock:
+        _interned[key] = value
+        if len(_interned) > _INTERNED_MAX:
+            del _interned[next(iter(_interned))]
+    return value
+
+def parse_json(raw):
+    return json.loads(raw)
+
+def parse_catalog(raw):
+    return Catalog(json.loads(raw))
+
+class Catalog:
+    """
+    Voicing or room list of a speaker, like [{"description": ..., "name": "Neutral", "voicingId": "V100"}, ...],
+    indexed by voicingId and by name. Shared between speakers, see interned().
+    """
+    __slots__ = ('items', 'names', '_by_id', '_by_name')
+
+    def __init__(self, items):
+        self.items = items
+        self.names = [item['name'] for item in items]
+        self._by_id = {item['voicingId']: item['name'] for item in reversed(items) if 'voicingId' in item}
+        self._by_name = {item['name']: item['voicingId'] for item in reversed(items) if 'voicingId' in item}
+
+    def name(self, voicing_id):
+        """Name of the first item with `voicing_id`, or None."""
+        return self._by_id.get(voicing_id)
+
+    def voicing_id(self, name):
+        """voicingId of the first item named `name`, or None."""
+        return self._by_name.get(name)
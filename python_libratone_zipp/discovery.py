@@ -0,0 +1,165 @@
+"""
+Find Libratone speakers on the network with LSSDP, the SSDP variant of the LUCI protocol
+used by the Android application, instead of fixed IP.
+
+Usage:
+    speakers = discover()                               | Multicast search, answers collected for `timeout` seconds
+    speakers = discover(network="192.168.0.0/22")       | Also ask every host of the network, all at once
+    zipps = connect_discovered(speakers)                | One LibratoneZipp per speaker, registered on the hub
+
+Without speaker, a DiscoveryResponder answers searches like one:
+    responder = DiscoveryResponder("127.0.0.2", name="Kitchen", serial="1234-A1234567-12-12345", firmware="809")
+    discover(network="127.0.0.2/32", multicast=False)
+"""
+
+import collections
+import ipaddress
+import logging
+import select
+import socket
+import threading
+import time
+
+_LOGGER = logging.getLogger("LibratoneZipp")
+
+_LSSDP_PORT = 1800                      # LSSDP port of the speaker
+_LSSDP_MULTICAST = "239.255.255.250"
+_DISCOVERY_TIMEOUT = 2                  # Time in second during which answers are collected
+_DISCOVERY_BUFFER_SIZE = 2048
+
+_SEARCH = (
+    "M-SEARCH * HTTP/1.1\r\n"
+    f"HOST: {_LSSDP_MULTICAST}:{_LSSDP_PORT}\r\n"
+    "PROTOCOL: Version 1.0\r\n"
+    "\r\n"
+).encode("ascii")
+
+# Answer header names used by firmwares, first match wins
+_NAME_HEADERS = ("FRIENDLYNAME", "DEVICENAME")
+_SERIAL_HEADERS = ("SERIALNUMBER", "USN")
+_FIRMWARE_HEADERS = ("FWVERSION", "VERSION")
+
+DiscoveredSpeaker = collections.namedtuple("DiscoveredSpeaker", ["host", "name", "serial", "firmware"])
+
+# Parse an LSSDP answer into a DiscoveredSpeaker, None if it is not an answer
+def _parse_response(data, host):
+    try:
+        lines = data.decode("utf-8", errors="replace").split("\r\n")
+    except Exception:
+        return None
+    if not lines or not lines[0].upper().startswith(("HTTP/1.1 200", "NOTIFY")):
+        return None
+    headers = {}
+    for line in lines[1:]:
+        key, sep, value = line.partition(":")
+        if sep:
+            headers[key.strip().upper()] = value.strip()
+    def first(names):
+        return next((headers[n] for n in names if n in headers), None)
+    return DiscoveredSpeaker(host, first(_NAME_HEADERS), first(_SERIAL_HEADERS), first(_FIRMWARE_HEADERS))
+
+def discover(timeout=_DISCOVERY_TIMEOUT, network=None, multicast=True, port=_LSSDP_PORT):
+    """
+    Send LSSDP searches and return the list of DiscoveredSpeaker which answered within `timeout` seconds.
+    `network` (like "192.168.0.0/22") adds one unicast search per host, all sent at once before collecting
+    answers, for networks where multicast is filtered.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
+        sock.bind(("", 0))
+        sock.setblocking(False)
+        if multicast:
+            _send_search(sock, (_LSSDP_MULTICAST, port))
+        if network is not None:
+            for host in ipaddress.ip_network(network, strict=False).hosts():
+                _send_search(sock, (str(host), port))
+        return list(_collect(sock, timeout).values())
+    finally:
+        sock.close()
+
+def _send_search(sock, address):
+    try:
+        sock.sendto(_SEARCH, address)
+    except BlockingIOError:
+        # Send buffer full: wait for room, this is what bounds the rate of a large sweep
+        select.select([], [sock], [], 0.1)
+        try:
+            sock.sendto(_SEARCH, address)
+        except OSError as e:
+            _LOGGER.debug("Discovery search to %s not sent: %s", address, e)
+    except OSError as e:
+        _LOGGER.debug("Discovery search to %s not sent: %s", address, e)
+
+def _collect(sock, timeout):
+    speakers = {}
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return speakers
+        readable, _, _ = select.select([sock], [], [], remaining)
+        if not readable:
+            continue
+        while True:
+            try:
+                data, (host, _) = sock.recvfrom(_DISCOVERY_BUFFER_SIZE)
+            except (BlockingIOError, ConnectionError):
+                break
+            speaker = _parse_response(data, host)
+            if speaker is not None:
+                speakers[host] = speaker
+
+def connect_discovered(speakers, hub=None, **kwargs):
+    """Create one LibratoneZipp per DiscoveredSpeaker, registered on `hub` (default hub if None).
+    Values given by discovery are set right away. Extra arguments go to LibratoneZipp."""
+    from .LibratoneZipp import LibratoneZipp
+    zipps = []
+    for speaker in speakers:
+        zipp = LibratoneZipp(speaker.host, hub=hub, **kwargs)
+        values = {"name": speaker.name, "serialnumber": speaker.serial, "version": speaker.firmware}
+        zipp._store_values({attribute: value for attribute, value in values.items() if value is not None})
+        zipps.append(zipp)
+    return zipps
+
+# LSSDP answer of a speaker to a search
+def lssdp_answer(name, serial, firmware):
+    return (
+        "HTTP/1.1 200 OK\r\n"
+        f"HOST: {_LSSDP_MULTICAST}:{_LSSDP_PORT}\r\n"
+        f"FriendlyName: {name}\r\n"
+        f"USN: {serial}\r\n"
+        f"FWVERSION: {firmware}\r\n"
+        "PORT: 7777\r\n"
+        "\r\n"
+    ).encode("utf-8")
+
+class DiscoveryResponder:
+    """Answer LSSDP searches on host:port like a speaker would - for tests without hardware."""
+    def __init__(self, host="127.0.0.1", name="Zipp", serial="0000-A0000000-00-00000", firmware="809", port=_LSSDP_PORT):
+        self.host = host
+        self._answer = lssdp_answer(name, serial, firmware)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((host, port))
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name=f"ZippDiscoveryResponder_{host}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+
+    def _loop(self):
+        while self._running:
+            try:
+                data, address = self._sock.recvfrom(_DISCOVERY_BUFFER_SIZE)
+            except OSError:
+                break
+            if data.startswith(b"M-SEARCH"):
+                try:
+                    self._sock.sendto(self._answer, address)
+                except OSError:
+                    pass
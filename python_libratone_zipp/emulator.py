@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Emulate Libratone speakers on loopback or virtual addresses, for load and latency tests without hardware.
+
+Each EmulatedSpeaker binds its own address: commands are answered on 7777 (results sent to 7778 of the sender,
+with the crc of the request), changes are pushed as notifications to 3333 of `hub_host` and ACKs are
+expected on 3334. TCP port 80 is listened too, so host_up() and Reachability see the speaker up.
+All speakers are served by ONE thread, whatever their number.
+
+Latency, jitter, loss and reordering can be set per speaker:
+    emulator = ZippEmulator(count=500, latency=0.005, loss=0.01)    | 127.0.1.1 ... 127.0.2.244
+    emulator.speakers[0].latency = 0.2                              | One slow speaker
+    zipps = [LibratoneZipp(s.host) for s in emulator.speakers]
+    emulator.stats()                                                | Requests, replies, notifications, ACKs...
+    emulator.stop()
+
+Or from a shell, until Ctrl-C:
+    python -m python_libratone_zipp.emulator 500 --latency 0.005 --loss 0.01
+"""
+
+import argparse
+import collections
+import heapq
+import ipaddress
+import itertools
+import json
+import logging
+import random
+import selectors
+import socket
+import threading
+import time
+
+from .LibratoneMessage import decode_packet, encode_data, get_template
+from .LibratoneZipp import _COMMAND_TABLE
+from .discovery import _LSSDP_PORT, lssdp_answer
+from .socket_hub import (
+    _UDP_BUFFER_SIZE,
+    _UDP_CONTROL_PORT,
+    _UDP_NOTIFICATION_ACK,
+    _UDP_NOTIFICATION_RECV,
+    _UDP_RESULT_PORT,
+)
+
+try:
+    import resource
+except ImportError:         # Not on Windows
+    resource = None
+
+_LOGGER = logging.getLogger("LibratoneZipp")
+
+_FIRST_HOST = "127.0.1.1"       # Address of the first emulated speaker - 127.0.0.1 is left to the hub
+_HTTP_PORT = 80                 # TCP port probed by host_up()
+_ACK_TIMEOUT = 1                # Time in second after which a notification without ACK is counted as missing
+_REORDER_WINDOW = 0.05          # Max extra delay in second of a reordered packet
+_NOTIFY_INTERVAL = None         # Mean time in second between two unsolicited notifications of a speaker, None for none
+
+_VOICING_LIST = [
+    {"description": "Basic neutral setting", "name": "Neutral", "voicingId": "V100"},
+    {"description": "More bass", "name": "Easy Listening", "voicingId": "V101"},
+    {"description": "Clear voices", "name": "Voice", "voicingId": "V103"},
+]
+_ROOM_LIST = [
+    {"description": "Basic neutral setting", "name": "Neutral", "voicingId": "neutral"},
+    {"description": "Against a wall", "name": "Wall", "voicingId": "wall"},
+    {"description": "In a corner", "name": "Corner", "voicingId": "corner"},
+]
+_CHANNEL_LIST = [
+    {"channel_id": i, "channel_identity": str(31375 + i), "channel_name": f"Radio {i}",
+     "channel_type": "vtuner", "isPlaying": False, "play_token": ""}
+    for i in range(1, 6)
+]
+
+_PLAYCONTROL_STATUS = {
+    _COMMAND_TABLE['PlayControl']['play']: _COMMAND_TABLE['PlayStatus']['play'],
+    _COMMAND_TABLE['PlayControl']['stop']: _COMMAND_TABLE['PlayStatus']['stop'],
+    _COMMAND_TABLE['PlayControl']['pause']: _COMMAND_TABLE['PlayStatus']['pause'],
+}
+
+class EmulatedSpeaker:
+    """
+    State of one emulated speaker and its answers to commands.
+    `latency` (+ up to `jitter`) delays every packet sent, `loss` is the probability to drop a packet
+    in either direction, `reorder` the probability to delay a packet up to _REORDER_WINDOW more.
+    """
+    def __init__(self, host, index=0, latency=0.0, jitter=0.0, loss=0.0, reorder=0.0):
+        self.host = host
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.reorder = reorder
+
+        self.name = f"Zipp {index + 1}"
+        self.serialnumber = f"1234-A{index:07d}-12-12345"
+        self.version = "809"
+        self.devicecolor = "1001"
+        self.powermode = _COMMAND_TABLE['CurrPowerMode']['awake']
+        self.playstatus = _COMMAND_TABLE['PlayStatus']['stop']
+        self.volume = 30
+        self.timer = b'\xff'
+        self.batterylevel = 59
+        self.chargingstatus = "0"
+        self.mutestatus = "UNMUTE"
+        self.signalstrength = "-86,-42,5/5"
+        self.voicing = "V100"
+        self.room = "neutral"
+        self.player = _COMMAND_TABLE['Player']['favorite']['1']
+        self.group = "UNGROUPED"
+
+        self.requests = 0
+        self.replies = 0
+        self.notifications = 0
+        self.acks = 0
+        self.acks_missing = 0
+        self.dropped = 0
+        self._ack_deadlines = collections.deque()   # One per notification waiting for its ACK
+        self._control_sock = None
+
+    # Return [(command, payload)] replies to a get, sent to the result port
+    def answer(self, command):
+        value = self._get(command)
+        if value is None:
+            return []
+        if command == _COMMAND_TABLE['BatteryLevel']['_get']:
+            # Empty answer first, the true value comes with _get2
+            return [(command, b''), (_COMMAND_TABLE['BatteryLevel']['_get2'], value)]
+        return [(command, value)]
+
+    # Apply a set; return [(command, payload)] notifications of the new values
+    def apply(self, command, data):
+        text = data.decode('ascii', errors='replace')
+        if command == _COMMAND_TABLE['Volume']['_set']:
+            self.volume = int(text)
+            return [(command, self._get(command))]
+        if command == _COMMAND_TABLE['Name']['_set']:
+            self.name = text
+            return [(command, self._get(command))]
+        if command == _COMMAND_TABLE['PlayControl']['_set']:
+            status = _PLAYCONTROL_STATUS.get(text)
+            if status is None:  # NEXT, PREV: playing goes on
+                return []
+            self.playstatus = status
+            return [(_COMMAND_TABLE['PlayStatus']['_get'], status)]
+        if command == _COMMAND_TABLE['Player']['_set']:
+            self.player = text
+            self.playstatus = _COMMAND_TABLE['PlayStatus']['play']
+            return [(_COMMAND_TABLE['Player']['_get'], data), (_COMMAND_TABLE['PlayStatus']['_get'], self.playstatus)]
+        if command == _COMMAND_TABLE['Voicing']['_set']:
+            self.voicing = text
+            return [(_COMMAND_TABLE['Voicing']['_get'], data)]
+        if command == _COMMAND_TABLE['Room']['_set']:
+            self.room = text
+            return [(_COMMAND_TABLE['Room']['_get'], data)]
+        if command == _COMMAND_TABLE['DeviceColor']['_set']:
+            self.devicecolor = text
+            return []
+        if command == _COMMAND_TABLE['Timer']['_set']:
+            return self._timer_set(text)
+        if command == _COMMAND_TABLE['Group']['_join']:
+            self.group = f"SLAVE,{text}"
+            return [(_COMMAND_TABLE['Group']['_notif'], self.group.encode())]
+        if command == _COMMAND_TABLE['Group']['_leave']:
+            self.group = "UNGROUPED"
+            return [(_COMMAND_TABLE['Group']['_notif'], self.group.encode())]
+        return []
+
+    # Return one [(command, payload)] notification of a spontaneous change, like a speaker on battery
+    def drift(self, rng):
+        choice = rng.randrange(3)
+        if choice == 0:
+            self.signalstrength = f"-{rng.randint(60, 90)},-42,{rng.randint(1, 5)}/5"
+            return [(_COMMAND_TABLE['SignalStrength']['_get'], self.signalstrength.encode())]
+        if choice == 1:
+            self.batterylevel = max(self.batterylevel - 1, 0)
+            return [(_COMMAND_TABLE['BatteryLevel']['_get2'], str(self.batterylevel).encode())]
+        self.volume = rng.randint(0, 100)
+        return [(_COMMAND_TABLE['Volume']['_get'], str(self.volume).encode())]
+
+    def _get(self, command):
+        if command == _COMMAND_TABLE['Version']['_get']: return self.version.encode()
+        if command == _COMMAND_TABLE['CurrPowerMode']['_get']: return bytes([self.powermode])
+        if command == _COMMAND_TABLE['Timer']['_get']: return self.timer
+        if command == _COMMAND_TABLE['PlayStatus']['_get']: return self.playstatus
+        if command == _COMMAND_TABLE['Volume']['_get']: return str(self.volume).encode()
+        if command == _COMMAND_TABLE['Name']['_get']: return self.name.encode()
+        if command == _COMMAND_TABLE['BatteryLevel']['_get']: return str(self.batterylevel).encode()
+        if command == _COMMAND_TABLE['Channel']['_get']: return json.dumps(_CHANNEL_LIST).encode()
+        if command == _COMMAND_TABLE['Player']['_get']: return self.player.encode()
+        if command == _COMMAND_TABLE['Voicing']['_get']: return self.voicing.encode()
+        if command == _COMMAND_TABLE['Voicing']['_getAll']: return json.dumps(_VOICING_LIST).encode()
+        if command == _COMMAND_TABLE['Room']['_get']: return self.room.encode()
+        if command == _COMMAND_TABLE['Room']['_getAll']: return json.dumps(_ROOM_LIST).encode()
+        if command == _COMMAND_TABLE['MuteStatus']['_get']: return self.mutestatus.encode()
+        if command == _COMMAND_TABLE['SignalStrength']['_get']: return self.signalstrength.encode()
+        if command == _COMMAND_TABLE['SerialNumber']['_get']: return self.serialnumber.encode()
+        if command == _COMMAND_TABLE['DeviceColor']['_get']: return self.devicecolor.encode()
+        if command == _COMMAND_TABLE['ChargingStatus']['_get']: return self.chargingstatus.encode()
+        if command == _COMMAND_TABLE['Group']['_notif']: return self.group.encode()
+        return None
+
+    # Timer data: "2" + seconds to sleep, "F0" to cancel, "00" to wake up
+    def _timer_set(self, text):
+        if text.startswith("2"):
+            seconds = int(text[1:] or 0)
+            if seconds == 0:
+                self.powermode = _COMMAND_TABLE['CurrPowerMode']['sleeping']
+                self.playstatus = _COMMAND_TABLE['PlayStatus']['stop']
+                return [(_COMMAND_TABLE['CurrPowerMode']['_get'], bytes([self.powermode]))]
+            self.timer = bytes([50, seconds % 256, seconds // 256 % 256])
+        elif text == "00":
+            self.powermode = _COMMAND_TABLE['CurrPowerMode']['awake']
+            return [(_COMMAND_TABLE['CurrPowerMode']['_get'], bytes([self.powermode]))]
+        else:
+            self.timer = b'\xff'
+        return [(_COMMAND_TABLE['Timer']['_get'], self.timer)]
+
+class ZippEmulator:
+    """
+    Serve `count` EmulatedSpeaker from `first_host` on (or one per address of `hosts`) from ONE thread.
+    Notifications are sent to `hub_host`. Extra arguments (latency, jitter, loss, reorder) are the
+    default of every speaker. With `discovery`, speakers also answer LSSDP searches.
+    """
+    def __init__(self, count=1, hosts=None, first_host=_FIRST_HOST, hub_host="127.0.0.1",
+                 notify_interval=_NOTIFY_INTERVAL, discovery=False, seed=None, **speaker_kwargs):
+        if hosts is None:
+            first = ipaddress.ip_address(first_host)
+            hosts = [str(first + i) for i in range(count)]
+        self.hub_host = hub_host
+        self.notify_interval = notify_interval
+        self.speakers = [EmulatedSpeaker(host, i, **speaker_kwargs) for i, host in enumerate(hosts)]
+        self._rng = random.Random(seed)
+        self._sel = selectors.DefaultSelector()
+        self._socks = []
+        self._timers = []           # (due, seq, callback, args)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._sel.register(self._wakeup_r, selectors.EVENT_READ, (None, None))
+
+        _raise_fd_limit(len(self.speakers) * (4 if discovery else 3) + 64)
+        for speaker in self.speakers:
+            self._bind(speaker, socket.SOCK_DGRAM, _UDP_CONTROL_PORT, self._on_command)
+            self._bind(speaker, socket.SOCK_DGRAM, _UDP_NOTIFICATION_ACK, self._on_ack)
+            self._bind(speaker, socket.SOCK_STREAM, _HTTP_PORT, self._on_http)
+            if discovery:
+                self._bind(speaker, socket.SOCK_DGRAM, _LSSDP_PORT, self._on_search)
+            if notify_interval:
+                self._call_later(self._rng.uniform(0, notify_interval), self._drift, speaker)
+
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="ZippEmulator", daemon=True)
+        self._thread.start()
+
+    # --- Public API ---------------------------------------------------------
+
+    def notify(self, speaker, command, payload):
+        """Push a notification from `speaker` to the hub, as if its value changed on the speaker."""
+        self._call_later(0, self._send_notifications, speaker, [(command, encode_data(payload))])
+
+    def stats(self):
+        """Return the counters summed over all speakers."""
+        totals = dict.fromkeys(("requests", "replies", "notifications", "acks", "acks_missing", "dropped"), 0)
+        for speaker in self.speakers:
+            for key in totals:
+                totals[key] += getattr(speaker, key)
+        return totals
+
+    def stop(self):
+        self._running = False
+        self._wake()
+        self._thread.join()
+        for sock in self._socks + [self._wakeup_r, self._wakeup_w]:
+            sock.close()
+        self._sel.close()
+
+    # --- Internals ----------------------------------------------------------
+
+    def _bind(self, speaker, kind, port, callback):
+        sock = socket.socket(socket.AF_INET, kind)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind((speaker.host, port))
+        except OSError as e:
+            sock.close()
+            if kind == socket.SOCK_STREAM:
+                # e.g. port 80 without privileges: the speaker is only seen up once it sent a packet
+                _LOGGER.warning("Emulated speaker %s not listening on TCP %d: %s", speaker.host, port, e)
+                return
+            raise
+        if kind == socket.SOCK_STREAM:
+            sock.listen(64)
+        elif port == _UDP_CONTROL_PORT:
+            speaker._control_sock = sock
+        sock.setblocking(False)
+        self._socks.append(sock)
+        self._sel.register(sock, selectors.EVENT_READ, (speaker, callback))
+
+    def _call_later(self, delay, callback, *args):
+        with self._lock:
+            heapq.heappush(self._timers, (time.monotonic() + delay, next(self._seq), callback, args))
+        if threading.current_thread() is not self._thread:
+            self._wake()
+
+    def _wake(self):
+        try:
+            self._wakeup_w.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def _loop(self):
+        while self._running:
+            with self._lock:
+                timeout = max(self._timers[0][0] - time.monotonic(), 0) if self._timers else None
+            for key, _ in self._sel.select(timeout):
+                speaker, callback = key.data
+                if speaker is None:
+                    try:
+                        while self._wakeup_r.recv(4096): pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                try:
+                    callback(speaker, key.fileobj)
+                except Exception:
+                    _LOGGER.exception("Emulated speaker %s failed", speaker.host)
+            self._run_timers()
+
+    def _run_timers(self):
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._timers or self._timers[0][0] > now:
+                    return
+                _, _, callback, args = heapq.heappop(self._timers)
+            callback(*args)
+
+    # Time in second before a packet of `speaker` leaves, None if it is lost
+    def _delay(self, speaker):
+        if speaker.loss and self._rng.random() < speaker.loss:
+            speaker.dropped += 1
+            return None
+        delay = speaker.latency
+        if speaker.jitter:
+            delay += self._rng.uniform(0, speaker.jitter)
+        if speaker.reorder and self._rng.random() < speaker.reorder:
+            delay += self._rng.uniform(0, _REORDER_WINDOW)
+        return delay
+
+    def _send(self, sock, packet, address):
+        try:
+            sock.sendto(packet, address)
+        except OSError as e:
+            _LOGGER.debug("Emulated packet to %s not sent: %s", address, e)
+
+    def _on_command(self, speaker, sock):
+        while True:
+            try:
+                packet, (src_ip, _) = sock.recvfrom(_UDP_BUFFER_SIZE)
+            except (BlockingIOError, ConnectionError):
+                return
+            if speaker.loss and self._rng.random() < speaker.loss:
+                speaker.dropped += 1
+                continue
+            try:
+                view = decode_packet(packet)
+            except ValueError:
+                continue
+            speaker.requests += 1
+            data = bytes(view.data)
+            if view.commandType == 1 or not data:
+                for command, payload in speaker.answer(view.command):
+                    delay = self._delay(speaker)
+                    if delay is None:
+                        continue
+                    speaker.replies += 1
+                    reply = get_template(command, view.commandType).packet(payload, view.crc)
+                    self._call_later(delay, self._send, sock, reply, (src_ip, _UDP_RESULT_PORT))
+            else:
+                notifications = speaker.apply(view.command, data)
+                if notifications:
+                    self._send_notifications(speaker, notifications)
+
+    def _send_notifications(self, speaker, notifications):
+        for command, payload in notifications:
+            delay = self._delay(speaker)
+            if delay is None:
+                continue
+            speaker.notifications += 1
+            speaker._ack_deadlines.append(time.monotonic() + delay + _ACK_TIMEOUT)
+            packet = get_template(command).packet(payload)
+            self._call_later(delay, self._send, speaker._control_sock, packet, (self.hub_host, _UDP_NOTIFICATION_RECV))
+            self._call_later(delay + _ACK_TIMEOUT, self._ack_check, speaker)
+
+    def _on_ack(self, speaker, sock):
+        while True:
+            try:
+                sock.recv(_UDP_BUFFER_SIZE)
+            except (BlockingIOError, ConnectionError):
+                return
+            # ACKs carry nothing identifying the notification: match the oldest one
+            if speaker._ack_deadlines:
+                speaker._ack_deadlines.popleft()
+                speaker.acks += 1
+
+    # One ACK is expected per notification within _ACK_TIMEOUT: count the missing ones
+    def _ack_check(self, speaker):
+        now = time.monotonic()
+        while speaker._ack_deadlines and speaker._ack_deadlines[0] <= now:
+            speaker._ack_deadlines.popleft()
+            speaker.acks_missing += 1
+
+    def _on_http(self, speaker, sock):
+        try:
+            conn, _ = sock.accept()
+            conn.close()
+        except OSError:
+            pass
+
+    def _on_search(self, speaker, sock):
+        try:
+            data, address = sock.recvfrom(_UDP_BUFFER_SIZE)
+        except OSError:
+            return
+        if data.startswith(b"M-SEARCH"):
+            self._send(sock, lssdp_answer(speaker.name, speaker.serialnumber, speaker.version), address)
+
+    def _drift(self, speaker):
+        self._send_notifications(speaker, speaker.drift(self._rng))
+        self._call_later(self._rng.expovariate(1 / self.notify_interval), self._drift, speaker)
+
+# Each speaker holds 3 to 4 sockets: raise the soft limit of open files when allowed
+def _raise_fd_limit(needed):
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        new_soft = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (new_soft, hard))
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate Libratone speakers until Ctrl-C.")
+    parser.add_argument("count", type=int, nargs="?", default=1)
+    parser.add_argument("--first-host", default=_FIRST_HOST)
+    parser.add_argument("--hub-host", default="127.0.0.1")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--reorder", type=float, default=0.0)
+    parser.add_argument("--notify-interval", type=float, default=_NOTIFY_INTERVAL)
+    parser.add_argument("--discovery", action="store_true")
+    args = parser.parse_args()
+    emulator = ZippEmulator(
+        args.count, first_host=args.first_host, hub_host=args.hub_host, notify_interval=args.notify_interval,
+        discovery=args.discovery, latency=args.latency, jitter=args.jitter, loss=args.loss, reorder=args.reorder,
+    )
+    print(f"{len(emulator.speakers)} speakers from {emulator.speakers[0].host} to {emulator.speakers[-1].host}")
+    try:
+        while True:
+            time.sleep(10)
+            print(emulator.stats())
+    except KeyboardInterrupt:
+        emulator.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Send one command to every speaker of a SoundSpace group at once.
+
+Usage:
+    groups = group_links(zipps)                             | {link_id: [zipp, ...]} from group_link_id of each speaker
+    group = ZippGroup.from_link(zipps, "1234")              | Or ZippGroup([zipp1, zipp2]) for any set of speakers
+    result = group.volume_set(30)
+    result.skew                                             | Time in second between the first and the last packet sent
+
+Packets of all members are built first, then sent back-to-back from the sender socket of their hub,
+instead of one send_command() round per speaker. Works with LibratoneZipp and AsyncLibratoneZipp members.
+"""
+
+import collections
+import logging
+
+from .LibratoneZipp import _COMMAND_TABLE
+
+_LOGGER = logging.getLogger("LibratoneZipp")
+
+# hosts sent at once, hosts queued behind commands waiting in their outbox, seconds between the first and the last send
+GroupSendResult = collections.namedtuple("GroupSendResult", ["sent", "queued", "skew"])
+
+def group_links(zipps):
+    """Return {link_id: [zipp, ...]} of the grouped speakers among `zipps`, as reported by their group notifications."""
+    groups = {}
+    for zipp in zipps:
+        if zipp.group_status == "GROUPED" and zipp.group_link_id:
+            groups.setdefault(zipp.group_link_id, []).append(zipp)
+    return groups
+
+class ZippGroup:
+    """
+    Speakers controlled together. All members must share one hub.
+    A member with commands waiting for its rate limit gets the group command queued behind them, so
+    its commands are never reordered; it is listed in GroupSendResult.queued and not counted in the skew.
+    """
+    def __init__(self, zipps):
+        self.zipps = list(zipps)
+        if not self.zipps:
+            raise ValueError("ZippGroup needs at least one speaker")
+        self._hub = self.zipps[0]._hub
+        if self._hub is None or any(zipp._hub is not self._hub for zipp in self.zipps):
+            raise ValueError("ZippGroup members must share one hub")
+
+    @classmethod
+    def from_link(cls, zipps, link_id):
+        """Group of the speakers among `zipps` which reported `link_id`."""
+        return cls(group_links(zipps).get(link_id, []))
+
+    @property
+    def master(self):
+        """Member reporting the MASTER role, or None."""
+        for zipp in self.zipps:
+            if zipp.group_role == "MASTER":
+                return zipp
+        return None
+
+    # --- Public API ---------------------------------------------------------
+
+    def send(self, command, data=None):
+        """Send the set `command` with `data` to every member; return a GroupSendResult."""
+        packets, queued = [], []
+        for zipp in self.zipps:
+            if zipp._closing.is_set(): continue     # Exited: sends nothing, like its own setters
+            packet = zipp._group_packet(command, data)
+            if packet is None: queued.append(zipp.host)
+            else: packets.append((zipp.host, packet))
+        skew = self._hub.send_packets(packets) if packets else 0.0
+        return GroupSendResult([host for host, _ in packets], queued, skew)
+
+    def play(self): return self._playcontrol('play')
+    def pause(self): return self._playcontrol('pause')
+    def stop(self): return self._playcontrol('stop')
+    def next(self): return self._playcontrol('next')
+    def prev(self): return self._playcontrol('prev')
+
+    def volume_set(self, volume):
+        if int(volume) < 0 or int(volume) > 100:
+            _LOGGER.warning("Error: volume command must be within 0 and 100.")
+            return None
+        return self.send(_COMMAND_TABLE['Volume']['_set'], str(volume))
+
+    def favorite_play(self, favourite_id):
+        if int(favourite_id) < 1 or int(favourite_id) > 5:
+            _LOGGER.warning("Error: favorite command must be within 1 and 5.")
+            return None
+        return self.send(_COMMAND_TABLE['Player']['_set'], _COMMAND_TABLE['Player']['favorite'][str(favourite_id)])
+
+    # --- Internals ----------------------------------------------------------
+
+    def _playcontrol(self, action):
+        return self.send(_COMMAND_TABLE['PlayControl']['_set'], _COMMAND_TABLE['PlayControl'][action])
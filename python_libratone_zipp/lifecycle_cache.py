@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from .outbound import TimerThread
+
+_LOGGER = logging.getLogger("LibratoneZipp")
+
+_FORMAT = 1                     # Version of the file format; a file of another version is ignored
+_SAVE_DELAY = 2                 # Time in second between an update and the file being written, so a sweep is written once
+
+# An entry as written by save(): {"values": {command digits: str payload}, "updated": number}
+def _valid_entry(entry):
+    if not isinstance(entry, dict) or not isinstance(entry.get("values"), dict) or not isinstance(entry.get("updated", 0), (int, float)):
+        return False
+    return all(isinstance(c, str) and c.isdigit() and isinstance(d, str) for c, d in entry["values"].items())
+
+class LifecycleCache:
+    """
+    Raw payloads of the values fixed for the lifecycle of speakers (version, name, serial, color, voicing/room lists),
+    per host, saved in a compact JSON file. Shared by all devices given as `lifecycle_cache`:
+    they serve these values from the file at startup instead of waiting for the speaker, see LibratoneZipp.
+    Payloads are kept as received, so loading them goes through the same handlers (and the same interned catalogs).
+    """
+    def __init__(self, path, save_delay=_SAVE_DELAY):
+        self.path = path
+        self.save_delay = save_delay
+        self._lock = threading.Lock()
+        self._entries = {}          # host -> {"values": {command (str): payload as latin-1 str}, "updated": time.time()}
+        self._dirty = False
+        self._save_scheduled = False
+        self._timer = TimerThread(name="ZippLifecycleCache")
+        self._load()
+
+    # --- Public API ---------------------------------------------------------
+
+    def get(self, host):
+        """Return {command: payload bytes} cached for `host`, empty if none."""
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is None:
+                return {}
+            return {int(command): data.encode("latin-1") for command, data in entry["values"].items()}
+
+    def value(self, host, command):
+        """Return the payload of `command` cached for `host`, or None."""
+        with self._lock:
+            data = self._entries.get(host, {}).get("values", {}).get(str(command))
+        return None if data is None else data.encode("latin-1")
+
+    def update(self, host, command, data):
+        """Store the payload of `command` received from `host`; the file is written within save_delay seconds."""
+        text = bytes(data).decode("latin-1")
+        with self._lock:
+            entry = self._entries.setdefault(host, {"values": {}, "updated": 0})
+            if entry["values"].get(str(command)) == text:
+                return
+            entry["values"][str(command)] = text
+            entry["updated"] = time.time()
+            self._changed()
+
+    def invalidate(self, host):
+        """Forget every value of `host`, e.g. after a firmware update."""
+        with self._lock:
+            if self._entries.pop(host, None) is not None:
+                self._changed()
+
+    def hosts(self):
+        with self._lock:
+            return list(self._entries)
+
+    def save(self):
+        """Write the file now if something changed, atomically."""
+        with self._lock:
+            self._save_scheduled = False
+            if not self._dirty:
+                return
+            content = json.dumps({"format": _FORMAT, "speakers": self._entries}, separators=(",", ":"))
+            self._dirty = False
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            _LOGGER.warning("Cannot write lifecycle cache %s: %s", self.path, e)
+            with self._lock:
+                self._dirty = True
+
+    def close(self):
+        self.save()
+        self._timer.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # --- Internals ----------------------------------------------------------
+
+    # Mark the entries changed and schedule save() - _lock must be held
+    def _changed(self):
+        self._dirty = True
+        if not self._save_scheduled:
+            self._save_scheduled = True
+            self._timer.call_later(self.save_delay, self.save)
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                content = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            _LOGGER.warning("Ignoring unreadable lifecycle cache %s: %s", self.path, e)
+            return
+        if not isinstance(content, dict) or content.get("format") != _FORMAT or not isinstance(content.get("speakers"), dict):
+            _LOGGER.warning("Ignoring lifecycle cache %s of another format", self.path)
+            return
+        for host, entry in content["speakers"].items():
+            if _valid_entry(entry):
+                self._entries[host] = {"values": entry["values"], "updated": entry.get("updated", 0)}
+            else:
+                _LOGGER.warning("Ignoring malformed entry of %s in lifecycle cache %s", host, self.path)
@@ -0,0 +1,178 @@
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)    # Histogram upper bounds in second
+
+# name -> (Prometheus metric, help) of counters and histograms recorded by devices and hubs
+_COUNTERS = {
+    "tx": ("zipp_packets_sent_total", "Packets sent to the speaker"),
+    "rx": ("zipp_packets_received_total", "Packets received from the speaker"),
+    "acks": ("zipp_acks_sent_total", "ACKs sent after a notification of the speaker"),
+    "unknown": ("zipp_unknown_commands_total", "Packets received with a command without handler"),
+    "decode_errors": ("zipp_decode_errors_total", "Malformed packets dropped"),
+    "queue_drops": ("zipp_queue_drops_total", "Received packets dropped because the device queue was full"),
+    "duplicates": ("zipp_duplicates_total", "Packets dropped because they were already received"),
+    "retransmits": ("zipp_retransmits_total", "Reliable commands sent again because they were not confirmed yet"),
+    "unconfirmed": ("zipp_unconfirmed_total", "Reliable commands given up without confirmation"),
+    "coalesced": ("zipp_coalesced_total", "Commands waiting for the rate limit replaced by a newer value"),
+}
+_HISTOGRAMS = {
+    "rtt": ("zipp_reply_latency_seconds", "Time between a get request and its reply"),
+    "process": ("zipp_process_seconds", "Time spent in process_zipp_message"),
+    "confirm": ("zipp_confirm_latency_seconds", "Time between a reliable command and its confirmation, retransmissions included"),
+}
+
+_default_metrics = None
+_default_metrics_lock = threading.Lock()
+
+def get_default_metrics():
+    """Thread-safe lazy init of the Metrics used by devices without hub."""
+    global _default_metrics
+    if _default_metrics is None:
+        with _default_metrics_lock:
+            if _default_metrics is None:
+                _default_metrics = Metrics()
+    return _default_metrics
+
+class _Shard:
+    """Counters and histograms written by ONE thread only."""
+    __slots__ = ('counters', 'histograms')
+
+    def __init__(self):
+        self.counters = {}      # (name, host, command) -> count
+        self.histograms = {}    # (name, host) -> [count per bucket..., count above the last bucket, sum]
+
+class Metrics:
+    """
+    Per-device and per-command counters, and latency histograms.
+    Each thread writes to its own shard, so inc() and observe() take no lock; snapshot() merges the shards.
+    Gauges are read from their owner when exported, see register_gauge().
+    """
+    def __init__(self, buckets=_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._gauges = []               # (metric, help, collect)
+
+    # --- Public API ---------------------------------------------------------
+
+    def inc(self, name, host, command=None, count=1):
+        counters = self._shard().counters
+        key = (name, host, command)
+        counters[key] = counters.get(key, 0) + count
+
+    def observe(self, name, host, seconds):
+        histograms = self._shard().histograms
+        key = (name, host)
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        histogram[bisect.bisect_left(self.buckets, seconds)] += 1
+        histogram[-1] += seconds
+
+    def register_gauge(self, metric, description, collect):
+        """Export `metric` with the values of collect(), called on each snapshot as {host: value}."""
+        self._gauges.append((metric, description, collect))
+
+    def snapshot(self, host=None):
+        """
+        Return {"counters": {name: {host: {command: count}}}, "histograms": {name: {host: {"buckets": {le: count},
+        "count": n, "sum": seconds}}}, "gauges": {metric: {host: value}}}, for one `host` or all.
+        Bucket counts are cumulative, like Prometheus. Counters without command have None as command.
+        """
+        counters, histograms = self._merge()
+        result = {"counters": {}, "histograms": {}, "gauges": {}}
+        for metric, _, collect in self._gauges:
+            result["gauges"][metric] = {h: v for h, v in collect().items() if host is None or h == host}
+        for (name, h, command), count in counters.items():
+            if host is None or h == host:
+                result["counters"].setdefault(name, {}).setdefault(h, {})[command] = count
+        for (name, h), histogram in histograms.items():
+            if host is None or h == host:
+                cumulative, buckets = 0, {}
+                for le, count in zip(self.buckets + (float("inf"),), histogram):
+                    cumulative += count
+                    buckets[le] = cumulative
+                result["histograms"].setdefault(name, {})[h] = {"buckets": buckets, "count": cumulative, "sum": histogram[-1]}
+        return result
+
+    def prometheus(self):
+        """Return all metrics in Prometheus text format."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, (metric, description) in _COUNTERS.items():
+            values = snapshot["counters"].get(name)
+            if not values:
+                continue
+            lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+            for host, commands in sorted(values.items()):
+                for command, count in sorted(commands.items(), key=lambda c: -1 if c[0] is None else c[0]):
+                    labels = _labels(host=host) if command is None else _labels(host=host, command=command)
+                    lines.append(f"{metric}{{{labels}}} {count}")
+        for name, (metric, description) in _HISTOGRAMS.items():
+            values = snapshot["histograms"].get(name)
+            if not values:
+                continue
+            lines += [f"# HELP {metric} {description}", f"# TYPE {metric} histogram"]
+            for host, histogram in sorted(values.items()):
+                for le, count in histogram["buckets"].items():
+                    lines.append(f"{metric}_bucket{{{_labels(host=host, le='+Inf' if le == float('inf') else repr(le))}}} {count}")
+                lines.append(f"{metric}_sum{{{_labels(host=host)}}} {histogram['sum']}")
+                lines.append(f"{metric}_count{{{_labels(host=host)}}} {histogram['count']}")
+        for metric, description, _ in self._gauges:
+            lines += [f"# HELP {metric} {description}", f"# TYPE {metric} gauge"]
+            for host, value in sorted(snapshot["gauges"][metric].items()):
+                lines.append(f"{metric}{{{_labels(host=host)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9100, host=""):
+        """Serve prometheus() on http://host:port/metrics from a daemon thread; return the server (call shutdown() to stop)."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="ZippMetrics", daemon=True).start()
+        return server
+
+    # --- Internals ----------------------------------------------------------
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+            return shard
+
+    # Sum of all shards; dict.copy() is atomic, so writers are never blocked
+    def _merge(self):
+        with self._shards_lock:
+            shards = list(self._shards)
+        counters, histograms = {}, {}
+        for shard in shards:
+            for key, count in shard.counters.copy().items():
+                counters[key] = counters.get(key, 0) + count
+            for key, histogram in shard.histograms.copy().items():
+                merged = histograms.get(key)
+                histograms[key] = list(histogram) if merged is None else [a + b for a, b in zip(merged, histogram)]
+        return counters, histograms
+
+def _labels(**labels):
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,48 @@
+import time
+
+from .metrics import Metrics
+from .outbound import TimerThread
+from .reachability import Reachability
+from .subscriptions import ChangeNotifier
+
+class _NullScheduler:
+    def add(self, device, interval): pass
+    def remove(self, device): pass
+    def set_interval(self, device, interval): pass
+
+class NullHub:
+    """
+    Hub which sends nothing and receives nothing: lets a LibratoneZipp process packets without network
+    nor keepalive, e.g. to benchmark it or to replay a capture. Packets are given to process_zipp_message().
+    Change notifications and the outbox timer work like on SocketHub.
+    """
+    def __init__(self):
+        self.scheduler = _NullScheduler()
+        self.notifier = ChangeNotifier()
+        self.metrics = Metrics()
+        self.timer = TimerThread()
+        self.reachability = Reachability()
+
+    def register(self, device): pass
+    def unregister(self, device): pass
+    def send_control(self, host, packet): pass
+    def send_template(self, host, template, payload=b'', crc=None): pass
+
+    def send_packets(self, packets):
+        return 0.0
+
+    def stop(self, timeout=2):
+        """Stop the timer and notifier threads; return False if one was still running after `timeout` seconds."""
+        deadline = time.monotonic() + timeout
+        self.timer.stop()
+        self.notifier.stop()
+        stopped = True
+        for component in (self.timer, self.notifier):
+            stopped = component.join(max(deadline - time.monotonic(), 0)) and stopped
+        return stopped
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
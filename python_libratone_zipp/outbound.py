@@ -0,0 +1,164 @@
+import collections
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+_LOGGER = logging.getLogger("LibratoneZipp")
+
+_SEND_RATE = 5                  # Commands per second sent to one speaker once its burst is used
+_SEND_BURST = 3                 # Commands sent to one speaker at once before being rate limited
+
+_default_timer = None
+_default_timer_lock = threading.Lock()
+
+def get_default_timer():
+    """Thread-safe lazy init of the TimerThread used by devices without hub."""
+    global _default_timer
+    if _default_timer is None:
+        with _default_timer_lock:
+            if _default_timer is None:
+                _default_timer = TimerThread(name="ZippOutbox")
+    return _default_timer
+
+class TimerThread:
+    """
+    ONE thread calling functions after a delay, like asyncio's loop.call_later(), for every Outbox of a hub.
+    The thread starts with the first call_later(), so a hub which never rate limits does not run it.
+    """
+    def __init__(self, name="ZippTimer"):
+        self.name = name
+        self._cond = threading.Condition()
+        self._heap = []             # (due, id, function, args)
+        self._ids = itertools.count()
+        self._running = True
+        self._thread = None
+
+    # --- Public API ---------------------------------------------------------
+
+    def call_later(self, delay, function, *args):
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._ids), function, args))
+            if self._thread is None and self._running:
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._heap.clear()
+            self._cond.notify()
+
+    def join(self, timeout=None):
+        """Wait for the thread to end after stop(); return False if it is still running after `timeout` seconds."""
+        thread = self._thread
+        if thread is None or thread is threading.current_thread(): return True
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    # --- Internals ----------------------------------------------------------
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._running and (not self._heap or self._heap[0][0] > time.monotonic()):
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                if not self._running:
+                    return
+                _, _, function, args = heapq.heappop(self._heap)
+            try:
+                function(*args)
+            except Exception:
+                _LOGGER.exception("Timer call failed")
+
+class Outbox:
+    """
+    Outbound commands of one device, sent by send(*args) within a token bucket of `burst` commands refilled at `rate` per second.
+    Commands beyond are queued in order and sent from `timer` (TimerThread or asyncio loop) as tokens come back.
+    A queued command submitted with coalesce=True is replaced in place by the next one of the same command:
+    only the latest value is sent, and on_superseded(args) is called with the arguments which were replaced.
+    Other commands, like play/pause/next, are never dropped nor reordered.
+    """
+    def __init__(self, send, timer, rate=_SEND_RATE, burst=_SEND_BURST, on_superseded=None):
+        self.rate = rate
+        self.burst = burst
+        self._send = send
+        self._timer = timer
+        self._on_superseded = on_superseded
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        self._queue = collections.deque()   # [command, args] waiting for a token
+        self._coalesced = {}                # command -> its entry of _queue, for commands submitted with coalesce
+        self._scheduled = False             # _drain() is due on the timer
+
+    # --- Public API ---------------------------------------------------------
+
+    def submit(self, command, args, coalesce=False):
+        """Send send(*args) now if a token is left, or queue it. Return the result of send(), or True if queued."""
+        superseded = None
+        with self._lock:
+            entry = self._coalesced.get(command) if coalesce else None
+            if entry is not None:
+                superseded, entry[1] = entry[1], args
+                result = True
+            elif not self._queue and self._take_token():
+                # Sent under the lock, so that a command never overtakes one drained by the timer
+                result = self._send(*args)
+            else:
+                entry = [command, args]
+                self._queue.append(entry)
+                if coalesce: self._coalesced[command] = entry
+                self._schedule()
+                result = True
+        if superseded is not None and self._on_superseded is not None: self._on_superseded(superseded)
+        return result
+
+    def reserve(self):
+        """Take a token for a command the caller sends itself, e.g. a group fan-out.
+        Return False if none is left or commands are waiting: the command must be submitted instead."""
+        with self._lock:
+            return not self._queue and self._take_token()
+
+    def waiting(self, match):
+        """Return True if a queued command has arguments for which match(args) is true."""
+        with self._lock:
+            return any(match(entry[1]) for entry in self._queue)
+
+    def depth(self):
+        return len(self._queue)
+
+    def clear(self):
+        with self._lock:
+            self._queue.clear()
+            self._coalesced.clear()
+
+    # --- Internals ----------------------------------------------------------
+
+    def _take_token(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+        if self._tokens < 1: return False
+        self._tokens -= 1
+        return True
+
+    # Call _drain() when the next token is back
+    def _schedule(self):
+        if self._scheduled: return
+        self._scheduled = True
+        self._timer.call_later(max((1 - self._tokens) / self.rate, 0), self._drain)
+
+    def _drain(self):
+        with self._lock:
+            self._scheduled = False
+            while self._queue and self._take_token():
+                entry = self._queue.popleft()
+                if self._coalesced.get(entry[0]) is entry: del self._coalesced[entry[0]]
+                try:
+                    self._send(*entry[1])
+                except Exception:
+                    _LOGGER.exception("Sending queued command %s failed", entry[0])
+            if self._queue: self._schedule()
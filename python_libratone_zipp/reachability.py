@@ -0,0 +1,151 @@
+import asyncio
+import errno
+import selectors
+import socket
+import threading
+import time
+
+_PROBE_PORT = 80                # TCP port probed on the speaker
+_PROBE_TIMEOUT = 1              # Time in second to wait for a TCP probe
+_PROBE_BATCH = 256              # Max sockets opened at once by probe_hosts
+_SEEN_FRESHNESS = 70            # Time in second during which a received UDP packet proves the speaker is up, for hosts without interval set
+_SEEN_MARGIN = 10               # Time in second added to the keepalive interval of a host to get its freshness, see set_interval()
+_UP_TTL = 10                    # Time in second during which a successful probe is trusted
+_DOWN_BACKOFF = 30              # Time in second before probing again a speaker found down, doubled on each failure...
+_DOWN_BACKOFF_MAX = 300         # ... up to this value
+
+_IN_PROGRESS = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN, getattr(errno, "WSAEWOULDBLOCK", errno.EWOULDBLOCK))
+
+def probe_hosts(hosts, port=_PROBE_PORT, timeout=_PROBE_TIMEOUT):
+    """
+    TCP-connect to every host at once with non-blocking sockets, from the calling thread.
+    Return {host: True if the connection was accepted within `timeout` seconds}.
+    """
+    hosts = list(hosts)
+    results = {}
+    for i in range(0, len(hosts), _PROBE_BATCH):
+        results.update(_probe_batch(hosts[i:i + _PROBE_BATCH], port, timeout))
+    return results
+
+def _probe_batch(hosts, port, timeout):
+    results = {}
+    sel = selectors.DefaultSelector()
+    try:
+        for host in hosts:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            try:
+                err = sock.connect_ex((host, port))
+            except OSError:
+                err = errno.EHOSTUNREACH
+            if err in _IN_PROGRESS:
+                sel.register(sock, selectors.EVENT_WRITE, host)
+                continue
+            results[host] = err == 0
+            sock.close()
+
+        deadline = time.monotonic() + timeout
+        while sel.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in sel.select(remaining):
+                sock = key.fileobj
+                results[key.data] = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0
+                sel.unregister(sock)
+                sock.close()
+    finally:
+        for key in list(sel.get_map().values()):
+            results[key.data] = False
+            key.fileobj.close()
+        sel.close()
+    return results
+
+async def async_probe_host(host, port=_PROBE_PORT, timeout=_PROBE_TIMEOUT):
+    """TCP-connect to host without blocking the loop. Return True if accepted within `timeout` seconds."""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    return True
+
+class Reachability:
+    """
+    Per-host "is the speaker up" cache, owned by a hub.
+
+    - Any UDP packet received from a host within its keepalive interval plus _SEEN_MARGIN proves it is up (see seen()),
+      or within _SEEN_FRESHNESS seconds if its interval was not given (see set_interval()).
+    - Otherwise the last probe result is reused: _UP_TTL seconds if up, an exponential backoff if down.
+    - Hosts needing a probe are probed concurrently with a short timeout (see probe_many()).
+    """
+    def __init__(self, port=_PROBE_PORT, timeout=_PROBE_TIMEOUT):
+        self.port = port
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._last_seen = {}    # host -> monotonic time of the last packet received
+        self._freshness = {}    # host -> time in second during which its last packet proves it is up
+        self._state = {}        # host -> (up, time until which it is trusted, consecutive failures)
+
+    # --- Public API ---------------------------------------------------------
+
+    def seen(self, host):
+        """Record traffic from host - called by the hub on every received packet."""
+        self._last_seen[host] = time.monotonic()
+
+    def set_interval(self, host, interval):
+        """Trust a packet from host for its keepalive `interval` plus _SEEN_MARGIN - called by the hub and by keepalive_interval_set()."""
+        self._freshness[host] = interval + _SEEN_MARGIN
+
+    def forget(self, host):
+        with self._lock:
+            self._last_seen.pop(host, None)
+            self._freshness.pop(host, None)
+            self._state.pop(host, None)
+
+    def is_up(self, host):
+        return self.probe_many([host])[host]
+
+    def probe_many(self, hosts):
+        """Return {host: up} for every host, probing concurrently only hosts without a trusted answer."""
+        now = time.monotonic()
+        results = {}
+        to_probe = []
+        for host in hosts:
+            up = self._cached(host, now)
+            if up is None: to_probe.append(host)
+            else: results[host] = up
+        if to_probe:
+            probed = probe_hosts(to_probe, self.port, self.timeout)
+            now = time.monotonic()
+            for host, up in probed.items():
+                self._record(host, up, now)
+            results.update(probed)
+        return results
+
+    async def async_is_up(self, host):
+        up = self._cached(host, time.monotonic())
+        if up is None:
+            up = await async_probe_host(host, self.port, self.timeout)
+            self._record(host, up, time.monotonic())
+        return up
+
+    # --- Internals ----------------------------------------------------------
+
+    # True/False if known, None if a probe is needed
+    def _cached(self, host, now):
+        if now - self._last_seen.get(host, float("-inf")) < self._freshness.get(host, _SEEN_FRESHNESS):
+            return True
+        with self._lock:
+            state = self._state.get(host)
+        if state is not None and now < state[1]:
+            return state[0]
+        return None
+
+    def _record(self, host, up, now):
+        with self._lock:
+            if up:
+                self._state[host] = (True, now + _UP_TTL, 0)
+            else:
+                failures = self._state.get(host, (False, 0, 0))[2] + 1
+                self._state[host] = (False, now + min(_DOWN_BACKOFF * 2 ** (failures - 1), _DOWN_BACKOFF_MAX), failures)
@@ -0,0 +1,233 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_LOGGER = logging.getLogger("LibratoneZipp")
+
+_GOLDEN_RATIO = 0.6180339887498949  # Phase step between two devices: spreads any number of devices evenly over a period
+_STARTUP_SPREAD = 2                 # Time in second over which the first poll of newly added devices is spread
+_SCHEDULER_WORKERS = 4              # Threads refreshing devices, whatever the number of devices
+
+class PollSchedule:
+    """
+    Heap of devices ordered by next poll time.
+    Each device gets a phase in [0, 1) of its interval, so polls stay evenly
+    spread over the period instead of bursting in lockstep.
+    Not thread-safe: owned by PollScheduler or AsyncPollScheduler.
+    """
+    def __init__(self):
+        self._heap = []                 # (due, entry_id, device)
+        self._entries = {}              # device -> (interval, phase, entry_id) - heap items with another entry_id are stale
+        self._ids = itertools.count()
+        self._phase = 0.0
+        self._epoch = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, device, interval, now):
+        """Schedule `device` every `interval` seconds; the first poll happens within _STARTUP_SPREAD seconds."""
+        if self._epoch is None:
+            self._epoch = now
+        self._phase = (self._phase + _GOLDEN_RATIO) % 1.0
+        self._push(device, interval, self._phase, now + self._phase * min(interval, _STARTUP_SPREAD))
+
+    def remove(self, device):
+        self._entries.pop(device, None)
+
+    def set_interval(self, device, interval, now):
+        entry = self._entries.get(device)
+        if entry is not None:
+            self._push(device, interval, entry[1], self._next_slot(interval, entry[1], now))
+
+    def next_due(self):
+        """Return the time of the next poll, or None if nothing is scheduled."""
+        while self._heap:
+            due, entry_id, device = self._heap[0]
+            entry = self._entries.get(device)
+            if entry is not None and entry[2] == entry_id:
+                return due
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now):
+        """Return devices due at `now` and reschedule them on their next slot."""
+        due_devices = []
+        while self._heap and self._heap[0][0] <= now:
+            _, entry_id, device = heapq.heappop(self._heap)
+            entry = self._entries.get(device)
+            if entry is None or entry[2] != entry_id:
+                continue
+            due_devices.append(device)
+            self._push(device, entry[0], entry[1], self._next_slot(entry[0], entry[1], now))
+        return due_devices
+
+    # First time after `now` on the grid epoch + (k + phase) * interval
+    def _next_slot(self, interval, phase, now):
+        k = math.floor((now - self._epoch) / interval - phase) + 1
+        return self._epoch + (k + phase) * interval
+
+    def _push(self, device, interval, phase, due):
+        entry_id = next(self._ids)
+        self._entries[device] = (interval, phase, entry_id)
+        heapq.heappush(self._heap, (due, entry_id, device))
+
+class PollScheduler:
+    """
+    Fleet-wide keepalive: ONE scheduler thread and a fixed pool of
+    _SCHEDULER_WORKERS threads call `device.state_refresh()` when due.
+    A device still refreshing when it is due again is skipped for that period.
+    `prefetch(devices)`, if given, is called once per batch of due devices before
+    refreshing them, e.g. to probe all their hosts concurrently.
+    """
+    def __init__(self, workers=_SCHEDULER_WORKERS, prefetch=None):
+        self._schedule = PollSchedule()
+        self._prefetch = prefetch
+        self._cond = threading.Condition()
+        self._busy = set()
+        self._refreshing = 0            # state_refresh() calls running
+        self._running = True
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ZippPoll")
+        self._thread = threading.Thread(target=self._loop, name="ZippPollScheduler", daemon=True)
+        self._thread.start()
+
+    # --- Public API ---------------------------------------------------------
+
+    def add(self, device, interval):
+        with self._cond:
+            self._schedule.add(device, interval, time.monotonic())
+            self._cond.notify()
+
+    def remove(self, device):
+        with self._cond:
+            self._schedule.remove(device)
+
+    def set_interval(self, device, interval):
+        with self._cond:
+            self._schedule.set_interval(device, interval, time.monotonic())
+            self._cond.notify()
+
+    def stop(self):
+        """Stop scheduling; refreshes not started yet are dropped, running ones finish, see join()."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def join(self, timeout=None):
+        """Wait for the scheduler thread and running refreshes to end after stop(); return False if not within `timeout` seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        with self._cond:
+            while self._refreshing and (deadline is None or deadline > time.monotonic()):
+                self._cond.wait(None if deadline is None else deadline - time.monotonic())
+            return not self._refreshing and not self._thread.is_alive()
+
+    # --- Internals ----------------------------------------------------------
+
+    def _loop(self):
+        with self._cond:
+            while self._running:
+                due = [d for d in self._schedule.pop_due(time.monotonic()) if d not in self._busy]
+                if due:
+                    self._busy.update(due)
+                    self._pool.submit(self._refresh_batch, due)
+                next_due = self._schedule.next_due()
+                self._cond.wait(None if next_due is None else max(next_due - time.monotonic(), 0))
+
+    def _refresh_batch(self, devices):
+        if self._prefetch is not None:
+            try:
+                self._prefetch(devices)
+            except Exception:
+                _LOGGER.exception("Keep-alive prefetch failed")
+        for device in devices[1:]:
+            with self._cond:
+                if not self._running: return
+                self._pool.submit(self._refresh, device)
+        self._refresh(devices[0])
+
+    def _refresh(self, device):
+        with self._cond:
+            if not self._running: return
+            self._refreshing += 1
+        try:
+            device.state_refresh()
+        except Exception:
+            _LOGGER.exception("Keep-alive refresh failed for %s", getattr(device, "host", device))
+        finally:
+            with self._cond:
+                self._busy.discard(device)
+                self._refreshing -= 1
+                if not self._refreshing: self._cond.notify_all()
+
+class AsyncPollScheduler:
+    """
+    asyncio version of PollScheduler: ONE task awaits `device.state_refresh()` when due.
+    Call start() from the running loop.
+    """
+    def __init__(self):
+        self._schedule = PollSchedule()
+        self._busy = {}                 # device -> its refresh task
+        self._loop = None
+        self._task = None
+        self._wakeup = asyncio.Event()
+
+    # --- Public API ---------------------------------------------------------
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._run())
+
+    def add(self, device, interval):
+        self._schedule.add(device, interval, self._now())
+        self._wakeup.set()
+
+    def remove(self, device):
+        self._schedule.remove(device)
+
+    def set_interval(self, device, interval):
+        self._schedule.set_interval(device, interval, self._now())
+        self._wakeup.set()
+
+    def stop(self):
+        """Cancel the scheduler task and the refreshes running."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._busy.values()):
+            task.cancel()
+        self._busy.clear()
+
+    # --- Internals ----------------------------------------------------------
+
+    def _now(self):
+        return self._loop.time() if self._loop is not None else time.monotonic()
+
+    async def _run(self):
+        while True:
+            for device in self._schedule.pop_due(self._loop.time()):
+                if device in self._busy:
+                    continue
+                self._busy[device] = self._loop.create_task(self._refresh(device))
+            next_due = self._schedule.next_due()
+            self._wakeup.clear()
+            try:
+                timeout = None if next_due is None else max(next_due - self._loop.time(), 0)
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _refresh(self, device):
+        try:
+            await device.state_refresh()
+        except Exception:
+            _LOGGER.exception("Keep-alive refresh failed for %s", getattr(device, "host", device))
+        finally:
+            self._busy.pop(device, None)
@@ -1,6 +1,16 @@
+import logging
 import socket
 import threading
-from .LibratoneMessage import LibratoneMessage
+import time
+from .LibratoneMessage import get_template
+from .metrics import Metrics
+from .outbound import TimerThread
+from .reachability import Reachability
+from .scheduler import PollScheduler
+from .subscriptions import ChangeNotifier
+from .workers import OrderedWorkerPool, _WORKERS
+
+_LOGGER = logging.getLogger("LibratoneZipp")
 
 # Zipp's UDP ports
 _UDP_CONTROL_PORT = 7777          # where commands get sent
@@ -8,39 +18,115 @@ _UDP_RESULT_PORT = 7778           # where results arrive
 _UDP_NOTIFICATION_RECV = 3333     # where notifications arrive
 _UDP_NOTIFICATION_ACK  = 3334     # where ACKs for notifications get sent
 _UDP_BUFFER_SIZE = 4096
+_UDP_RECEIVE_BUFFER = 4 * 1024 * 1024   # Kernel receive buffer asked for each socket, capped by net.core.rmem_max on Linux
+_STOP_TIMEOUT = 2                 # Time in second stop() waits for the threads of the hub, e.g. a callback or a probe running
+_RECEIVE_SHARDS = 1               # Receive sockets per port and address, spread by the kernel with SO_REUSEPORT
+
+_ACK_TEMPLATE = get_template(0)   # ACK sent after each notification
+
+# UDP socket bound to `port` on `address`, with a receive buffer absorbing bursts while workers are busy
+# With reuse_port, other sockets bound the same way share its packets, see SocketHub(shards=)
+def _receive_socket(port, address="", reuse_port=False):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        if reuse_port: sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _UDP_RECEIVE_BUFFER)
+        except OSError:
+            pass
+        sock.bind((address, port))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+class _ReceiveShard:
+    """One receive socket of a SocketHub, its thread, and the load counted by that thread."""
+    __slots__ = ('port', 'address', 'index', 'sock', 'thread', 'packets', 'bytes')
+
+    def __init__(self, port, address, index, sock):
+        self.port = port
+        self.address = address
+        self.index = index
+        self.sock = sock
+        self.thread = None
+        self.packets = 0
+        self.bytes = 0
 
 class SocketHub:
     """
-    Owns ONE notification socket (3333), ONE result socket (7778),
+    Owns the notification socket (3333), the result socket (7778) - one each by default, see `shards` -
     and ONE shared sender socket. It demuxes incoming packets by source IP
-    and forwards the raw bytes to the registered device's process_zipp_message.
+    and forwards the raw bytes to the registered device's process_zipp_message, run by `workers`:
+    one FIFO queue per device, a fixed pool of `worker_threads` threads. Receive threads only
+    queue packets and send ACKs, so a slow device never delays the others.
+    Its `scheduler` runs the keepalive of every device with a constant number of threads,
+    and its `reachability` tells which speakers are up without blocking on offline ones.
+    Its `notifier` delivers value changes of devices to subscribers, see subscribe().
+    Its `metrics` counts packets per device and command, see Metrics.snapshot() and Metrics.prometheus().
+    Packets received and commands sent are written to `recorder` (a CaptureRecorder) if set.
+    Its `timer` sends the commands held by the rate limit of each device, see Outbox.
+    stop() ends all of them at once; `with SocketHub() as hub:` stops it on exit.
+
+    `addresses` are the local addresses bound, one per interface, all of them by default.
+    With `shards` > 1, each port is received by that many sockets per address, bound with SO_REUSEPORT,
+    each with its own thread: the kernel spreads speakers among them by source address and port,
+    so the packets of one speaker keep their order. Their load is in shard_stats().
     """
-    def __init__(self):
+    def __init__(self, recorder=None, worker_threads=_WORKERS, addresses=("",), shards=_RECEIVE_SHARDS):
         self._devices = {}   # ip -> device (must implement process_zipp_message(packet, port))
+        self.recorder = recorder
         self._lock = threading.Lock()
         self._running = True
 
-        # Bind once: notifications and results
-        self._notif_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self._notif_sock.bind(("", _UDP_NOTIFICATION_RECV))
-
-        self._result_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self._result_sock.bind(("", _UDP_RESULT_PORT))
+        # Bind once: notifications and results, per address and shard
+        if shards < 1:
+            raise ValueError("SocketHub needs at least one shard")
+        if shards > 1 and not hasattr(socket, "SO_REUSEPORT"):
+            _LOGGER.warning("SO_REUSEPORT is not supported here, receiving with one socket per port")
+            shards = 1
+        self._shards = []
+        try:
+            for address in addresses:
+                for port in (_UDP_NOTIFICATION_RECV, _UDP_RESULT_PORT):
+                    for index in range(shards):
+                        self._shards.append(_ReceiveShard(port, address, index, _receive_socket(port, address, shards > 1)))
+        except OSError:
+            for shard in self._shards:
+                shard.sock.close()
+            raise
 
         # Unbound sender 
         self._send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
-        # Background threads for receiving
-        self._t_notif = threading.Thread(
-            target=self._rx_loop, args=(self._notif_sock, _UDP_NOTIFICATION_RECV, True),
-            name="ZippHubNotif", daemon=True
-        )
-        self._t_result = threading.Thread(
-            target=self._rx_loop, args=(self._result_sock, _UDP_RESULT_PORT, False),
-            name="ZippHubResult", daemon=True
+        # Change subscriptions
+        self.notifier = ChangeNotifier(name="ZippHubNotifier")
+
+        # Counters of the hub and its devices
+        self.metrics = Metrics()
+
+        # Ordered processing of received packets, per device
+        self.workers = OrderedWorkerPool(worker_threads, name="ZippHubWorker")
+        self.metrics.register_gauge("zipp_queue_depth", "Received packets waiting to be processed", self.workers.depths)
+
+        # Commands held by the rate limit of devices, one thread for all
+        self.timer = TimerThread(name="ZippHubOutbox")
+        self.metrics.register_gauge("zipp_outbox_depth", "Commands waiting for the rate limit of the speaker", self._outbox_depths)
+
+        # Fleet-wide keepalive - hosts of due devices are probed together before refreshing them
+        self.reachability = Reachability()
+        self.scheduler = PollScheduler(
+            prefetch=lambda devices: self.reachability.probe_many([d.host for d in devices])
         )
-        self._t_notif.start()
-        self._t_result.start()
+
+        # Background threads for receiving, one per shard
+        for shard in self._shards:
+            kind = "Notif" if shard.port == _UDP_NOTIFICATION_RECV else "Result"
+            shard.thread = threading.Thread(
+                target=self._rx_loop, args=(shard, shard.port == _UDP_NOTIFICATION_RECV),
+                name=f"ZippHub{kind}_{shard.address or 'any'}_{shard.index}", daemon=True
+            )
+            shard.thread.start()
 
     # --- Public API ---------------------------------------------------------
 
@@ -48,44 +134,135 @@ class SocketHub:
         """Call with a device that has `host` (IP string) and `process_zipp_message(bytes, port)`."""
         with self._lock:
             self._devices[device.host] = device
+        interval = getattr(device, "keepalive_interval", None)
+        if interval is not None: self.reachability.set_interval(device.host, interval)
 
     def unregister(self, device):
         with self._lock:
             self._devices.pop(device.host, None)
+
+    def subscribe(self, callback, fields=None):
+        """Call callback(device, {field: (old, new)}) when values of any device change, see LibratoneZipp.subscribe().
+        Return a function removing the subscription."""
+        return self.notifier.subscribe(callback, fields)
             
     def send_control(self, host: str, packet: bytes):
         """Send a pre-built packet to the speaker's control port (7777)."""
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.sent(_UDP_CONTROL_PORT, host, packet)
         self._send_sock.sendto(packet, (host, _UDP_CONTROL_PORT))
 
-    def stop(self):
-        """Stop threads and sockets (optional clean shutdown)."""
+    def send_template(self, host: str, template, payload: bytes = b'', crc: int = None):
+        """Send a packet from its PacketTemplate to the speaker's control port (7777), header and payload without copy."""
+        if self.recorder is not None:
+            # The recorder needs the whole packet
+            self.send_control(host, template.packet(payload, crc))
+            return
+        template.sendmsg(self._send_sock, (host, _UDP_CONTROL_PORT), payload, crc)
+
+    def send_packets(self, packets):
+        """Send pre-built packets [(host, packet)] to the control port (7777) back-to-back, e.g. for a group.
+        Return the time in second between the first and the last send."""
+        sendto = self._send_sock.sendto
+        start = time.perf_counter()
+        for host, packet in packets:
+            sendto(packet, (host, _UDP_CONTROL_PORT))
+        skew = time.perf_counter() - start
+        recorder = self.recorder
+        if recorder is not None:
+            for host, packet in packets:
+                recorder.sent(_UDP_CONTROL_PORT, host, packet)
+        return skew
+
+    def shard_stats(self):
+        """Return the load of each receive socket: [{"port", "address", "shard", "packets", "bytes", "share"}],
+        `share` being its fraction of the packets received on its port and address - even shares mean N is used well."""
+        totals = {}
+        for shard in self._shards:
+            totals[(shard.port, shard.address)] = totals.get((shard.port, shard.address), 0) + shard.packets
+        return [{
+            "port": shard.port,
+            "address": shard.address,
+            "shard": shard.index,
+            "packets": shard.packets,
+            "bytes": shard.bytes,
+            "share": round(shard.packets / totals[(shard.port, shard.address)], 3) if totals[(shard.port, shard.address)] else 0.0,
+        } for shard in self._shards]
+
+    def stop(self, timeout=_STOP_TIMEOUT):
+        """Stop threads and close sockets, waiting at most `timeout` seconds for the threads.
+        Return False if a thread was still running, e.g. blocked in a subscriber callback. Calling it again does nothing."""
+        if not self._running: return True
         self._running = False
-        try: 
-            self._send_sock.sendto(b"", ("127.0.0.1", _UDP_NOTIFICATION_RECV))
-        except: 
-            pass
-        try: 
-            self._send_sock.sendto(b"", ("127.0.0.1", _UDP_RESULT_PORT))
-        except: 
-            pass
-        for s in (self._notif_sock, self._result_sock, self._send_sock):
-            try: 
+        deadline = time.monotonic() + timeout
+        self.scheduler.stop()
+        # Receive threads first: no packet is queued once workers are stopped
+        # shutdown() wakes up every socket of a port on Linux; elsewhere an empty packet wakes up one of them
+        for shard in self._shards:
+            try:
+                shard.sock.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass
+            try:
+                self._send_sock.sendto(b"", (shard.address or "127.0.0.1", shard.port))
+            except OSError:
+                pass
+        stopped = True
+        for shard in self._shards:
+            shard.thread.join(max(deadline - time.monotonic(), 0))
+            stopped = stopped and not shard.thread.is_alive()
+        self.workers.stop()
+        self.timer.stop()
+        self.notifier.stop()
+        for component in (self.scheduler, self.workers, self.timer, self.notifier):
+            stopped = component.join(max(deadline - time.monotonic(), 0)) and stopped
+        # Closed last, as running workers and refreshes may still send
+        for s in [shard.sock for shard in self._shards] + [self._send_sock]:
+            try:
                 s.close()
-            except: 
+            except OSError:
                 pass
+        return stopped
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
 
     # --- Internals ----------------------------------------------------------
 
-    def _rx_loop(self, sock, rx_port, do_ack):
+    def _outbox_depths(self):
+        with self._lock:
+            devices = list(self._devices.values())
+        return {d.host: d.outbox.depth() for d in devices if getattr(d, "outbox", None) is not None}
+
+    def _rx_loop(self, shard, do_ack):
+        sock, rx_port = shard.sock, shard.port
         while self._running:
             try:
-                data, (src_ip, _src) = sock.recvfrom(_UDP_BUFFER_SIZE)
+                data, address = sock.recvfrom(_UDP_BUFFER_SIZE)
             except OSError:
                 break
+            # Woken up by stop()
+            if not self._running or address is None: break
+            src_ip = address[0]
+            shard.packets += 1
+            shard.bytes += len(data)
             with self._lock:
                 dev = self._devices.get(src_ip)
+            recorder = self.recorder
+            if recorder is not None:
+                recorder.received(rx_port, src_ip, data)
             if dev:
-                dev.process_zipp_message(bytearray(data), rx_port)
+                self.reachability.seen(src_ip)
                 if do_ack:
-                    ack = LibratoneMessage(command=0).get_packet()
-                    self._send_sock.sendto(ack, (src_ip, _UDP_NOTIFICATION_ACK))
+                    try:
+                        _ACK_TEMPLATE.sendmsg(self._send_sock, (src_ip, _UDP_NOTIFICATION_ACK))
+                        self.metrics.inc("acks", src_ip)
+                    except OSError:
+                        # The sender socket is closed by stop(), or the speaker is unreachable
+                        if not self._running: break
+                if not self.workers.submit(src_ip, dev.process_zipp_message, data, rx_port):
+                    self.metrics.inc("queue_drops", src_ip)
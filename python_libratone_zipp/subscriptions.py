@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import threading
+import time
+
+_LOGGER = logging.getLogger("LibratoneZipp")
+
+_COALESCE_WINDOW = 0.1          # Time in second during which changes of one device are merged into one callback
+
+_default_notifier = None
+_default_notifier_lock = threading.Lock()
+
+def get_default_notifier():
+    """Thread-safe lazy init of the ChangeNotifier used by devices without hub."""
+    global _default_notifier
+    if _default_notifier is None:
+        with _default_notifier_lock:
+            if _default_notifier is None:
+                _default_notifier = ChangeNotifier()
+    return _default_notifier
+
+# Keep only fields which really changed after merging, and which are in `fields` (None = all)
+def _filter_changes(changes, fields):
+    return {f: c for f, c in changes.items() if c[0] != c[1] and (fields is None or f in fields)}
+
+class _Subscribers:
+    """Copy-on-write list of (callback, fields) - read without lock from any thread."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.items = ()
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def add(self, callback, fields=None):
+        """Return a function removing this subscription."""
+        item = (callback, frozenset(fields) if fields is not None else None)
+        with self._lock:
+            self.items = self.items + (item,)
+        def unsubscribe():
+            with self._lock:
+                self.items = tuple(i for i in self.items if i is not item)
+        return unsubscribe
+
+class ChangeNotifier:
+    """
+    Delivers value changes to subscribers from ONE thread, never from the receive thread.
+    Changes published for a device within `window` seconds are merged into one
+    callback(device, {field: (old, new)}), fields back to their old value are dropped.
+    Device subscribers are the device's own `_subscribers`; `subscribers` are fleet-wide.
+    """
+    def __init__(self, window=_COALESCE_WINDOW, name="ZippNotifier"):
+        self.window = window
+        self.subscribers = _Subscribers()
+        self._cond = threading.Condition()
+        self._pending = {}          # device -> [deadline, {field: (old, new)}]
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    # --- Public API ---------------------------------------------------------
+
+    def subscribe(self, callback, fields=None):
+        """Call callback(device, changes) for changes of any device; return a function removing the subscription."""
+        return self.subscribers.add(callback, fields)
+
+    def publish(self, device, changes):
+        with self._cond:
+            entry = self._pending.get(device)
+            if entry is None:
+                self._pending[device] = [time.monotonic() + self.window, dict(changes)]
+                self._cond.notify()
+                return
+            merged = entry[1]
+            for field, (old, new) in changes.items():
+                merged[field] = (merged[field][0], new) if field in merged else (old, new)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def join(self, timeout=None):
+        """Wait for the thread to end after stop(); return False if a callback still runs after `timeout` seconds."""
+        if self._thread is threading.current_thread(): return True
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    # --- Internals ----------------------------------------------------------
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    now = time.monotonic()
+                    due = [d for d, e in self._pending.items() if e[0] <= now]
+                    if due:
+                        break
+                    next_deadline = min((e[0] for e in self._pending.values()), default=None)
+                    self._cond.wait(None if next_deadline is None else next_deadline - now)
+                if not self._running:
+                    return
+                batch = [(d, self._pending.pop(d)[1]) for d in due]
+            for device, changes in batch:
+                self._deliver(device, changes)
+
+    def _deliver(self, device, changes):
+        for callback, fields in device._subscribers.items + self.subscribers.items:
+            filtered = _filter_changes(changes, fields)
+            if not filtered:
+                continue
+            try:
+                callback(device, filtered)
+            except Exception:
+                _LOGGER.exception("Change subscriber failed for %s", getattr(device, "host", device))
+
+class AsyncChangeNotifier(ChangeNotifier):
+    """
+    asyncio version of ChangeNotifier: merged changes are delivered by loop.call_later,
+    outside of datagram_received. Coroutine callbacks are run as tasks.
+    There is no thread: changes published before start() or after stop() are dropped.
+    """
+    def __init__(self, window=_COALESCE_WINDOW):
+        self.window = window
+        self.subscribers = _Subscribers()
+        self._pending = {}          # device -> {field: (old, new)}
+        self._loop = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    def publish(self, device, changes):
+        if self._loop is None:
+            return
+        merged = self._pending.get(device)
+        if merged is None:
+            self._pending[device] = dict(changes)
+            self._loop.call_later(self.window, self._flush, device)
+            return
+        for field, (old, new) in changes.items():
+            merged[field] = (merged[field][0], new) if field in merged else (old, new)
+
+    def stop(self):
+        self._pending.clear()
+        self._loop = None
+
+    def join(self, timeout=None):
+        """Nothing to wait for: a callback running on the loop cannot run while the caller does."""
+        return True
+
+    def _flush(self, device):
+        changes = self._pending.pop(device, None)
+        if changes is not None:
+            self._deliver(device, changes)
+
+    def _deliver(self, device, changes):
+        for callback, fields in device._subscribers.items + self.subscribers.items:
+            filtered = _filter_changes(changes, fields)
+            if not filtered:
+                continue
+            try:
+                result = callback(device, filtered)
+                if asyncio.iscoroutine(result):
+                    self._loop.create_task(result)
+            except Exception:
+                _LOGGER.exception("Change subscriber failed for %s", getattr(device, "host", device))
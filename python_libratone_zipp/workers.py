@@ -0,0 +1,120 @@
+import collections
+import logging
+import threading
+import time
+
+_LOGGER = logging.getLogger("LibratoneZipp")
+
+_WORKERS = 4                    # Threads processing received packets, whatever the number of devices
+_QUEUE_MAX = 256                # Max packets waiting per device; the oldest one is dropped beyond
+
+_default_workers = None
+_default_workers_lock = threading.Lock()
+
+def get_default_workers():
+    """Thread-safe lazy init of the OrderedWorkerPool shared by devices without hub."""
+    global _default_workers
+    if _default_workers is None:
+        with _default_workers_lock:
+            if _default_workers is None:
+                _default_workers = OrderedWorkerPool(name="ZippWorker")
+    return _default_workers
+
+class OrderedWorkerPool:
+    """
+    Fixed pool of `workers` threads running calls submitted per key (a device host), from one FIFO queue per key.
+    Calls of one key run in order and never concurrently; calls of different keys run in parallel.
+    Keys take turns one call at a time, so a busy device does not starve the others.
+    A key with `max_queue` calls waiting drops its oldest one: the newest packets carry the newest values.
+    """
+    def __init__(self, workers=_WORKERS, max_queue=_QUEUE_MAX, name="ZippWorker"):
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._queues = {}                   # key -> deque of (function, args) waiting
+        self._ready = collections.deque()   # keys with calls waiting and no call running
+        self._scheduled = set()             # keys in _ready or with a call running
+        self._drops = collections.Counter()
+        self._running = True
+        self._threads = [
+            threading.Thread(target=self._loop, name=f"{name}_{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # --- Public API ---------------------------------------------------------
+
+    def submit(self, key, function, *args):
+        """Queue function(*args) after the calls already queued for `key`; return False if a call had to be dropped."""
+        with self._cond:
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = collections.deque()
+            dropped = len(queue) >= self.max_queue
+            if dropped:
+                queue.popleft()
+                self._drops[key] += 1
+            queue.append((function, args))
+            if key not in self._scheduled:
+                self._scheduled.add(key)
+                self._ready.append(key)
+                self._cond.notify()
+        return not dropped
+
+    def depths(self):
+        """Return {key: calls waiting} for keys with calls waiting."""
+        with self._cond:
+            return {key: len(queue) for key, queue in self._queues.items() if queue}
+
+    def stats(self):
+        """Return queue depths, drop counts per key and totals."""
+        with self._cond:
+            depths = {key: len(queue) for key, queue in self._queues.items() if queue}
+            drops = dict(self._drops)
+        return {
+            "workers": len(self._threads),
+            "queued": sum(depths.values()),
+            "dropped": sum(drops.values()),
+            "depths": depths,
+            "drops": drops,
+        }
+
+    def stop(self):
+        """Drop the calls waiting; calls running finish, see join()."""
+        with self._cond:
+            self._running = False
+            self._queues.clear()
+            self._ready.clear()
+            self._cond.notify_all()
+
+    def join(self, timeout=None):
+        """Wait for the threads to end after stop(); return False if one is still running after `timeout` seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            if thread is threading.current_thread(): continue
+            thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+        return not any(thread.is_alive() for thread in self._threads if thread is not threading.current_thread())
+
+    # --- Internals ----------------------------------------------------------
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._running and not self._ready:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                key = self._ready.popleft()
+                function, args = self._queues[key].popleft()
+            try:
+                function(*args)
+            except Exception:
+                _LOGGER.exception("Processing failed for %s", key)
+            with self._cond:
+                queue = self._queues.get(key)
+                if queue:
+                    # Back in line behind the other devices
+                    self._ready.append(key)
+                    self._cond.notify()
+                else:
+                    self._queues.pop(key, None)
+                    self._scheduled.discard(key)
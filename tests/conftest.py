@@ -0,0 +1,49 @@
+import pytest
+
+from python_libratone_zipp.LibratoneMessage import get_template
+from python_libratone_zipp.LibratoneZipp import _UDP_RESULT_PORT
+from python_libratone_zipp.emulator import ZippEmulator
+from python_libratone_zipp.null_hub import NullHub
+from python_libratone_zipp.socket_hub import SocketHub
+
+class RecordingHub(NullHub):
+    """NullHub keeping (host, command, payload, crc) of every packet sent, and answering them with `responder` if set.
+    responder(packet) returns [(command, payload)] to deliver to the device, with the crc of the packet."""
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+        self.responder = None
+        self._devices = {}
+
+    def register(self, device):
+        self._devices[device.host] = device
+
+    def send_template(self, host, template, payload=b'', crc=None):
+        packet = (host, template.command, bytes(payload), crc)
+        self.sent.append(packet)
+        if self.responder is not None:
+            for command, data in self.responder(packet):
+                # From the timer, like a reply received by the hub after the send returned
+                self.timer.call_later(0, deliver, self._devices[host], command, data, crc)
+
+    def sent_commands(self, command):
+        return [packet for packet in self.sent if packet[1] == command]
+
+def deliver(zipp, command, data, crc=1):
+    """Give `zipp` a result packet, as received by the hub."""
+    zipp.process_zipp_message(get_template(command).packet(data, crc), _UDP_RESULT_PORT)
+
+@pytest.fixture
+def null_hub():
+    hub = RecordingHub()
+    yield hub
+    hub.stop()
+
+@pytest.fixture
+def emulated():
+    """SocketHub on the real ports and 3 emulated speakers on loopback addresses."""
+    emulator = ZippEmulator(count=3)
+    hub = SocketHub()
+    yield hub, emulator
+    hub.stop()
+    emulator.stop()
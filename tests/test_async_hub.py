@@ -0,0 +1,49 @@
+import asyncio
+import sys
+
+import pytest
+
+from python_libratone_zipp.AsyncLibratoneZipp import AsyncLibratoneZipp
+from python_libratone_zipp.LibratoneMessage import get_template
+from python_libratone_zipp.async_hub import AsyncSocketHub
+from python_libratone_zipp.socket_hub import _UDP_NOTIFICATION_RECV
+
+class _FailingDevice:
+    host = '127.0.0.2'
+    def process_zipp_message(self, packet, port):
+        raise IndexError("payload too short")
+
+def test_failing_device_acked_and_logged(caplog):
+    async def receive():
+        async with AsyncSocketHub() as hub:
+            hub.register(_FailingDevice())
+            hub._on_datagram(get_template(51).packet(b''), '127.0.0.2', _UDP_NOTIFICATION_RECV, True)
+            return hub.metrics.snapshot()["counters"]["acks"]
+    assert asyncio.run(receive()) == {'127.0.0.2': {None: 1}}
+    assert "Processing failed for 127.0.0.2" in caplog.text
+
+def test_device_needs_started_hub():
+    with pytest.raises(RuntimeError, match="not started"):
+        AsyncLibratoneZipp('127.0.0.2', AsyncSocketHub())
+
+def test_shared_hub_on_running_loop(monkeypatch):
+    module = sys.modules[AsyncLibratoneZipp.__module__]
+    monkeypatch.setattr(module, "_async_hub_singleton", None)
+    monkeypatch.setattr(module, "_async_hub_lock", None)
+    async def connect():
+        hub = await module.async_get_hub()
+        try:
+            assert await module.async_get_hub() is hub
+            zipp = AsyncLibratoneZipp('127.0.0.2', hub)
+            return zipp.exit(timeout=1)
+        finally:
+            hub.stop()
+    assert asyncio.run(connect())
+
+def test_notifier_stopped_with_hub():
+    async def run():
+        async with AsyncSocketHub() as hub:
+            pass
+        hub.notifier.publish(_FailingDevice(), {'volume': (None, '30')})
+        return hub.notifier.join(1)
+    assert asyncio.run(run())
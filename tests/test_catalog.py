@@ -0,0 +1,27 @@
+from python_libratone_zipp.LibratoneZipp import LibratoneZipp, _COMMAND_TABLE
+from python_libratone_zipp.catalog import Catalog, interned, parse_catalog
+from tests.conftest import deliver
+
+VOICINGS = b'[{"name":"Neutral","voicingId":"V100"},{"name":"Rock","voicingId":"V103"}]'
+
+def test_interned_once_per_payload():
+    catalog = interned(VOICINGS, parse_catalog)
+    assert isinstance(catalog, Catalog)
+    assert interned(VOICINGS.decode(), parse_catalog) is catalog
+    assert interned(VOICINGS.replace(b'Rock', b'Jazz'), parse_catalog) is not catalog
+    assert interned(b'not json', parse_catalog) is None
+
+def test_catalog_lookups():
+    catalog = interned(VOICINGS, parse_catalog)
+    assert catalog.names == ['Neutral', 'Rock']
+    assert catalog.name('V103') == 'Rock'
+    assert catalog.voicing_id('Neutral') == 'V100'
+    assert catalog.name('V999') is None
+
+def test_speakers_share_the_parsed_list(null_hub):
+    zipps = [LibratoneZipp(host, hub=null_hub) for host in ('127.0.0.2', '127.0.0.3')]
+    for zipp in zipps:
+        deliver(zipp, _COMMAND_TABLE['Voicing']['_get'], b'V103')
+        deliver(zipp, _COMMAND_TABLE['Voicing']['_getAll'], VOICINGS)
+    assert zipps[0].voicing_list is zipps[1].voicing_list
+    assert zipps[0].voicing == zipps[1].voicing == 'Rock'      # Named when the list arrives after the voicing
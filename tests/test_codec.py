@@ -0,0 +1,36 @@
+import pytest
+
+from python_libratone_zipp.LibratoneMessage import LibratoneMessage, decode_packet, get_template
+from python_libratone_zipp.LibratoneZipp import LibratoneZipp, _COMMAND_TABLE, _UDP_RESULT_PORT
+
+VOLUME = _COMMAND_TABLE['Volume']['_get']
+
+def test_decode_packet():
+    packet = get_template(VOLUME).packet(b'42', 1234)
+    view = decode_packet(packet)
+    assert (view.command, view.crc, view.datalen, bytes(view.data)) == (VOLUME, 1234, 2, b'42')
+
+def test_decode_packet_same_as_libratone_message():
+    packet = bytes(LibratoneMessage(command=VOLUME, data='42').get_packet())
+    message = LibratoneMessage(packet=packet)
+    view = decode_packet(packet)
+    assert view.command == int.from_bytes(message.command, 'big')
+    assert bytes(view.data) == bytes(message.data)
+
+@pytest.mark.parametrize("packet", [
+    b'',
+    b'\xaa\xaa\x02\x00',                                        # Shorter than the header
+    bytes(get_template(VOLUME).packet(b'42', 1))[:-1],          # dataLen larger than the payload
+    bytes(get_template(VOLUME).packet(b'42', 1)) + b'0',        # dataLen smaller than the payload
+])
+def test_decode_packet_rejects_malformed(packet):
+    with pytest.raises(ValueError):
+        decode_packet(packet)
+
+def test_malformed_packet_dropped(null_hub):
+    zipp = LibratoneZipp('127.0.0.2', hub=null_hub)
+    zipp.process_zipp_message(bytes(get_template(VOLUME).packet(b'42', 1))[:-1], _UDP_RESULT_PORT)
+    assert zipp.volume is None
+    assert null_hub.metrics.snapshot()["counters"]["decode_errors"] == {'127.0.0.2': {None: 1}}
+    zipp.process_zipp_message(get_template(VOLUME).packet(b'42', 2), _UDP_RESULT_PORT)
+    assert zipp.volume == '42'
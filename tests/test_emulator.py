@@ -0,0 +1,26 @@
+import time
+
+from python_libratone_zipp.LibratoneZipp import LibratoneZipp, _COMMAND_TABLE
+
+def _wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_get_all_answered(emulated):
+    hub, emulator = emulated
+    zipps = [LibratoneZipp(speaker.host, hub=hub) for speaker in emulator.speakers]
+    for zipp in zipps:
+        zipp.get_all()
+    assert _wait_for(lambda: all(zipp.volume == '30' and zipp.mutestatus == 'UNMUTE' for zipp in zipps))
+    stats = emulator.stats()
+    assert stats["requests"] >= len(zipps) and stats["replies"] >= stats["requests"]
+
+def test_notification_applied_and_acked(emulated):
+    hub, emulator = emulated
+    speaker = emulator.speakers[0]
+    zipp = LibratoneZipp(speaker.host, hub=hub)
+    emulator.notify(speaker, _COMMAND_TABLE['Volume']['_get'], '42')
+    assert _wait_for(lambda: zipp.volume == '42')
+    assert _wait_for(lambda: emulator.stats()["acks"] == 1)
@@ -0,0 +1,28 @@
+import sys
+import time
+
+import pytest
+
+from python_libratone_zipp.LibratoneZipp import LibratoneZipp
+from python_libratone_zipp.emulator import ZippEmulator
+
+lz = sys.modules[LibratoneZipp.__module__]
+
+@pytest.fixture
+def legacy(monkeypatch):
+    """Devices with their own sockets, and an emulated speaker notifying changes every few ms."""
+    monkeypatch.setattr(lz, "USE_SOCKET_HUB", False)
+    emulator = ZippEmulator(count=1, notify_interval=0.005)
+    yield emulator
+    emulator.stop()
+
+@pytest.mark.parametrize("attempt", range(5))
+def test_listeners_survive_notifications_at_startup(legacy, attempt):
+    zipp = LibratoneZipp(legacy.speakers[0].host)
+    try:
+        time.sleep(0.2)
+        assert zipp._listening_notification_thread.is_alive()
+        assert zipp._listening_result_thread.is_alive()
+        assert zipp.snapshot.revision > 0       # Notifications were processed
+    finally:
+        assert zipp.exit() is True
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from python_libratone_zipp.LibratoneZipp import LibratoneZipp, _COMMAND_TABLE
+from python_libratone_zipp.lifecycle_cache import LifecycleCache
+from tests.conftest import deliver
+
+HOST = '127.0.0.2'
+VERSION = _COMMAND_TABLE['Version']['_get']
+SERIAL = _COMMAND_TABLE['SerialNumber']['_get']
+NAME = _COMMAND_TABLE['Name']['_get']
+
+@pytest.fixture
+def cache(tmp_path):
+    path = tmp_path / "lifecycle.json"
+    with LifecycleCache(str(path)) as cache:
+        cache.update(HOST, VERSION, b'808')
+        cache.update(HOST, SERIAL, b'1234')
+        cache.update(HOST, NAME, b'Kitchen')
+    cache = LifecycleCache(str(path))
+    yield cache
+    cache.close()
+
+def test_values_served_at_startup(null_hub, cache):
+    zipp = LibratoneZipp(HOST, hub=null_hub, lifecycle_cache=cache)
+    assert (zipp.version, zipp.serialnumber, zipp.name) == ('808', '1234', 'Kitchen')
+    assert zipp.snapshot.name == 'Kitchen'
+
+def test_same_version_keeps_values(null_hub, cache):
+    zipp = LibratoneZipp(HOST, hub=null_hub, lifecycle_cache=cache)
+    deliver(zipp, VERSION, b'808')
+    assert cache.value(HOST, NAME) == b'Kitchen'
+    assert not null_hub.sent_commands(NAME)
+
+@pytest.mark.parametrize("command, data", [(VERSION, b'809'), (SERIAL, b'5678')])
+def test_new_version_or_serial_invalidates(null_hub, cache, command, data):
+    zipp = LibratoneZipp(HOST, hub=null_hub, lifecycle_cache=cache)
+    deliver(zipp, command, data)
+    assert cache.value(HOST, NAME) is None
+    assert cache.value(HOST, command) == data
+    assert null_hub.sent_commands(NAME)     # Asked again
+
+def test_channel_not_cached(null_hub, cache):
+    zipp = LibratoneZipp(HOST, hub=null_hub, lifecycle_cache=cache)
+    deliver(zipp, _COMMAND_TABLE['Channel']['_get'], b'[{"channel_id":1,"isPlaying":true}]')
+    assert cache.value(HOST, _COMMAND_TABLE['Channel']['_get']) is None
+
+def test_malformed_entries_dropped(tmp_path, caplog):
+    path = tmp_path / "lifecycle.json"
+    path.write_text(json.dumps({"format": 1, "speakers": {
+        HOST: {"values": {str(NAME): "Kitchen"}, "updated": 1},
+        '127.0.0.3': {"updated": 1},
+        '127.0.0.4': ["808"],
+        '127.0.0.5': {"values": {"Name": 7}},
+    }}))
+    with LifecycleCache(str(path)) as cache:
+        assert cache.hosts() == [HOST]
+        assert cache.get(HOST) == {NAME: b'Kitchen'}
+        assert cache.get('127.0.0.3') == {}
+    assert "Ignoring malformed entry of 127.0.0.4" in caplog.text
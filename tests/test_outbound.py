@@ -0,0 +1,46 @@
+import threading
+
+from python_libratone_zipp.outbound import Outbox, TimerThread
+
+class _Sent:
+    def __init__(self, count):
+        self.packets = []
+        self.done = threading.Event()
+        self.count = count
+
+    def send(self, name):
+        self.packets.append(name)
+        if len(self.packets) >= self.count: self.done.set()
+        return True
+
+def test_outbox_coalesces_and_keeps_order():
+    sent = _Sent(4)
+    superseded = []
+    timer = TimerThread()
+    outbox = Outbox(sent.send, timer, rate=50, burst=1, on_superseded=superseded.append)
+    try:
+        assert outbox.submit('volume', ('volume 10',), coalesce=True)      # Sent at once with the only token
+        outbox.submit('volume', ('volume 11',), coalesce=True)
+        outbox.submit('play', ('play',))
+        outbox.submit('volume', ('volume 12',), coalesce=True)
+        outbox.submit('next', ('next',))
+        outbox.submit('volume', ('volume 13',), coalesce=True)
+        assert outbox.depth() == 3
+        assert sent.done.wait(2)
+        # The waiting volume keeps its place, with its latest value; transport commands are neither dropped nor reordered
+        assert sent.packets == ['volume 10', 'volume 13', 'play', 'next']
+        assert superseded == [('volume 11',), ('volume 12',)]
+    finally:
+        timer.stop()
+
+def test_outbox_never_coalesces_transport_commands():
+    sent = _Sent(4)
+    timer = TimerThread()
+    outbox = Outbox(sent.send, timer, rate=50, burst=1)
+    try:
+        for name in ('play', 'next', 'next', 'pause'):
+            outbox.submit(name, (name,))
+        assert sent.done.wait(2)
+        assert sent.packets == ['play', 'next', 'next', 'pause']
+    finally:
+        timer.stop()
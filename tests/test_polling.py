@@ -0,0 +1,20 @@
+from python_libratone_zipp.LibratoneZipp import LibratoneZipp, _COMMAND_TABLE
+from tests.conftest import deliver
+
+VOLUME = _COMMAND_TABLE['Volume']['_get']
+PLAY_STATUS = _COMMAND_TABLE['PlayStatus']['_get']
+POWER_MODE = _COMMAND_TABLE['CurrPowerMode']['_get']
+
+def test_unchanged_value_backs_off(null_hub):
+    zipp = LibratoneZipp('127.0.0.2', hub=null_hub, keepalive_interval=10)
+    for crc in range(1, 5):
+        deliver(zipp, VOLUME, b'30', crc)
+    assert zipp._field_stats[VOLUME][2] == 40
+
+def test_state_values_polled_every_keepalive(null_hub):
+    zipp = LibratoneZipp('127.0.0.2', hub=null_hub, keepalive_interval=10)
+    for crc in range(1, 5):
+        deliver(zipp, PLAY_STATUS, b'1', crc)
+        deliver(zipp, POWER_MODE, b'00', crc + 10)
+    assert zipp._field_stats[PLAY_STATUS][2] == 10
+    assert zipp._field_stats[POWER_MODE][2] == 10
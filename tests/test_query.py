@@ -0,0 +1,32 @@
+from python_libratone_zipp.LibratoneZipp import LibratoneZipp, _COMMAND_TABLE
+from tests.conftest import deliver
+
+VOLUME = _COMMAND_TABLE['Volume']['_get']
+
+def test_query_emulated_speaker(emulated):
+    hub, emulator = emulated
+    speaker = emulator.speakers[0]
+    zipp = LibratoneZipp(speaker.host, hub=hub)
+    assert zipp.query('Volume') == '30'
+    speaker.volume = 55
+    assert zipp.query(VOLUME) == '55'
+    assert zipp.snapshot.volume == '55'
+
+def test_query_matches_reply_by_crc(null_hub):
+    zipp = LibratoneZipp('127.0.0.2', hub=null_hub)
+    null_hub.responder = lambda packet: [(VOLUME, b'33')] if packet[1] == VOLUME else []
+    assert zipp.query('Volume', timeout=1) == '33'
+
+def test_query_timeout(null_hub):
+    zipp = LibratoneZipp('127.0.0.2', hub=null_hub)
+    assert zipp.query('Volume', timeout=0.1) is None
+    assert not zipp._waiters[VOLUME]
+
+def test_stale_reply_discarded(null_hub):
+    zipp = LibratoneZipp('127.0.0.2', hub=null_hub)
+    zipp.volume_get()
+    zipp.volume_get()
+    first, second = [packet[3] for packet in null_hub.sent_commands(VOLUME)]
+    deliver(zipp, VOLUME, b'20', second)
+    deliver(zipp, VOLUME, b'10', first)     # Answer to the older request, arriving late
+    assert zipp.volume == '20'
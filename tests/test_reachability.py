@@ -0,0 +1,16 @@
+import time
+
+from python_libratone_zipp.reachability import Reachability, _SEEN_FRESHNESS, _SEEN_MARGIN
+
+def test_packet_trusted_for_keepalive_interval():
+    reachability = Reachability()
+    reachability.seen('127.0.0.2')
+    reachability.set_interval('127.0.0.2', 5)
+    now = time.monotonic()
+    assert reachability._cached('127.0.0.2', now + 5 + _SEEN_MARGIN - 1) is True
+    assert reachability._cached('127.0.0.2', now + 5 + _SEEN_MARGIN + 1) is None      # Probed again
+
+def test_default_freshness():
+    reachability = Reachability()
+    reachability.seen('127.0.0.2')
+    assert reachability._cached('127.0.0.2', time.monotonic() + _SEEN_FRESHNESS - 1) is True
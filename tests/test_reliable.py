@@ -0,0 +1,76 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from python_libratone_zipp.LibratoneZipp import LibratoneZipp, connect_many, _COMMAND_TABLE, _LIFECYCLE_POLLED_COMMANDS, _POLLED_COMMANDS
+from tests.conftest import deliver
+
+# The module, shadowed in the package by the class of the same name
+lz = sys.modules[LibratoneZipp.__module__]
+
+VOLUME_SET = _COMMAND_TABLE['Volume']['_set']
+VOLUME = _COMMAND_TABLE['Volume']['_get']
+
+@pytest.fixture(autouse=True)
+def fast_retransmit(monkeypatch):
+    monkeypatch.setattr(lz, "_RETRANSMIT_DELAY", 0.05)
+    monkeypatch.setattr(lz, "_RETRANSMIT_DEADLINE", 0.5)
+
+def test_retransmitted_until_confirmed(null_hub):
+    zipp = LibratoneZipp('127.0.0.2', hub=null_hub, reliable=True)
+    # The speaker misses the first packet and notifies the volume set by the second one
+    null_hub.responder = lambda packet: [(VOLUME, packet[2])] if len(null_hub.sent_commands(VOLUME_SET)) == 2 else []
+    assert zipp.volume_set(25) is True
+    sent = null_hub.sent_commands(VOLUME_SET)
+    assert len(sent) == 2 and sent[0] == sent[1]       # Same crc and payload
+    assert zipp.volume == '25'
+    assert null_hub.metrics.snapshot()["counters"]["retransmits"] == {'127.0.0.2': {VOLUME_SET: 1}}
+
+def test_given_up_without_confirmation(null_hub):
+    zipp = LibratoneZipp('127.0.0.2', hub=null_hub, reliable=True)
+    assert zipp.volume_set(25) is False
+    assert len(null_hub.sent_commands(VOLUME_SET)) >= 2
+    assert null_hub.metrics.snapshot()["counters"]["unconfirmed"] == {'127.0.0.2': {VOLUME_SET: 1}}
+
+def test_unreliable_sent_once(null_hub):
+    zipp = LibratoneZipp('127.0.0.2', hub=null_hub)
+    assert zipp.volume_set(25) is True
+    assert len(null_hub.sent_commands(VOLUME_SET)) == 1
+
+def test_duplicate_answer_to_retransmission_processed_once(null_hub):
+    zipp = LibratoneZipp('127.0.0.2', hub=null_hub, reliable=True)
+    # The speaker confirms both the packet and its retransmission
+    null_hub.responder = lambda packet: [(VOLUME, packet[2])] if len(null_hub.sent_commands(VOLUME_SET)) == 2 else []
+    zipp.volume_set(25)
+    crc = null_hub.sent_commands(VOLUME_SET)[0][3]
+    deliver(zipp, VOLUME, b'25', crc)
+    assert null_hub.metrics.snapshot()["counters"]["duplicates"] == {'127.0.0.2': {VOLUME: 1}}
+
+def test_queries_answered_without_crc_echo(null_hub):
+    zipp = LibratoneZipp('127.0.0.2', hub=null_hub)
+    for _ in range(2):
+        result = {}
+        thread = threading.Thread(target=lambda: result.setdefault('value', zipp.query('Volume', timeout=1)))
+        thread.start()
+        deadline = time.monotonic() + 1
+        while not zipp._waiters.get(VOLUME) and time.monotonic() < deadline:
+            time.sleep(0.005)
+        deliver(zipp, VOLUME, b'30', 7)     # Same crc for both answers
+        thread.join()
+        assert result['value'] == '30'
+
+@pytest.mark.parametrize("reliable", [False, True])
+def test_bootstrap_not_slowed_by_reliable(null_hub, reliable):
+    # No answer at all: reliable polls would each wait for _RETRANSMIT_DEADLINE on the hub timer
+    hosts = ['127.0.0.2', '127.0.0.3', '127.0.0.4']
+    expected = len(hosts) * (len(_LIFECYCLE_POLLED_COMMANDS) + len(_POLLED_COMMANDS))
+    start = time.monotonic()
+    connect_many(hosts, hub=null_hub, reliable=reliable)
+    while len(null_hub.sent) < expected and time.monotonic() - start < 2:
+        time.sleep(0.005)
+    assert len(null_hub.sent) == expected
+    assert time.monotonic() - start < lz._RETRANSMIT_DEADLINE
+    time.sleep(0.1)
+    assert "retransmits" not in null_hub.metrics.snapshot()["counters"]
@@ -0,0 +1,40 @@
+import threading
+import time
+
+from python_libratone_zipp.LibratoneZipp import LibratoneZipp, _EXIT_TIMEOUT
+from python_libratone_zipp.socket_hub import _STOP_TIMEOUT
+
+def test_exit_releases_waiting_query(emulated):
+    hub, emulator = emulated
+    speaker = emulator.speakers[0]
+    speaker.latency = 5             # Answers after the test
+    zipp = LibratoneZipp(speaker.host, hub=hub)
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault('value', zipp.query('Volume', timeout=10)))
+    thread.start()
+    time.sleep(0.1)
+    start = time.monotonic()
+    assert zipp.exit() is True
+    thread.join(1)
+    assert time.monotonic() - start < _EXIT_TIMEOUT
+    assert not thread.is_alive() and result['value'] is None
+
+def test_nothing_sent_after_exit(emulated):
+    hub, emulator = emulated
+    zipp = LibratoneZipp(emulator.speakers[0].host, hub=hub)
+    zipp.exit()
+    requests = emulator.stats()["requests"]
+    assert zipp.volume_set(10) is False
+    time.sleep(0.1)
+    assert emulator.stats()["requests"] == requests
+
+def test_hub_stop_bounded(emulated):
+    hub, emulator = emulated
+    zipps = [LibratoneZipp(speaker.host, hub=hub) for speaker in emulator.speakers]
+    for zipp in zipps:
+        zipp.get_all()
+    start = time.monotonic()
+    assert hub.stop() is True
+    assert time.monotonic() - start < _STOP_TIMEOUT
+    assert not [t for t in threading.enumerate() if t.name.startswith(("ZippHub", "ZippPoll"))]
+    assert hub.stop() is True       # Again: nothing to do
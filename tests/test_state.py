@@ -0,0 +1,46 @@
+import time
+
+from python_libratone_zipp.LibratoneZipp import LibratoneZipp, _COMMAND_TABLE
+from python_libratone_zipp.discovery import DiscoveredSpeaker, connect_discovered
+from tests.conftest import deliver
+
+VOLUME = _COMMAND_TABLE['Volume']['_get']
+
+def _wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_snapshot_replaced_only_on_change(null_hub):
+    zipp = LibratoneZipp('127.0.0.2', hub=null_hub)
+    deliver(zipp, VOLUME, b'30', 1)
+    snapshot = zipp.snapshot
+    assert snapshot.volume == '30' and snapshot.revision == 1
+    deliver(zipp, VOLUME, b'30', 2)
+    assert zipp.snapshot is snapshot
+    assert zipp.changed_since(snapshot.revision) is None
+    deliver(zipp, VOLUME, b'31', 3)
+    assert zipp.changed_since(snapshot.revision).volume == '31'
+
+def test_subscribers_get_changes(null_hub):
+    zipp = LibratoneZipp('127.0.0.2', hub=null_hub)
+    changes = []
+    zipp.subscribe(lambda device, changed: changes.append(changed), fields=['volume'])
+    deliver(zipp, VOLUME, b'30')
+    assert _wait_for(lambda: changes)
+    assert changes == [{'volume': (None, '30')}]
+
+def test_registered_handler_changes_published(null_hub):
+    zipp = LibratoneZipp('127.0.0.2', hub=null_hub)
+    zipp.handler_register(1285, lambda device, data: setattr(device, 'name', data.decode()))
+    deliver(zipp, 1285, b'Custom')
+    assert zipp.snapshot.name == 'Custom'
+
+def test_discovered_values_in_snapshot(null_hub):
+    changes = []
+    null_hub.notifier.subscribe(lambda device, changed: changes.append(changed))
+    zipp, = connect_discovered([DiscoveredSpeaker('127.0.0.2', 'Kitchen', '1234', '809')], hub=null_hub)
+    assert (zipp.snapshot.name, zipp.snapshot.serialnumber, zipp.snapshot.version) == ('Kitchen', '1234', '809')
+    assert _wait_for(lambda: changes)
+    assert changes[0]['name'] == (None, 'Kitchen')
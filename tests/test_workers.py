@@ -0,0 +1,45 @@
+import threading
+import time
+
+from python_libratone_zipp.workers import OrderedWorkerPool
+
+def test_calls_of_a_key_run_in_order():
+    pool = OrderedWorkerPool(workers=4)
+    lock = threading.Lock()
+    ran = {key: [] for key in range(5)}
+    def call(key, i):
+        time.sleep(0.0001 * (i % 3))
+        with lock: ran[key].append(i)
+    try:
+        for i in range(100):
+            for key in ran:
+                pool.submit(key, call, key, i)
+        deadline = time.monotonic() + 5
+        while sum(map(len, ran.values())) < 500 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert all(calls == list(range(100)) for calls in ran.values())
+    finally:
+        pool.stop()
+        assert pool.join(2)
+
+def test_full_queue_drops_oldest():
+    pool = OrderedWorkerPool(workers=1, max_queue=2)
+    release = threading.Event()
+    ran = []
+    try:
+        assert pool.submit('a', lambda: (release.wait(2), ran.append(0)))
+        time.sleep(0.05)        # 0 is running, the next ones wait
+        assert pool.submit('a', ran.append, 1)
+        assert pool.submit('a', ran.append, 2)
+        assert not pool.submit('a', ran.append, 3)
+        assert not pool.submit('a', ran.append, 4)
+        assert pool.stats()["drops"] == {'a': 2}
+        release.set()
+        deadline = time.monotonic() + 2
+        while len(ran) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert ran == [0, 3, 4]
+    finally:
+        release.set()
+        pool.stop()
+        assert pool.join(2)